@@ -0,0 +1,90 @@
+"""
+Per-page overhead of the OCR engines: pytesseract (one tesseract process per
+page) against tesserocr (one in-process API handle, models loaded once).
+
+Both engines OCR the same page images. The pages come from a PDF
+(--pdf, rendered at 300 dpi) or are generated: lines of text drawn with
+Pillow's default font. The first page includes tesserocr's model load, so
+it is reported separately from the steady-state per-page time.
+
+Usage:
+    python3 benchmark_engines.py --pages 10
+    python3 benchmark_engines.py --pdf book.pdf --pages 5
+"""
+
+import argparse
+import statistics
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+from engines import PytesseractEngine, TesserocrEngine
+
+LANG = "eng+ara"
+PAGE_SIZE = (2480, 3508)  # A4 at 300 dpi
+
+
+def synthetic_pages(count):
+    """White 300 dpi pages with lines of black text."""
+    try:
+        font = ImageFont.load_default(size=40)
+    except TypeError:  # Pillow < 10.1
+        font = ImageFont.load_default()
+    pages = []
+    for index in range(count):
+        page = Image.new("L", PAGE_SIZE, 255)
+        draw = ImageDraw.Draw(page)
+        for line in range(60):
+            draw.text(
+                (200, 200 + line * 52),
+                f"Page {index + 1}, line {line + 1}: the quick brown fox jumps over the lazy dog.",
+                fill=0,
+                font=font,
+            )
+        pages.append(page.convert("1"))
+    return pages
+
+
+def pdf_pages(pdf_path, count):
+    from pdf2image import convert_from_path
+
+    return [page.convert("L") for page in convert_from_path(pdf_path, 300, first_page=1, last_page=count)]
+
+
+def run(engine_class, pages):
+    """Returns (setup seconds, [seconds per page])."""
+    start_time = time.perf_counter()
+    engine = engine_class(LANG)
+    setup_seconds = time.perf_counter() - start_time
+    timings = []
+    for page in pages:
+        start_time = time.perf_counter()
+        engine.pdf(page)
+        timings.append(time.perf_counter() - start_time)
+    engine.close()
+    return setup_seconds, timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare per-page overhead of the OCR engines.")
+    parser.add_argument("--pages", type=int, default=10, help="Pages per engine (default: 10).")
+    parser.add_argument("--pdf", default=None, help="Use the first pages of this PDF instead of generated pages.")
+    args = parser.parse_args()
+
+    pages = pdf_pages(args.pdf, args.pages) if args.pdf else synthetic_pages(args.pages)
+    results = {}
+    for engine_class in (PytesseractEngine, TesserocrEngine):
+        try:
+            results[engine_class.name] = run(engine_class, pages)
+        except ImportError as e:
+            print(f"{engine_class.name} not available ({e}).")
+
+    print(f"\n{len(pages)} page(s), lang={LANG}")
+    print(f"{'Engine':<14}{'Setup (s)':>11}{'First page (s)':>16}{'Per page (s)':>14}")
+    for name, (setup_seconds, timings) in results.items():
+        steady = statistics.median(timings[1:]) if len(timings) > 1 else timings[0]
+        print(f"{name:<14}{setup_seconds:>11.2f}{timings[0]:>16.2f}{steady:>14.2f}")
+    if len(results) == 2:
+        overhead = statistics.median(results["pytesseract"][1]) - statistics.median(results["tesserocr"][1])
+        print(f"\nProcess-per-page overhead: {overhead:.2f}s per page "
+              f"({overhead * 500 / 60:.1f} min on a 500-page book)")
@@ -0,0 +1,109 @@
+"""
+OCR engines for tesseract-ocr.py.
+
+pytesseract starts a new `tesseract` process for every page. It writes the
+page image to a temporary file and loads the eng+ara traineddata again each
+time. The tesserocr engine keeps one tesseract API handle (with the models
+loaded) for the life of the process and passes page images in memory.
+
+tesserocr is optional (`pip install tesserocr`, built against the installed
+tesseract). When it is missing, "auto" falls back to pytesseract.
+"""
+
+import tempfile
+from pathlib import Path
+
+ENGINES = ("auto", "tesserocr", "pytesseract")
+
+
+class PytesseractEngine:
+    """One tesseract process per page (the original path)."""
+
+    name = "pytesseract"
+
+    def __init__(self, lang):
+        import pytesseract
+
+        self._pytesseract = pytesseract
+        self.lang = lang
+
+    def pdf(self, image, text_only=False) -> bytes:
+        """
+        Single-page searchable PDF for a page image. With text_only, the PDF
+        holds only the invisible text layer, without the image.
+        """
+        return self._pytesseract.image_to_pdf_or_hocr(
+            image,
+            lang=self.lang,
+            extension="pdf",
+            config="-c textonly_pdf=1" if text_only else "",
+        )
+
+    def hocr(self, image) -> str:
+        return self._pytesseract.image_to_pdf_or_hocr(
+            image, lang=self.lang, extension="hocr"
+        ).decode("utf-8")
+
+    def close(self):
+        pass
+
+
+class TesserocrEngine:
+    """A long-lived in-process tesseract API handle; the models are loaded once."""
+
+    name = "tesserocr"
+
+    def __init__(self, lang):
+        import tesserocr
+
+        self.lang = lang
+        self._api = tesserocr.PyTessBaseAPI(lang=lang)
+        # ProcessPage renders a PDF for every variable-selected output
+        self._api.SetVariable("tessedit_create_pdf", "1")
+
+    def pdf(self, image, text_only=False) -> bytes:
+        """
+        Single-page searchable PDF for a page image (text layer only with
+        text_only). The image is passed in memory; tesseract's PDF renderer
+        can only write to a file, so the result is read back from a scratch
+        folder.
+        """
+        self._api.SetVariable("textonly_pdf", "1" if text_only else "0")
+        with tempfile.TemporaryDirectory(prefix="nasikh-ocr-") as output_dir:
+            output_base = Path(output_dir) / "page"
+            if not self._api.ProcessPage(str(output_base), image, 0, "page"):
+                raise RuntimeError("tesseract could not process the page.")
+            return output_base.with_suffix(".pdf").read_bytes()
+
+    def hocr(self, image) -> str:
+        self._api.SetImage(image)
+        return self._api.GetHOCRText(0)
+
+    def close(self):
+        self._api.End()
+
+
+def create_engine(kind="auto", lang="eng+ara"):
+    """
+    Creates the requested engine. "auto" uses tesserocr when it is installed
+    and pytesseract otherwise.
+    """
+    if kind in ("auto", "tesserocr"):
+        try:
+            return TesserocrEngine(lang)
+        except ImportError:
+            if kind == "tesserocr":
+                raise
+            print("tesserocr not installed: using pytesseract (one tesseract process per page).")
+    return PytesseractEngine(lang)
+
+
+# One engine per process: pool workers each keep their own API handle
+_process_engines = {}
+
+
+def process_engine(kind="auto", lang="eng+ara"):
+    """The engine of the current process, created on first use."""
+    if (kind, lang) not in _process_engines:
+        _process_engines[kind, lang] = create_engine(kind, lang)
+    return _process_engines[kind, lang]
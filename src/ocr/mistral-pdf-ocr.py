@@ -1,29 +1,56 @@
+import argparse
 import os
-import base64
-from mistralai import Mistral
-from dotenv import load_dotenv
+import tempfile
+import threading
+import time
+import unicodedata
+from pathlib import Path
 
+import pypdf
+from dotenv import load_dotenv
 
-def encode_pdf_to_base64(pdf_path: str) -> str | None:
-    """
-    Encodes a PDF file to a Base64 string.
-    """
-    try:
-        with open(pdf_path, "rb") as pdf_file:
-            return base64.b64encode(pdf_file.read()).decode("utf-8")
-    except FileNotFoundError:
-        print(f"Error: The file at {pdf_path} was not found.")
-        return None
-    except Exception as e:
-        print(f"An unexpected error occurred while encoding the PDF: {e}")
-        return None
+from mistral_shards import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_REQUESTS_PER_SECOND,
+    DEFAULT_RETRIES,
+    DEFAULT_SHARD_PAGES,
+    ocr_shards,
+    page_shards,
+)
+from text_layer import classify_pages, print_skip_report
+
+
+def write_pages_pdf(pdf_file, page_numbers, output_path):
+    """Writes a PDF holding only the given pages of an open PDF, in order."""
+    # A reader per call: pypdf keeps every object it has read, images included,
+    # so a reader shared across shards would end up holding the whole book
+    reader = pypdf.PdfReader(pdf_file)
+    writer = pypdf.PdfWriter()
+    for page_number in page_numbers:
+        writer.add_page(reader.pages[page_number - 1])
+    with open(output_path, "wb") as f:
+        writer.write(f)
 
 
 def extract_arabic_text_from_pdf(
-    pdf_path: str, output_filename: str = "extracted_arabic_text.txt"
+    pdf_path: str,
+    output_filename: str = "extracted_arabic_text.txt",
+    detect_text_layer: bool = True,
+    server_url: str | None = None,
+    shard_pages: int = DEFAULT_SHARD_PAGES,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+    retries: int = DEFAULT_RETRIES,
 ):
     """
     Extracts text from a local PDF using Mistral OCR and saves it to a file.
+
+    With detect_text_layer, pages that already have a usable text layer (see
+    text_layer.py) are read directly, and only the image pages are sent to
+    the API. The image pages are sent as concurrent shards of shard_pages
+    pages (see mistral_shards.py); shard_pages=0 sends them in one request.
+    Shards are streamed from disk, so memory use does not grow with the
+    size of the PDF.
     """
     api_key = os.environ.get("MISTRAL_API_KEY")
     if not api_key:
@@ -31,35 +58,77 @@ def extract_arabic_text_from_pdf(
             "MISTRAL_API_KEY not found. Make sure it is set in your .env file."
         )
 
-    client = Mistral(api_key=api_key)
-
-    print(f"Encoding PDF from path: {pdf_path}")
-    base64_pdf = encode_pdf_to_base64(pdf_path)
-    if not base64_pdf:
+    try:
+        # An open file lets pypdf read pages on demand instead of loading the whole PDF
+        with open(pdf_path, "rb") as pdf_file:
+            page_total = len(pypdf.PdfReader(pdf_file).pages)
+    except FileNotFoundError:
+        print(f"Error: The file at {pdf_path} was not found.")
         return
-
-    print("PDF encoded successfully. Sending to Mistral OCR API...")
+    all_pages = range(1, page_total + 1)
+    text_pages = {}
+    if detect_text_layer:
+        # Presentation forms from the text layer become plain Arabic letters
+        text_pages = {
+            page_number: unicodedata.normalize("NFKC", text)
+            for page_number, text in classify_pages(pdf_path, all_pages).items()
+        }
+    image_pages = [page_number for page_number in all_pages if page_number not in text_pages]
 
     try:
-        ocr_response = client.ocr.process(
-            model="mistral-ocr-latest",
-            document={
-                "type": "document_url",
-                "document_url": f"data:application/pdf;base64,{base64_pdf}",
-            },
-        )
+        ocr_pages = {}
+        api_seconds = None
+        if image_pages:
+            shards = page_shards(image_pages, shard_pages)
+            print(
+                f"Sending {len(image_pages)} image page(s) of {pdf_path} to Mistral OCR "
+                f"in {len(shards)} shard(s), {concurrency} at a time..."
+            )
+            start_time = time.monotonic()
+            with (
+                open(pdf_path, "rb") as pdf_file,
+                tempfile.TemporaryDirectory(prefix="nasikh-mistral-") as shards_dir,
+            ):
+                # Shards are written from worker threads; they share the open file
+                pdf_file_lock = threading.Lock()
+
+                def shard_pdf(shard):
+                    if len(shard) == page_total:
+                        # The whole file: upload it as it is
+                        return pdf_path
+                    shard_path = Path(shards_dir) / f"pages-{shard[0]:04d}-{shard[-1]:04d}.pdf"
+                    with pdf_file_lock:
+                        write_pages_pdf(pdf_file, shard, shard_path)
+                    return shard_path
+
+                ocr_pages, failed = ocr_shards(
+                    shards,
+                    shard_pdf,
+                    api_key,
+                    server_url=server_url,
+                    concurrency=concurrency,
+                    requests_per_second=requests_per_second,
+                    retries=retries,
+                )
+            api_seconds = time.monotonic() - start_time
+            for label, error in failed.items():
+                print(f"❌ {label.capitalize()} failed: {error}")
 
         # --- CORRECTED RESPONSE HANDLING ---
-        # The response object has a 'pages' attribute, which is a list.
-        # We need to loop through each page and get its 'markdown' content.
-        if ocr_response.pages:
-            # Join the markdown content from all pages into a single string
-            all_pages_content = [page.markdown for page in ocr_response.pages]
+        # Pages are put back in document order, whichever way they were read
+        if ocr_pages or text_pages:
+            all_pages_content = [
+                text_pages[page_number] if page_number in text_pages else ocr_pages.get(page_number, "")
+                for page_number in all_pages
+            ]
             # Add a separator between pages for better readability
             extracted_text = "\n\n---\n\n".join(all_pages_content)
 
             print(
-                f"\n✅ Successfully extracted content from {len(ocr_response.pages)} page(s)."
+                f"\n✅ Successfully extracted content from {len(ocr_pages) + len(text_pages)} page(s)."
+            )
+            print_skip_report(
+                text_pages, page_total, api_seconds / len(image_pages) if api_seconds else None
             )
 
             with open(output_filename, "w", encoding="utf-8") as f:
@@ -85,4 +154,52 @@ if __name__ == "__main__":
         "/Users/viz1er/Codebase/nasikh-nexus/mistral-ocr/al-arabin-nawawi.pdf"
     )
 
-    extract_arabic_text_from_pdf(pdf_file_path)
+    parser = argparse.ArgumentParser(description="Extract Arabic text from a PDF with Mistral OCR.")
+    parser.add_argument("pdf", nargs="?", default=pdf_file_path)
+    parser.add_argument("output", nargs="?", default="extracted_arabic_text.txt")
+    parser.add_argument(
+        "--ocr-all",
+        action="store_true",
+        help="Send every page to OCR, even pages that already have a usable text layer.",
+    )
+    parser.add_argument(
+        "--server-url",
+        default=os.environ.get("MISTRAL_SERVER_URL"),
+        help="API base URL (default: $MISTRAL_SERVER_URL, else Mistral's).",
+    )
+    parser.add_argument(
+        "--shard-pages",
+        type=int,
+        default=DEFAULT_SHARD_PAGES,
+        help=f"Pages per OCR request; 0 sends the whole document at once (default: {DEFAULT_SHARD_PAGES}).",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"Shards in flight at once (default: {DEFAULT_CONCURRENCY}).",
+    )
+    parser.add_argument(
+        "--rps",
+        type=float,
+        default=DEFAULT_REQUESTS_PER_SECOND,
+        help=f"Maximum requests started per second; 0 for no limit (default: {DEFAULT_REQUESTS_PER_SECOND}).",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=DEFAULT_RETRIES,
+        help=f"Retries per shard on rate limits, timeouts and server errors (default: {DEFAULT_RETRIES}).",
+    )
+    args = parser.parse_args()
+
+    extract_arabic_text_from_pdf(
+        args.pdf,
+        args.output,
+        detect_text_layer=not args.ocr_all,
+        server_url=args.server_url,
+        shard_pages=args.shard_pages,
+        concurrency=args.concurrency,
+        requests_per_second=args.rps,
+        retries=args.retries,
+    )
@@ -0,0 +1,208 @@
+"""
+Sharded, concurrent Mistral OCR for mistral-pdf-ocr.py.
+
+A whole book in a single request runs into request-size and latency limits,
+and one failure loses every page. Instead, the pages are split into
+page-range shards, and each shard is sent as its own small PDF. The shards go
+out concurrently through the async client, and every request shares one httpx
+connection pool. A rate limiter spaces out request starts, so a burst of
+shards does not hit the API's rate limit. Rate-limited, timed-out and
+server-error responses are retried with exponential backoff. Results are
+keyed by page number, so the caller can reassemble them in page order
+whichever shard finishes first.
+
+Each shard PDF is uploaded from disk through the files endpoint, streamed in
+chunks, and OCR'd by reference to a signed URL. There is no base64 data URL,
+so memory stays flat however large the file is. The upload is deleted once
+its shard is done. An upload is not retried once its body may have reached
+the server, since a copy stored there would never be deleted.
+"""
+
+import asyncio
+import random
+import time
+from pathlib import Path
+
+import httpx
+from mistralai import Mistral
+
+OCR_MODEL = "mistral-ocr-latest"
+DEFAULT_SHARD_PAGES = 20
+DEFAULT_CONCURRENCY = 4
+DEFAULT_REQUESTS_PER_SECOND = 1.0
+DEFAULT_RETRIES = 5
+# Responses worth another try; anything else (bad key, bad PDF) fails at once
+RETRY_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+# An upload creates a file, so it is only retried when the server cannot have
+# stored it: the connection never opened, or the request was turned away
+UPLOAD_RETRY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+UPLOAD_RETRY_STATUS_CODES = (429, 503)
+MAX_BACKOFF_SECONDS = 60
+REQUEST_TIMEOUT_SECONDS = 300
+
+
+def page_shards(page_numbers, shard_pages):
+    """Splits page numbers into runs of shard_pages (one run when shard_pages is 0)."""
+    page_numbers = list(page_numbers)
+    if shard_pages <= 0:
+        return [page_numbers] if page_numbers else []
+    return [page_numbers[i : i + shard_pages] for i in range(0, len(page_numbers), shard_pages)]
+
+
+def shard_label(shard):
+    return f"page {shard[0]}" if len(shard) == 1 else f"pages {shard[0]}-{shard[-1]}"
+
+
+class RateLimiter:
+    """Spaces request starts at least 1 / requests_per_second apart, across all shards."""
+
+    def __init__(self, requests_per_second):
+        self.interval = 1 / requests_per_second if requests_per_second > 0 else 0
+        self._lock = asyncio.Lock()
+        self._next_start = 0.0
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_start - now
+            self._next_start = max(now, self._next_start) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def is_retryable(error, idempotent=True) -> bool:
+    if not idempotent:
+        # A timeout or reset after the body went out may still leave an upload behind
+        return isinstance(error, UPLOAD_RETRY_ERRORS) or (
+            getattr(error, "status_code", None) in UPLOAD_RETRY_STATUS_CODES
+        )
+    # Connection resets and timeouts surface as httpx transport errors
+    if isinstance(error, httpx.TransportError):
+        return True
+    return getattr(error, "status_code", None) in RETRY_STATUS_CODES
+
+
+def retry_delay(attempt, error) -> float:
+    """Honours the server's Retry-After; otherwise exponential backoff with jitter."""
+    response = getattr(error, "raw_response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        return min(float(retry_after), MAX_BACKOFF_SECONDS)
+    except (TypeError, ValueError):
+        return min(2**attempt, MAX_BACKOFF_SECONDS) * random.uniform(0.5, 1.0)
+
+
+async def with_retries(limiter, shard, retries, request, idempotent=True):
+    """
+    Awaits request() under the rate limiter, retrying transient failures.
+    Requests that create something (idempotent=False) are only retried when
+    they cannot have reached the server (see is_retryable).
+    """
+    for attempt in range(retries + 1):
+        await limiter.wait()
+        try:
+            return await request()
+        except Exception as e:
+            if attempt == retries or not is_retryable(e, idempotent):
+                raise
+            delay = retry_delay(attempt, e)
+            reason = f"HTTP {e.status_code}" if hasattr(e, "status_code") else e.__class__.__name__
+            print(f"♻️  {shard_label(shard).capitalize()}: {reason}, retrying in {delay:.1f}s.")
+            await asyncio.sleep(delay)
+
+
+async def ocr_shard(client, limiter, shard, pdf_path, retries):
+    """
+    Uploads one shard PDF and OCRs it.
+
+    Returns:
+        {page number: markdown} for the pages of the shard.
+    """
+
+    async def upload():
+        # Reopened on every attempt: a retry needs the stream from the start
+        with open(pdf_path, "rb") as pdf_file:
+            return await client.files.upload_async(
+                file={"file_name": Path(pdf_path).name, "content": pdf_file},
+                purpose="ocr",
+            )
+
+    uploaded = await with_retries(limiter, shard, retries, upload, idempotent=False)
+    try:
+        signed_url = await with_retries(
+            limiter, shard, retries, lambda: client.files.get_signed_url_async(file_id=uploaded.id)
+        )
+        response = await with_retries(
+            limiter,
+            shard,
+            retries,
+            lambda: client.ocr.process_async(
+                model=OCR_MODEL,
+                document={"type": "document_url", "document_url": signed_url.url},
+            ),
+        )
+    finally:
+        try:
+            await client.files.delete_async(file_id=uploaded.id)
+        except Exception as e:
+            print(f"Could not delete uploaded file {uploaded.id}: {e}")
+    # page.index counts the pages of this shard
+    return {shard[page.index]: page.markdown for page in response.pages}
+
+
+async def ocr_shards_async(
+    shards,
+    shard_pdf,
+    api_key,
+    server_url=None,
+    concurrency=DEFAULT_CONCURRENCY,
+    requests_per_second=DEFAULT_REQUESTS_PER_SECOND,
+    retries=DEFAULT_RETRIES,
+):
+    """
+    OCRs the shards concurrently.
+
+    Args:
+        shard_pdf: Called with a shard (its page numbers) just before the
+            shard is sent, in a worker thread so the event loop keeps
+            serving the shards in flight. Returns the path of a PDF holding
+            those pages.
+        server_url: API base URL; None uses Mistral's.
+
+    Returns:
+        ({page number: markdown}, {shard label: exception} for shards that failed).
+    """
+    limiter = RateLimiter(requests_per_second)
+    slots = asyncio.Semaphore(concurrency)
+    page_total = sum(len(shard) for shard in shards)
+    pages_done = 0
+
+    async def run(client, shard):
+        nonlocal pages_done
+        async with slots:
+            pdf_path = await asyncio.to_thread(shard_pdf, shard)
+            ocr_pages = await ocr_shard(client, limiter, shard, pdf_path, retries)
+        pages_done += len(shard)
+        print(f"⚙️  {shard_label(shard).capitalize()} done ({pages_done}/{page_total}).")
+        return ocr_pages
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=REQUEST_TIMEOUT_SECONDS) as http_client:
+        client = Mistral(api_key=api_key, server_url=server_url, async_client=http_client)
+        results = await asyncio.gather(
+            *(run(client, shard) for shard in shards), return_exceptions=True
+        )
+
+    ocr_pages = {}
+    failed = {}
+    for shard, result in zip(shards, results):
+        if isinstance(result, Exception):
+            failed[shard_label(shard)] = result
+        else:
+            ocr_pages.update(result)
+    return ocr_pages, failed
+
+
+def ocr_shards(shards, shard_pdf, api_key, **options):
+    """Synchronous entry point for ocr_shards_async."""
+    return asyncio.run(ocr_shards_async(shards, shard_pdf, api_key, **options))
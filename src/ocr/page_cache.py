@@ -0,0 +1,126 @@
+"""
+Resumable per-page OCR cache.
+
+Each page's OCR output (tesseract's single-page PDF, or hOCR) is stored
+under a key built from the PDF's content hash, the page number, the dpi,
+the preprocessing settings, the tesseract languages and the output kind.
+A rerun after a crash on page 480 of 500 restores pages 1-479 and only OCRs
+the rest. Changing any setting gives new keys, so stale pages are never
+reused.
+
+Entries are single files written atomically, so several worker processes
+can share the cache. The cache is bounded in size. The least recently used
+entries are evicted first.
+
+Usage:
+    python3 page_cache.py stats
+    python3 page_cache.py clear
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "nasikh-nexus" / "ocr-pages"
+DEFAULT_MAX_BYTES = 2 * 1024**3
+
+
+def document_hash(pdf_path) -> str:
+    """BLAKE2b of the whole PDF (a page can change anywhere in the file)."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(pdf_path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PageCache:
+    """A size-bounded cache of per-page OCR results. Safe to share between processes."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def key(self, pdf_hash: str, page_number: int, dpi: int, settings: dict, lang: str, extension="pdf") -> str:
+        material = {
+            "pdf": pdf_hash,
+            "page": page_number,
+            "dpi": dpi,
+            "preprocess": settings,
+            "lang": lang,
+            "extension": extension,
+        }
+        encoded = json.dumps(material, sort_keys=True).encode("utf-8")
+        return hashlib.blake2b(encoded, digest_size=20).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key
+
+    def restore(self, key: str, output_path: Path) -> bool:
+        """Copies a cached page to output_path. Returns False on a cache miss."""
+        entry_path = self._entry_path(key)
+        try:
+            shutil.copyfile(entry_path, output_path)
+        except FileNotFoundError:
+            return False
+        # Touch the entry so LRU eviction keeps it
+        os.utime(entry_path)
+        return True
+
+    def store(self, key: str, data: bytes):
+        entry_path = self._entry_path(key)
+        entry_path.parent.mkdir(exist_ok=True)
+        partial_path = entry_path.with_name(f"{key}.partial-{os.getpid()}")
+        partial_path.write_bytes(data)
+        partial_path.replace(entry_path)
+
+    def entries(self):
+        """Returns (entry_path, size_bytes, last_used) for every cached page."""
+        entries = []
+        for entry_path in self.cache_dir.glob("??/*"):
+            if ".partial-" in entry_path.name:
+                continue
+            try:
+                stat = entry_path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((entry_path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def evict(self) -> int:
+        """Removes least recently used pages until the cache fits in max_bytes. Returns the count."""
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for entry_path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            entry_path.unlink(missing_ok=True)
+            total -= size
+            evicted += 1
+        return evicted
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or clear the OCR page cache.")
+    parser.add_argument("command", choices=("stats", "clear"))
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR))
+    args = parser.parse_args()
+
+    cache = PageCache(args.cache_dir)
+    if args.command == "stats":
+        entries = cache.entries()
+        print("--- OCR Page Cache ---")
+        print(f"Location: {cache.cache_dir}")
+        print(f"Pages: {len(entries)} ({sum(size for _, size, _ in entries) / 1024**2:.1f} MB)")
+    else:
+        cache.clear()
+        print(f"Cleared OCR page cache at: {cache.cache_dir}")
@@ -0,0 +1,138 @@
+"""
+Writes PDF pages to disk as they are added, for merging books page by page.
+
+pypdf's PdfWriter keeps every page it has been given, images included, until
+it writes the file, so its memory grows with the length of the book.
+PageStreamWriter instead copies each page's objects straight to the output
+and keeps only their file offsets. Objects shared by pages of one reader
+(fonts, a repeated logo) are written once for as long as that reader lives.
+
+Usage:
+    with PageStreamWriter(output_path) as writer:
+        for page_path in page_paths:
+            writer.add_page(pypdf.PdfReader(page_path).pages[0])
+"""
+
+import copy
+import weakref
+
+from pypdf.generic import (
+    ArrayObject,
+    DictionaryObject,
+    IndirectObject,
+    NameObject,
+    NullObject,
+    NumberObject,
+    StreamObject,
+)
+
+CATALOG_ID = 1
+PAGES_ID = 2
+
+
+class PageStreamWriter:
+    """A write-once PDF writer that streams pages (see the module docstring)."""
+
+    def __init__(self, output_path):
+        self._file = open(output_path, "wb")
+        self._file.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+        # Object number -> file offset; the catalog and page tree are written last
+        self._offsets = [None, None]
+        self._page_ids = []
+        # Per source reader: (object number, generation) -> object number in the output.
+        # Weak keys, so a finished reader and its mapping are freed together.
+        self._ids = weakref.WeakKeyDictionary()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+
+    def add_page(self, page):
+        """Writes a page (from a PdfReader) and everything it references."""
+        page_id = self._new_id()
+        pending = []
+        if page.indirect_reference is not None:
+            reference = page.indirect_reference
+            self._ids.setdefault(reference.pdf, {})[(reference.idnum, reference.generation)] = page_id
+        page_copy = self._rewrite(page, pending, skip_keys=("/Parent",))
+        page_copy[NameObject("/Parent")] = IndirectObject(PAGES_ID, 0, None)
+        self._write_object(page_id, page_copy)
+        while pending:
+            object_id, reference = pending.pop()
+            self._write_object(object_id, self._rewrite(reference.get_object(), pending))
+        self._page_ids.append(page_id)
+
+    def close(self):
+        """Writes the page tree, catalog and cross-reference table, then closes the file."""
+        pages = DictionaryObject(
+            {
+                NameObject("/Type"): NameObject("/Pages"),
+                NameObject("/Kids"): ArrayObject(IndirectObject(page_id, 0, None) for page_id in self._page_ids),
+                NameObject("/Count"): NumberObject(len(self._page_ids)),
+            }
+        )
+        catalog = DictionaryObject(
+            {
+                NameObject("/Type"): NameObject("/Catalog"),
+                NameObject("/Pages"): IndirectObject(PAGES_ID, 0, None),
+            }
+        )
+        self._write_object(PAGES_ID, pages)
+        self._write_object(CATALOG_ID, catalog)
+        xref_offset = self._file.tell()
+        self._file.write(f"xref\n0 {len(self._offsets) + 1}\n0000000000 65535 f \n".encode("ascii"))
+        for offset in self._offsets:
+            self._file.write(f"{offset:010d} 00000 n \n".encode("ascii"))
+        self._file.write(
+            f"trailer\n<< /Size {len(self._offsets) + 1} /Root {CATALOG_ID} 0 R >>\n"
+            f"startxref\n{xref_offset}\n%%EOF\n".encode("ascii")
+        )
+        self._file.close()
+
+    def _new_id(self):
+        self._offsets.append(None)
+        return len(self._offsets)
+
+    def _reference(self, reference, pending):
+        """The output reference for a source reference, queueing the object on first sight."""
+        ids = self._ids.setdefault(reference.pdf, {})
+        key = (reference.idnum, reference.generation)
+        if key not in ids:
+            target = reference.get_object()
+            if target is None or (
+                isinstance(target, DictionaryObject) and target.get("/Type") in ("/Page", "/Pages")
+            ):
+                # A broken reference, or a link to another page: copying that
+                # would pull in the whole source book
+                return NullObject()
+            ids[key] = self._new_id()
+            pending.append((ids[key], reference))
+        return IndirectObject(ids[key], 0, None)
+
+    def _rewrite(self, obj, pending, skip_keys=()):
+        """A copy of obj with its references renumbered for the output."""
+        if isinstance(obj, IndirectObject):
+            return self._reference(obj, pending)
+        if isinstance(obj, DictionaryObject):
+            obj_copy = copy.copy(obj)
+            for key, value in list(obj.items()):
+                if key in skip_keys or (isinstance(obj, StreamObject) and key == "/Length"):
+                    # A stream's length is written from its data
+                    del obj_copy[key]
+                else:
+                    obj_copy[key] = self._rewrite(value, pending)
+            return obj_copy
+        if isinstance(obj, ArrayObject):
+            return ArrayObject(self._rewrite(value, pending) for value in obj)
+        return obj
+
+    def _write_object(self, object_id, obj):
+        self._offsets[object_id - 1] = self._file.tell()
+        self._file.write(f"{object_id} 0 obj\n".encode("ascii"))
+        obj.write_to_stream(self._file)
+        self._file.write(b"\nendobj\n")
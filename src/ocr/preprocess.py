@@ -0,0 +1,160 @@
+"""
+Page preprocessing for OCR: binarization, deskew and denoise on NumPy arrays.
+
+Every step works on the whole page array at once (no per-pixel Python
+callbacks), so a 300 dpi page takes tens of milliseconds per step.
+
+Binarization methods:
+    fixed    global threshold (the original `point(lambda x: 0 if x < 180 ...)`)
+    otsu     global threshold chosen from the page's histogram
+    sauvola  local threshold from the mean and deviation around each pixel;
+             best for uneven manuscript scans (stains, shadows, fading)
+    niblack  local threshold, keeps faint strokes but adds background noise
+
+Settings are plain dicts (see DEFAULT_SETTINGS), so they can be chosen per
+job and recorded alongside results.
+"""
+
+import numpy as np
+
+METHODS = ("fixed", "otsu", "sauvola", "niblack")
+
+DEFAULT_SETTINGS = {
+    "method": "fixed",
+    "threshold": 180,  # fixed
+    "window": 31,  # sauvola / niblack neighbourhood, in pixels (odd)
+    "k": None,  # sauvola / niblack sensitivity; None picks the method's default
+    "deskew": False,
+    "denoise": False,
+}
+DEFAULT_K = {"sauvola": 0.2, "niblack": -0.2}
+# Dynamic range of the standard deviation in Sauvola's formula
+SAUVOLA_R = 128.0
+
+# Deskew searches +/- this many degrees, in DESKEW_STEP increments, on a
+# page downscaled by DESKEW_SCALE
+DESKEW_MAX_ANGLE = 5.0
+DESKEW_STEP = 0.2
+DESKEW_SCALE = 4
+
+
+def otsu_threshold(gray: np.ndarray) -> int:
+    """The threshold that best separates the page's two intensity classes."""
+    histogram = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256)
+    weight_dark = np.cumsum(histogram)
+    weight_light = weight_dark[-1] - weight_dark
+    sum_dark = np.cumsum(histogram * levels)
+    mean_dark = sum_dark / np.maximum(weight_dark, 1)
+    mean_light = (sum_dark[-1] - sum_dark) / np.maximum(weight_light, 1)
+    between_class_variance = weight_dark * weight_light * (mean_dark - mean_light) ** 2
+    # Pixels <= the returned level are dark
+    return int(np.argmax(between_class_variance)) + 1
+
+
+def local_mean_std(gray: np.ndarray, window: int):
+    """Mean and standard deviation over a window x window box around each pixel (integral images)."""
+    half = window // 2
+    padded = np.pad(gray.astype(np.float64), half + 1, mode="reflect")[:-1, :-1]
+    padded[0, :] = 0
+    padded[:, 0] = 0
+    integral = padded.cumsum(axis=0).cumsum(axis=1)
+    integral_sq = (padded * padded).cumsum(axis=0).cumsum(axis=1)
+    h, w = gray.shape
+
+    def box_sum(table):
+        return (
+            table[window : window + h, window : window + w]
+            - table[:h, window : window + w]
+            - table[window : window + h, :w]
+            + table[:h, :w]
+        )
+
+    area = float(window * window)
+    mean = box_sum(integral) / area
+    variance = np.maximum(box_sum(integral_sq) / area - mean * mean, 0.0)
+    return mean, np.sqrt(variance)
+
+
+def binarize(gray: np.ndarray, settings: dict) -> np.ndarray:
+    """Returns a boolean array, True for ink."""
+    method = settings["method"]
+    if method == "fixed":
+        return gray < settings["threshold"]
+    if method == "otsu":
+        return gray < otsu_threshold(gray)
+    if method not in DEFAULT_K:
+        raise ValueError(f"Unknown binarization method: {method} (choose from {METHODS})")
+
+    window = settings["window"] | 1
+    k = settings["k"] if settings["k"] is not None else DEFAULT_K[method]
+    mean, std = local_mean_std(gray, window)
+    if method == "sauvola":
+        threshold = mean * (1 + k * (std / SAUVOLA_R - 1))
+    else:
+        threshold = mean + k * std
+    return gray < threshold
+
+
+def estimate_skew(ink: np.ndarray) -> float:
+    """
+    Skew angle in degrees (counter-clockwise), found by projection profiles:
+    text lines give the sharpest row histogram once the page is level.
+    """
+    small = ink[::DESKEW_SCALE, ::DESKEW_SCALE]
+    ys, xs = np.nonzero(small)
+    if len(ys) == 0:
+        return 0.0
+    angles = np.arange(-DESKEW_MAX_ANGLE, DESKEW_MAX_ANGLE + DESKEW_STEP / 2, DESKEW_STEP)
+    # Rows each ink pixel falls on after rotating the page by each angle
+    slopes = np.tan(np.radians(angles))
+    offset = int(np.ceil(small.shape[1] * slopes.max())) + 1
+    height = small.shape[0] + 2 * offset
+    scores = np.empty(len(angles))
+    for i, slope in enumerate(slopes):
+        rows = np.rint(ys + xs * slope).astype(np.int64) + offset
+        profile = np.bincount(rows, minlength=height)
+        scores[i] = np.dot(profile, profile)
+    return float(angles[np.argmax(scores)])
+
+
+def despeckle(ink: np.ndarray) -> np.ndarray:
+    """Removes isolated ink pixels: a pixel stays only if another ink pixel touches it."""
+    padded = np.pad(ink, 1).astype(np.uint8)
+    h, w = ink.shape
+    neighbours = sum(
+        padded[1 + dy : 1 + dy + h, 1 + dx : 1 + dx + w]
+        for dy in (-1, 0, 1)
+        for dx in (-1, 0, 1)
+        if dy or dx
+    )
+    return ink & (neighbours > 0)
+
+
+def preprocess(image, settings: dict = None):
+    """
+    Preprocesses a PIL page image for tesseract.
+
+    Returns:
+        A 1-bit PIL image (black ink on white).
+    """
+    # Imported here so the array functions above only need NumPy
+    from PIL import Image
+
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    gray_image = image.convert("L")
+    gray = np.asarray(gray_image)
+    ink = binarize(gray, settings)
+
+    if settings["deskew"]:
+        angle = estimate_skew(ink)
+        if angle:
+            gray_image = gray_image.rotate(
+                -angle, resample=Image.BILINEAR, expand=True, fillcolor=255
+            )
+            ink = binarize(np.asarray(gray_image), settings)
+
+    if settings["denoise"]:
+        ink = despeckle(ink)
+
+    return Image.fromarray(~ink)
@@ -1,66 +1,476 @@
-import pytesseract
-from pdf2image import convert_from_path
+import argparse
+import os
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+from pdf2image import convert_from_path, pdfinfo_from_path
 import pypdf
-import io
 
-# from PIL import Image  # Import the full Image module from Pillow
+from engines import ENGINES, process_engine
+from page_cache import DEFAULT_CACHE_DIR, PageCache, document_hash
+from page_stream import PageStreamWriter
+from preprocess import DEFAULT_SETTINGS, METHODS, preprocess
+from text_layer import READER_WINDOW_PAGES, classify_pages, print_skip_report
+
+DPI = 300
+LANG = "eng+ara"
+# Pages rendered per pdftoppm call. Only this many page images are held in
+# memory at once, so memory use stays flat whatever the book length.
+DEFAULT_WINDOW_PAGES = 8
+# Pages queued per worker in parallel mode: enough to keep every worker busy
+# without rendering far ahead
+PAGES_IN_FLIGHT_PER_WORKER = 2
+
+
+def preprocess_image(image, settings=None):
+    """
+    Converts a PIL image to high-contrast black and white for better OCR.
+    settings picks the binarization method, deskew and denoise (see preprocess.py).
+    """
+    return preprocess(image, settings)
+
+
+def page_count(pdf_path):
+    return int(pdfinfo_from_path(pdf_path)["Pages"])
+
+
+def page_windows(page_numbers, window_pages):
+    """Splits sorted page numbers into runs of consecutive pages, at most window_pages long."""
+    window = []
+    for page_number in page_numbers:
+        if window and (page_number != window[-1] + 1 or len(window) == window_pages):
+            yield window
+            window = []
+        window.append(page_number)
+    if window:
+        yield window
+
+
+def render_pages(pdf_path, page_numbers, window_pages=DEFAULT_WINDOW_PAGES, dpi=DPI):
+    """
+    Yields (page number, PIL image) for the given pages, rendering up to
+    window_pages consecutive pages at a time. Each image is dropped by the
+    generator as soon as it is handed out, so it is freed once the caller is
+    done with it.
+    """
+    for window in page_windows(page_numbers, window_pages):
+        window_start = window[0]
+        images = convert_from_path(
+            pdf_path, dpi, first_page=window_start, last_page=window[-1]
+        )
+        images.reverse()
+        page_number = window_start
+        while images:
+            yield page_number, images.pop()
+            page_number += 1
+
+
+def ocr_page(image, settings=None, engine="auto", text_only=False):
+    """
+    Returns tesseract's single-page searchable PDF for a page image (only
+    the invisible text layer with text_only). engine is "tesserocr" (models
+    stay loaded in this process), "pytesseract" (one tesseract process per
+    page) or "auto" (see engines.py).
+    """
+    processed_image = preprocess_image(image, settings)
+    # Pass the CLEANED image to Tesseract
+    return process_engine(engine, LANG).pdf(processed_image, text_only=text_only)
+
+
+def default_workers():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # macOS
+        return os.cpu_count() or 1
+
+
+def limit_tesseract_threads():
+    """
+    Runs in every pool worker: one tesseract per core, each single-threaded,
+    instead of several processes all starting OpenMP threads on every core.
+    """
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+def page_path_for(pages_dir, page_number):
+    return Path(pages_dir) / f"page-{page_number:04d}.pdf"
+
 
+def save_page(page_path, page_bytes, cache=None, cache_key=None):
+    page_path.write_bytes(page_bytes)
+    if cache is not None:
+        cache.store(cache_key, page_bytes)
 
-def preprocess_image(image):
-    """Converts a PIL image to high-contrast black and white for better OCR."""
-    # Convert to grayscale first
-    processed = image.convert("L")
-    # Apply a threshold to make it pure black and white
-    processed = processed.point(lambda x: 0 if x < 180 else 255, "1")
-    return processed
+
+def process_page(
+    pdf_path,
+    page_number,
+    pages_dir,
+    settings=None,
+    cache=None,
+    cache_key=None,
+    engine="auto",
+    text_only=False,
+    dpi=DPI,
+):
+    """
+    Renders, preprocesses and OCRs one page in a pool worker, and writes its
+    single-page PDF to pages_dir (and the page cache). Rendering happens in
+    the worker, so page bitmaps never travel between processes.
+
+    Returns:
+        (page number, page path, render seconds, OCR seconds)
+    """
+    start_time = time.monotonic()
+    image = convert_from_path(pdf_path, dpi, first_page=page_number, last_page=page_number)[0]
+    render_seconds = time.monotonic() - start_time
+    page_path = page_path_for(pages_dir, page_number)
+    save_page(page_path, ocr_page(image, settings, engine, text_only), cache, cache_key)
+    image.close()
+    return page_number, page_path, render_seconds, time.monotonic() - start_time - render_seconds
+
+
+def ocr_pages_parallel(
+    pdf_path,
+    page_numbers,
+    pages_dir,
+    workers,
+    settings=None,
+    cache=None,
+    cache_keys=None,
+    engine="auto",
+    text_only=False,
+):
+    """
+    OCRs pages in a process pool, writing each to pages_dir. Pages finish out
+    of order; progress is reported in page order, as soon as every earlier
+    page is done.
+    """
+    page_total = len(page_numbers)
+    pending_pages = iter(page_numbers)
+    finished = set()
+    next_index = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=limit_tesseract_threads) as executor:
+        running = set()
+        while True:
+            # Keep a bounded number of pages queued
+            while len(running) < workers * PAGES_IN_FLIGHT_PER_WORKER:
+                page_number = next(pending_pages, None)
+                if page_number is None:
+                    break
+                running.add(
+                    executor.submit(
+                        process_page,
+                        pdf_path,
+                        page_number,
+                        pages_dir,
+                        settings,
+                        cache,
+                        (cache_keys or {}).get(page_number),
+                        engine,
+                        text_only,
+                    )
+                )
+            if not running:
+                break
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                page_number, _, render_seconds, ocr_seconds = future.result()
+                finished.add(page_number)
+                print(
+                    f"    - page {page_number}: render {render_seconds:.1f}s, "
+                    f"OCR {ocr_seconds:.1f}s"
+                )
+            if next_index < page_total and page_numbers[next_index] in finished:
+                while next_index < page_total and page_numbers[next_index] in finished:
+                    next_index += 1
+                print(f"⚙️  Pages up to {page_numbers[next_index - 1]} done ({next_index}/{page_total}).")
+
+
+def copy_original_pages(pdf_path, page_numbers, pages_dir):
+    """Writes the given pages of the input PDF, unchanged, as single-page PDFs."""
+    reader = pypdf.PdfReader(pdf_path)
+    for page_number in page_numbers:
+        page_writer = pypdf.PdfWriter()
+        page_writer.add_page(reader.pages[page_number - 1])
+        with open(page_path_for(pages_dir, page_number), "wb") as f:
+            page_writer.write(f)
+
+
+def merge_pages(page_paths, output_path):
+    """Concatenates the single-page PDFs into the output PDF, one page in memory at a time."""
+    with PageStreamWriter(output_path) as pdf_writer:
+        for page_path in page_paths:
+            pdf_writer.add_page(pypdf.PdfReader(page_path).pages[0])
+
+
+def overlay_text_layers(pdf_path, page_numbers, text_layer_paths, output_path):
+    """
+    Writes the given pages of the original PDF, each OCR'd page with its
+    invisible text layer stamped on top. The page images are copied as they
+    are, never re-encoded, and pages are written out as they are done.
+
+    Args:
+        text_layer_paths: {page number: text-only PDF from tesseract}.
+    """
+    # An open file and a fresh reader per window keep pypdf from holding the whole book
+    with open(pdf_path, "rb") as pdf_file, PageStreamWriter(output_path) as pdf_writer:
+        for index, page_number in enumerate(page_numbers):
+            if index % READER_WINDOW_PAGES == 0:
+                reader = pypdf.PdfReader(pdf_file)
+            page = reader.pages[page_number - 1]
+            if page_number in text_layer_paths:
+                if page.rotation:
+                    # pdf2image renders rotated pages upright; rotate the content to match
+                    page.transfer_rotation_to_content()
+                text_layer = pypdf.PdfReader(text_layer_paths[page_number]).pages[0]
+                # tesseract sizes its page from the image dpi; stretch it over the
+                # crop box, the part of the page pdftoppm renders
+                crop_box = page.cropbox
+                scale_x = float(crop_box.width) / float(text_layer.mediabox.width)
+                scale_y = float(crop_box.height) / float(text_layer.mediabox.height)
+                page.merge_transformed_page(
+                    text_layer,
+                    pypdf.Transformation()
+                    .scale(scale_x, scale_y)
+                    .translate(float(crop_box.left), float(crop_box.bottom)),
+                )
+            pdf_writer.add_page(page)
 
 
-def create_searchable_pdf(pdf_path, output_path):
+def create_searchable_pdf(
+    pdf_path,
+    output_path,
+    window_pages=DEFAULT_WINDOW_PAGES,
+    first_page=1,
+    last_page=None,
+    workers=1,
+    settings=None,
+    cache=None,
+    detect_text_layer=True,
+    engine="auto",
+    overlay=False,
+):
     """
     Performs OCR on an image-based PDF and saves it as a new, searchable PDF.
+
+    Pages are rendered a window at a time, and each page's OCR result is
+    written to '<output>.pages/' as soon as it is ready. The pages are merged
+    into the output PDF at the end. With workers > 1, pages are rendered and
+    OCR'd in a process pool instead (see ocr_pages_parallel). settings
+    are the preprocessing settings (see preprocess.py).
+
+    With a PageCache, pages OCR'd by an earlier (possibly failed) run with
+    the same settings are restored instead of being OCR'd again.
+
+    With detect_text_layer, pages that already have a usable text layer
+    (see text_layer.py) are copied from the input unchanged; only image
+    pages are OCR'd.
+
+    With overlay, the output keeps the original pages (and their scan
+    quality) and only gains tesseract's invisible text layer, instead of
+    being rebuilt from the 1-bit preprocessed images.
     """
-    pdf_writer = pypdf.PdfWriter()
+    output_path = Path(output_path)
+    pages_dir = output_path.with_name(f"{output_path.name}.pages")
 
     try:
-        print("➡️ Starting PDF conversion to images...")
-        images = convert_from_path(
-            pdf_path,
-            300,
-            # You can remove the page limits to run on the whole document
-            # first_page=1,
-            # last_page=20
-        )
-        print(f"✅ PDF converted to {len(images)} images.")
+        total_pages = page_count(pdf_path)
+        last_page = min(last_page or total_pages, total_pages)
+        all_pages = list(range(first_page, last_page + 1))
+        pages_dir.mkdir(parents=True, exist_ok=True)
+        settings = {**DEFAULT_SETTINGS, **(settings or {})}
 
-        for i, image in enumerate(images):
-            print(f"⚙️  Processing page {i + 1}/{len(images)}...")
+        pending = all_pages
+        text_pages = {}
+        if detect_text_layer:
+            text_pages = classify_pages(pdf_path, all_pages)
+            if not overlay:
+                copy_original_pages(pdf_path, text_pages, pages_dir)
+            pending = [page_number for page_number in all_pages if page_number not in text_pages]
 
-            # --- NEW STEP: PRE-PROCESS THE IMAGE ---
-            print("    - Pre-processing image for clarity...")
-            processed_image = preprocess_image(image)
+        cache_keys = {}
+        if cache is not None:
+            pdf_hash = document_hash(pdf_path)
+            cache_keys = {
+                page_number: cache.key(
+                    pdf_hash,
+                    page_number,
+                    DPI,
+                    settings,
+                    LANG,
+                    extension="textonly.pdf" if overlay else "pdf",
+                )
+                for page_number in pending
+            }
+            ocr_needed = len(pending)
+            pending = [
+                page_number
+                for page_number in pending
+                if not cache.restore(cache_keys[page_number], page_path_for(pages_dir, page_number))
+            ]
+            if len(pending) < ocr_needed:
+                print(f"♻️  Restored {ocr_needed - len(pending)} page(s) from the page cache.")
 
-            # Pass the CLEANED image to Tesseract
-            page_as_pdf_bytes = pytesseract.image_to_pdf_or_hocr(
-                processed_image,  # Use the processed image here
-                lang="eng+ara",
-                extension="pdf",
+        start_time = time.monotonic()
+        if pending and workers > 1:
+            print(
+                f"➡️ OCR of {len(pending)} page(s) between {first_page} and {last_page} "
+                f"(of {total_pages}) at {DPI} dpi with {workers} workers (one tesseract thread each)..."
             )
+            ocr_pages_parallel(
+                pdf_path, pending, pages_dir, workers, settings, cache, cache_keys, engine, overlay
+            )
+        elif pending:
+            print(
+                f"➡️ Rendering {len(pending)} page(s) between {first_page} and {last_page} "
+                f"(of {total_pages}) at {DPI} dpi, {window_pages} at a time..."
+            )
+            for index, (page_number, image) in enumerate(
+                render_pages(pdf_path, pending, window_pages), 1
+            ):
+                print(f"⚙️  Processing page {page_number} ({index}/{len(pending)})...")
+                page_start_time = time.monotonic()
+                save_page(
+                    page_path_for(pages_dir, page_number),
+                    ocr_page(image, settings, engine, text_only=overlay),
+                    cache,
+                    cache_keys.get(page_number),
+                )
+                # Release the 300 dpi bitmap before the next page is handed out
+                image.close()
+                print(f"    - OCR {time.monotonic() - page_start_time:.1f}s")
 
-            page_pdf_reader = io.BytesIO(page_as_pdf_bytes)
-            reader = pypdf.PdfReader(page_pdf_reader)
-            pdf_writer.add_page(reader.pages[0])
-
-        with open(output_path, "wb") as f:
-            pdf_writer.write(f)
+        elapsed = time.monotonic() - start_time
+        if pending:
+            print(
+                f"✅ OCR done for {len(pending)} pages in {elapsed:.1f}s "
+                f"({len(pending) / elapsed * 60:.1f} pages/min)."
+            )
+        print_skip_report(text_pages, len(all_pages), elapsed / len(pending) if pending else None)
+        print("Writing the PDF...")
+        if overlay:
+            overlay_text_layers(
+                pdf_path,
+                all_pages,
+                {
+                    page_number: page_path_for(pages_dir, page_number)
+                    for page_number in all_pages
+                    if page_number not in text_pages
+                },
+                output_path,
+            )
+        else:
+            merge_pages(
+                [page_path_for(pages_dir, page_number) for page_number in all_pages], output_path
+            )
+        shutil.rmtree(pages_dir)
 
         print(f"\n🎉 Success! Searchable PDF saved to: {output_path}")
 
     except Exception as e:
         print(f"❌ An error occurred: {e}")
+        if cache is not None:
+            print("   Finished pages are cached: rerun with the same settings to resume.")
+    finally:
+        if cache is not None:
+            cache.evict()
 
 
 # --- USAGE ---
 input_pdf_path = "/Users/viz1er/Ismail's Library/Ibn Ajurum/A Commentary on al-Ajrumiyyah (Al-Tuhfat as-Saniyyah bi Sharh al-Muqaddimat al-Ajurumiyyah) (3408)/A Commentary on al-Ajrumiyyah (Al-Tuhfat a - Ibn Ajurum.pdf"
 output_path = "/Users/viz1er/Ismail's Library/Ibn Ajurum/A Commentary on al-Ajrumiyyah (Al-Tuhfat as-Saniyyah bi Sharh al-Muqaddimat al-Ajurumiyyah) (3408)/test_processed.pdf"
 
-create_searchable_pdf(input_pdf_path, output_path)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Make an image-based PDF searchable with tesseract.")
+    parser.add_argument("input_pdf", nargs="?", default=input_pdf_path)
+    parser.add_argument("output_pdf", nargs="?", default=output_path)
+    parser.add_argument(
+        "--window",
+        type=int,
+        default=DEFAULT_WINDOW_PAGES,
+        help=f"Pages rendered (and held in memory) at once (default: {DEFAULT_WINDOW_PAGES}).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Pages OCR'd at once in a process pool; 0 means one per core (default: 1).",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="auto",
+        help="tesserocr: keep the models loaded in each worker. pytesseract: one tesseract "
+        "process per page. auto: tesserocr when installed (default).",
+    )
+    parser.add_argument(
+        "--overlay",
+        action="store_true",
+        help="Keep the original page images and only add an invisible OCR text layer "
+        "(smaller output, original scan quality).",
+    )
+    parser.add_argument(
+        "--binarize",
+        choices=METHODS,
+        default=DEFAULT_SETTINGS["method"],
+        help="fixed: global threshold (--threshold). otsu: global, chosen per page. "
+        "sauvola/niblack: local thresholds for uneven scans (default: fixed).",
+    )
+    parser.add_argument("--threshold", type=int, default=DEFAULT_SETTINGS["threshold"])
+    parser.add_argument(
+        "--binarize-window",
+        type=int,
+        default=DEFAULT_SETTINGS["window"],
+        help="sauvola/niblack neighbourhood in pixels (default: %(default)s).",
+    )
+    parser.add_argument("--binarize-k", type=float, default=None, help="sauvola/niblack sensitivity.")
+    parser.add_argument("--deskew", action="store_true", help="Straighten pages tilted by up to 5 degrees.")
+    parser.add_argument("--denoise", action="store_true", help="Remove isolated specks after binarization.")
+    parser.add_argument(
+        "--ocr-all",
+        action="store_true",
+        help="OCR every page, even pages that already have a usable text layer.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the per-page OCR cache.",
+    )
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR))
+    parser.add_argument(
+        "--cache-max-gb",
+        type=float,
+        default=2.0,
+        help="Least recently used pages are evicted above this size (default: 2).",
+    )
+    parser.add_argument("--first-page", type=int, default=1)
+    parser.add_argument("--last-page", type=int, default=None, help="Default: the last page.")
+    args = parser.parse_args()
+
+    create_searchable_pdf(
+        args.input_pdf,
+        args.output_pdf,
+        window_pages=max(1, args.window),
+        first_page=args.first_page,
+        last_page=args.last_page,
+        workers=args.workers or default_workers(),
+        settings={
+            "method": args.binarize,
+            "threshold": args.threshold,
+            "window": args.binarize_window,
+            "k": args.binarize_k,
+            "deskew": args.deskew,
+            "denoise": args.denoise,
+        },
+        cache=(
+            None
+            if args.no_cache
+            else PageCache(args.cache_dir, int(args.cache_max_gb * 1024**3))
+        ),
+        detect_text_layer=not args.ocr_all,
+        engine=args.engine,
+        overlay=args.overlay,
+    )
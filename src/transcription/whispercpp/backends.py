@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+# flake8: noqa
+
+"""
+Transcription backends shared by the whisper.cpp scripts.
+
+CliBackend runs a fresh whisper.cpp `main` process per file (the original
+behaviour). ServerBackend keeps the model loaded in one long-lived whisper.cpp
+`server` process and posts each file to it over a local HTTP socket, so the
+model is loaded once per batch instead of once per file.
+
+Both backends take the same decode arguments (the whisper.cpp CLI flags of a
+profile, e.g. ["-l", "ar", "-bs", "8"]) so the scripts can switch between
+them without changing their decode settings. Both also accept audio as a
+stream (transcribe_stream) for the ffmpeg pipe in media.py.
+"""
+
+import json
+import queue
+import shutil
+import socket
+import subprocess
+import time
+import urllib.error
+import urllib.request
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from metrics import process_peak_rss_bytes, run_streaming
+
+# Keeps a Mac awake while whisper.cpp runs. Skipped where caffeinate does not exist.
+CAFFEINATE_COMMAND = ["caffeinate", "-s"]
+
+# whisper.cpp CLI flags -> whisper.cpp server form fields.
+SERVER_VALUE_FIELDS = {
+    "-l": "language",
+    "--language": "language",
+    "-bs": "beam_size",
+    "--beam-size": "beam_size",
+    "-bo": "best_of",
+    "--best-of": "best_of",
+    "-lpt": "logprob_thold",
+    "--logprob-thold": "logprob_thold",
+    "-et": "entropy_thold",
+    "--entropy-thold": "entropy_thold",
+    "--prompt": "prompt",
+    "-tp": "temperature",
+    "--temperature": "temperature",
+    "-ot": "offset_t",
+    "--offset-t": "offset_t",
+    "-d": "duration",
+    "--duration": "duration",
+}
+SERVER_SWITCH_FIELDS = {
+    "-nt": "no_timestamps",
+    "--no-timestamps": "no_timestamps",
+    "-tr": "translate",
+    "--translate": "translate",
+}
+# Output/progress switches that only affect how the CLI writes its results.
+SERVER_IGNORED_SWITCHES = {"-otxt", "--output-txt", "-pp", "--print-progress"}
+# Output switches for whisper.cpp's JSON transcript (segments with offsets;
+# the "full" variant adds per-token probabilities).
+JSON_OUTPUT_SWITCHES = {"-oj", "--output-json", "-ojf", "--output-json-full"}
+
+
+class BackendError(RuntimeError):
+    """Raised when a backend fails to transcribe a file."""
+
+
+def wrapper_command() -> list[str]:
+    """Returns the caffeinate wrapper when available (macOS), otherwise nothing."""
+    if shutil.which(CAFFEINATE_COMMAND[0]):
+        return list(CAFFEINATE_COMMAND)
+    return []
+
+
+class CliBackend:
+    """Runs one whisper.cpp `main` process per file."""
+
+    name = "cli"
+
+    def __init__(self, executable, model_path, threads, processors):
+        self.executable = str(executable)
+        self.model_path = str(model_path)
+        self.threads = str(threads)
+        self.processors = str(processors)
+
+    def command(self, input_wav_path: Path, output_base: Path, decode_args: list[str]):
+        """Builds the full whisper.cpp command line for one file."""
+        return wrapper_command() + [
+            self.executable,
+            "-m",
+            self.model_path,
+            "-t",
+            self.threads,
+            "-p",
+            self.processors,
+            "-f",
+            str(input_wav_path),
+            "-of",
+            str(output_base),
+        ] + list(decode_args)
+
+    def transcribe(
+        self, input_wav_path: Path, output_base: Path, decode_args: list[str], run=None
+    ):
+        """
+        Transcribes one file, writing whisper.cpp's outputs next to output_base.
+        Output is streamed to `run` (a metrics.FileRun) while whisper.cpp works.
+
+        Raises:
+            subprocess.CalledProcessError: If whisper.cpp exits with an error.
+            FileNotFoundError: If the whisper.cpp executable cannot be found.
+        """
+        return run_streaming(
+            self.command(input_wav_path, output_base, decode_args),
+            run=run,
+            tag=Path(input_wav_path).name,
+        )
+
+    def transcribe_stream(
+        self, audio_stream, name: str, output_base: Path, decode_args: list[str], run=None
+    ):
+        """
+        Transcribes WAV data read from a pipe (whisper.cpp `-f -`). `name`
+        labels the progress lines.
+
+        Raises:
+            subprocess.CalledProcessError: If whisper.cpp exits with an error.
+            FileNotFoundError: If the whisper.cpp executable cannot be found.
+        """
+        return run_streaming(
+            self.command(Path("-"), output_base, decode_args),
+            run=run,
+            tag=name,
+            stdin=audio_stream,
+        )
+
+    def close(self):
+        pass
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def server_form_fields(decode_args: list[str]) -> dict:
+    """Translates whisper.cpp CLI decode flags into server form fields."""
+    fields = {}
+    args = list(decode_args)
+    i = 0
+    while i < len(args):
+        flag = args[i]
+        if flag in SERVER_VALUE_FIELDS:
+            if i + 1 >= len(args):
+                raise ValueError(f"Missing value for whisper.cpp flag '{flag}'.")
+            fields[SERVER_VALUE_FIELDS[flag]] = args[i + 1]
+            i += 2
+        elif flag in SERVER_SWITCH_FIELDS:
+            fields[SERVER_SWITCH_FIELDS[flag]] = "true"
+            i += 1
+        elif flag in SERVER_IGNORED_SWITCHES or flag in JSON_OUTPUT_SWITCHES:
+            i += 1
+        else:
+            raise ValueError(
+                f"whisper.cpp flag '{flag}' is not supported by the server backend."
+            )
+    return fields
+
+
+class ServerBackend:
+    """
+    Sends files to a long-lived whisper.cpp `server` process.
+
+    Either starts its own server (executable + model_path) on a free local
+    port, or connects to an already running one when `url` is given. The
+    latter is also how a local stand-in server can be used for testing.
+    """
+
+    name = "server"
+
+    def __init__(
+        self,
+        executable=None,
+        model_path=None,
+        threads="8",
+        processors="1",
+        url=None,
+        startup_timeout=300.0,
+        request_timeout=None,
+    ):
+        self.process = None
+        self.request_timeout = request_timeout
+        self.threads = None if url else str(threads)
+        self.processors = None if url else str(processors)
+        if url:
+            self.url = url.rstrip("/")
+        else:
+            port = _free_port()
+            self.url = f"http://127.0.0.1:{port}"
+            command = wrapper_command() + [
+                str(executable),
+                "-m",
+                str(model_path),
+                "-t",
+                str(threads),
+                "-p",
+                str(processors),
+                "--host",
+                "127.0.0.1",
+                "--port",
+                str(port),
+            ]
+            self.process = subprocess.Popen(
+                command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+        self._wait_until_ready(startup_timeout)
+
+    def _wait_until_ready(self, timeout):
+        """Polls the server until it answers HTTP requests (i.e. the model is loaded)."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process is not None and self.process.poll() is not None:
+                raise BackendError(
+                    f"whisper.cpp server exited during startup (code {self.process.returncode})."
+                )
+            try:
+                with urllib.request.urlopen(self.url + "/", timeout=5):
+                    return
+            except urllib.error.HTTPError:
+                # Any HTTP answer means the server is up.
+                return
+            except (urllib.error.URLError, OSError):
+                time.sleep(0.5)
+        self.close()
+        raise BackendError(f"whisper.cpp server at {self.url} did not become ready.")
+
+    def _post_audio(self, audio_file, filename: str, fields: dict, size=None) -> bytes:
+        """
+        Posts a multipart/form-data request, streaming the audio from a file
+        object. Without a known size the body is sent with chunked transfer encoding.
+        """
+        boundary = uuid.uuid4().hex
+        preamble = b"".join(
+            (
+                f"--{boundary}\r\n"
+                f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+                f"{value}\r\n"
+            ).encode("utf-8")
+            for name, value in fields.items()
+        )
+        preamble += (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            "Content-Type: audio/wav\r\n\r\n"
+        ).encode("utf-8")
+        epilogue = f"\r\n--{boundary}--\r\n".encode("utf-8")
+
+        def body():
+            yield preamble
+            while chunk := audio_file.read(1 << 20):
+                yield chunk
+            yield epilogue
+
+        headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+        if size is not None:
+            headers["Content-Length"] = str(len(preamble) + size + len(epilogue))
+        else:
+            headers["Transfer-Encoding"] = "chunked"
+        request = urllib.request.Request(
+            self.url + "/inference", data=body(), method="POST", headers=headers
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.request_timeout) as response:
+                return response.read()
+        except urllib.error.HTTPError as e:
+            raise BackendError(
+                f"whisper.cpp server returned HTTP {e.code}: {e.read().decode('utf-8', 'replace')}"
+            ) from e
+        except (urllib.error.URLError, OSError) as e:
+            raise BackendError(f"Could not reach whisper.cpp server at {self.url}: {e}") from e
+
+    def transcribe(
+        self, input_wav_path: Path, output_base: Path, decode_args: list[str], run=None
+    ):
+        """
+        Transcribes one file and writes `<output_base>.txt`, or `<output_base>.json`
+        in whisper.cpp's -oj layout when the decode args ask for JSON output.
+
+        The server does not stream progress, so only timing and (on Linux) the
+        server's peak RSS are reported to `run`.
+
+        Raises:
+            BackendError: If the server cannot be reached or rejects the request.
+        """
+        start_time = time.monotonic()
+        try:
+            with open(input_wav_path, "rb") as audio_file:
+                return self._transcribe(
+                    audio_file,
+                    Path(input_wav_path).name,
+                    output_base,
+                    decode_args,
+                    Path(input_wav_path).stat().st_size,
+                )
+        finally:
+            if run is not None:
+                run.add_process(
+                    time.monotonic() - start_time,
+                    process_peak_rss_bytes(self.process.pid) if self.process else None,
+                )
+
+    def transcribe_stream(
+        self, audio_stream, name: str, output_base: Path, decode_args: list[str], run=None
+    ):
+        """
+        Transcribes WAV data read from a pipe, uploading it as it arrives.
+        `name` is the filename sent to the server.
+
+        Raises:
+            BackendError: If the server cannot be reached or rejects the request.
+        """
+        start_time = time.monotonic()
+        try:
+            return self._transcribe(audio_stream, name, output_base, decode_args)
+        finally:
+            if run is not None:
+                run.add_process(
+                    time.monotonic() - start_time,
+                    process_peak_rss_bytes(self.process.pid) if self.process else None,
+                )
+
+    def _transcribe(self, audio_file, name, output_base: Path, decode_args: list[str], size=None):
+        fields = server_form_fields(decode_args)
+        if JSON_OUTPUT_SWITCHES.intersection(decode_args):
+            fields["response_format"] = "verbose_json"
+            response = json.loads(self._post_audio(audio_file, name, fields, size))
+            transcript = {
+                "transcription": [
+                    {
+                        "offsets": {
+                            "from": int(round(segment["start"] * 1000)),
+                            "to": int(round(segment["end"] * 1000)),
+                        },
+                        "text": segment["text"],
+                        # The server reports confidence per segment instead of per token
+                        "avg_logprob": segment.get("avg_logprob"),
+                    }
+                    for segment in response.get("segments", [])
+                ]
+            }
+            Path(f"{output_base}.json").write_text(
+                json.dumps(transcript, ensure_ascii=False), encoding="utf-8"
+            )
+            return transcript
+
+        fields["response_format"] = "text"
+        text = self._post_audio(audio_file, name, fields, size).decode("utf-8")
+        Path(f"{output_base}.txt").write_text(text, encoding="utf-8")
+        return text
+
+    def close(self):
+        """Stops the server if this backend started it."""
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.process = None
+
+
+class BackendPool:
+    """
+    A fixed set of backends shared by worker threads. Each worker borrows one
+    backend at a time, so a server backend never receives concurrent requests.
+    """
+
+    def __init__(self, backends):
+        self.size = len(backends)
+        self._backends = queue.Queue()
+        for backend in backends:
+            self._backends.put(backend)
+        first = backends[0]
+        self.settings = {
+            "backend": first.name,
+            "threads": first.threads,
+            "processors": first.processors,
+            "workers": self.size,
+        }
+
+    @contextmanager
+    def borrow(self):
+        backend = self._backends.get()
+        try:
+            yield backend
+        finally:
+            self._backends.put(backend)
+
+    def close(self):
+        while not self._backends.empty():
+            self._backends.get().close()
+
+
+def create_backend(
+    kind,
+    cli_executable,
+    server_executable,
+    model_path,
+    threads,
+    processors,
+    server_url=None,
+):
+    """
+    Creates the requested backend, falling back to the CLI when the server
+    cannot be started.
+    """
+    if kind == "server":
+        try:
+            return ServerBackend(
+                server_executable,
+                model_path,
+                threads=threads,
+                processors=processors,
+                url=server_url,
+            )
+        except (BackendError, OSError) as e:
+            print(f"Warning: whisper.cpp server unavailable ({e}).")
+            print("Falling back to one whisper.cpp process per file.")
+    return CliBackend(cli_executable, model_path, threads, processors)
+
+
+def create_backend_pool(
+    kind,
+    size,
+    cli_executable,
+    server_executable,
+    model_path,
+    threads,
+    processors,
+    server_url=None,
+):
+    """
+    Creates a BackendPool of `size` backends (see create_backend). An external
+    server (server_url) is shared: it decodes one request at a time, so the
+    pool holds a single backend for it and workers take turns.
+    """
+    if kind == "server" and server_url:
+        size = 1
+    return BackendPool(
+        [
+            create_backend(
+                kind,
+                cli_executable,
+                server_executable,
+                model_path,
+                threads,
+                processors,
+                server_url,
+            )
+            for _ in range(max(1, size))
+        ]
+    )
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# flake8: noqa
+
+"""
+Repeatable benchmark for the transcription wrapper.
+
+Runs transcriber.transcribe_file against stub_whisper.py (which burns CPU in
+proportion to the audio length instead of running a model) on synthetic WAV
+fixtures, so it works offline on any Linux box. It measures:
+
+  - overhead:   wrapper time per file on top of a bare stub process
+  - throughput: audio seconds transcribed per wall second for a batch, for
+                each workers x threads x processors configuration
+
+Results can be saved as a baseline and later runs are printed next to it.
+
+Usage:
+    python3 benchmark.py --save-baseline
+    python3 benchmark.py                      # compare with the saved baseline
+    python3 benchmark.py --configs 1x8x1,2x4x1,4x2x1 --cost 0.05
+"""
+
+import argparse
+import array
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import wave
+from pathlib import Path
+
+import transcriber
+from backends import create_backend_pool
+from scheduler import default_core_budget, order_longest_first, run_pool
+
+DEFAULT_BASELINE = Path.home() / ".cache" / "nasikh-nexus" / "benchmark-baseline.json"
+STUB_EXECUTABLE = Path(__file__).resolve().parent / "stub_whisper.py"
+
+SAMPLE_RATE = 16000
+# Batch used for the throughput runs (seconds of audio per file)
+BATCH_DURATIONS = (300, 240, 180, 120, 90, 60, 30, 30)
+OVERHEAD_DURATION = 1
+OVERHEAD_RUNS = 10
+# workers x threads x processors
+DEFAULT_CONFIGS = ("1x4x1", "1x2x2", "2x2x1", "4x1x1")
+
+
+def write_fixture(path: Path, seconds: int):
+    """Writes a 16 kHz mono WAV of a tone with a slow amplitude envelope (speech-like energy)."""
+    one_second = array.array(
+        "h",
+        (
+            int(
+                8000
+                * (0.6 + 0.4 * math.sin(2 * math.pi * 4 * n / SAMPLE_RATE))
+                * math.sin(2 * math.pi * 220 * n / SAMPLE_RATE)
+            )
+            for n in range(SAMPLE_RATE)
+        ),
+    ).tobytes()
+    with wave.open(str(path), "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(SAMPLE_RATE)
+        for _ in range(seconds):
+            wav_file.writeframes(one_second)
+
+
+def parse_config(config: str):
+    workers, threads, processors = (int(part) for part in config.split("x"))
+    return workers, threads, processors
+
+
+def make_pool(workers, threads, processors):
+    return create_backend_pool(
+        "cli", workers, STUB_EXECUTABLE, None, "stub-model.bin", threads, processors, None
+    )
+
+
+def stub_command(wav_path: Path, output_base: Path):
+    return [
+        str(STUB_EXECUTABLE),
+        "-m",
+        "stub-model.bin",
+        "-t",
+        "1",
+        "-p",
+        "1",
+        "-f",
+        str(wav_path),
+        "-of",
+        str(output_base),
+    ] + list(transcriber.PROFILES["bilingual"])
+
+
+def measure_overhead(work_dir: Path) -> dict:
+    """Median wall time of a bare stub process vs. one file through transcribe_file."""
+    wav_path = work_dir / "overhead.wav"
+    write_fixture(wav_path, OVERHEAD_DURATION)
+
+    bare = []
+    for index in range(OVERHEAD_RUNS):
+        start_time = time.monotonic()
+        subprocess.run(
+            stub_command(wav_path, work_dir / f"bare-{index}"), check=True, capture_output=True
+        )
+        bare.append(time.monotonic() - start_time)
+
+    wrapped = []
+    backend_pool = make_pool(1, 1, 1)
+    try:
+        for index in range(OVERHEAD_RUNS):
+            (transcriber.transcripts_output_dir / "overhead.txt").unlink(missing_ok=True)
+            start_time = time.monotonic()
+            with contextlib.redirect_stdout(io.StringIO()):
+                status = transcriber.transcribe_file(wav_path, backend_pool, verbose=False)
+            wrapped.append(time.monotonic() - start_time)
+            if status != "success":
+                raise RuntimeError(f"Benchmark run failed with status: {status}")
+    finally:
+        backend_pool.close()
+
+    bare_ms = statistics.median(bare) * 1000
+    wrapped_ms = statistics.median(wrapped) * 1000
+    return {
+        "overhead.bare_process_ms": round(bare_ms, 1),
+        "overhead.per_file_ms": round(wrapped_ms, 1),
+        "overhead.wrapper_ms": round(wrapped_ms - bare_ms, 1),
+    }
+
+
+def measure_throughput(batch, config: str) -> dict:
+    """Transcribes the batch with one configuration. Returns audio seconds per wall second."""
+    workers, threads, processors = parse_config(config)
+    for wav_path in batch:
+        (transcriber.transcripts_output_dir / f"{wav_path.stem}.txt").unlink(missing_ok=True)
+    backend_pool = make_pool(workers, threads, processors)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            results, stats = run_pool(
+                order_longest_first(batch),
+                lambda wav_path: transcriber.transcribe_file(wav_path, backend_pool, verbose=False),
+                workers,
+            )
+    finally:
+        backend_pool.close()
+    failed = [path.name for path, status in results.items() if status != "success"]
+    if failed:
+        raise RuntimeError(f"Benchmark files failed: {', '.join(failed)}")
+    return {
+        f"throughput.{config}.wall_seconds": round(stats["wall_seconds"], 2),
+        f"throughput.{config}.audio_x": round(stats["audio_seconds"] / stats["wall_seconds"], 1),
+    }
+
+
+def run_benchmarks(configs, load_seconds, cost) -> dict:
+    os.environ["STUB_LOAD_SECONDS"] = str(load_seconds)
+    os.environ["STUB_COST"] = str(cost)
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="nasikh-benchmark-") as temp_dir:
+        work_dir = Path(temp_dir)
+        # Route the transcriber's executable and outputs to the stub and the temp folder
+        transcriber.whisper_cpp_executable = str(STUB_EXECUTABLE)
+        transcriber.transcripts_output_dir = work_dir / "transcripts"
+        transcriber.transcripts_output_dir.mkdir()
+        transcriber.model_path = "stub-model.bin"
+
+        print("Generating fixtures...")
+        batch = []
+        for index, seconds in enumerate(BATCH_DURATIONS):
+            wav_path = work_dir / f"fixture-{index:02d}-{seconds}s.wav"
+            write_fixture(wav_path, seconds)
+            batch.append(wav_path)
+
+        print("Measuring per-file overhead...")
+        results.update(measure_overhead(work_dir))
+        for config in configs:
+            print(f"Measuring batch throughput ({config})...")
+            results.update(measure_throughput(batch, config))
+    return results
+
+
+def format_table(results: dict, baseline: dict = None) -> str:
+    """Formats current results (and the baseline, if any) as an aligned table."""
+    rows = [("Metric", "Baseline", "Current", "Change")]
+    for name, value in results.items():
+        base = (baseline or {}).get(name)
+        change = ""
+        if base:
+            change = f"{(value - base) / base:+.1%}"
+        rows.append((name, "" if base is None else str(base), str(value), change))
+    widths = [max(len(row[column]) for row in rows) for column in range(4)]
+    lines = [
+        "  ".join(
+            cell.ljust(widths[column]) if column == 0 else cell.rjust(widths[column])
+            for column, cell in enumerate(row)
+        )
+        for row in rows
+    ]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the transcription wrapper with a stub whisper.cpp.")
+    parser.add_argument(
+        "--configs",
+        default=",".join(DEFAULT_CONFIGS),
+        help=f"Comma-separated workers x threads x processors settings (default: {','.join(DEFAULT_CONFIGS)}).",
+    )
+    parser.add_argument("--load-seconds", type=float, default=0.2, help="Stub model load time per process (default: 0.2).")
+    parser.add_argument("--cost", type=float, default=0.02, help="Stub core-seconds per audio second (default: 0.02).")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help=f"Baseline file (default: {DEFAULT_BASELINE}).")
+    parser.add_argument("--save-baseline", action="store_true", help="Save this run as the new baseline.")
+    args = parser.parse_args()
+
+    configs = [config.strip() for config in args.configs.split(",") if config.strip()]
+    results = run_benchmarks(configs, args.load_seconds, args.cost)
+
+    baseline_path = Path(args.baseline)
+    baseline = None
+    if baseline_path.exists():
+        saved = json.loads(baseline_path.read_text(encoding="utf-8"))
+        if saved.get("settings") == {"load_seconds": args.load_seconds, "cost": args.cost}:
+            baseline = saved["results"]
+        else:
+            print(f"Baseline at {baseline_path} used other stub settings; not comparing.")
+
+    print(f"\nCores available: {default_core_budget()} | Python {platform.python_version()}")
+    print(format_table(results, baseline))
+
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(
+            json.dumps(
+                {
+                    "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "settings": {"load_seconds": args.load_seconds, "cost": args.cost},
+                    "results": results,
+                },
+                indent=2,
+            ),
+            encoding="utf-8",
+        )
+        print(f"\nBaseline saved to: {baseline_path}")
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# flake8: noqa
+
+"""
+Content-addressed transcript cache.
+
+Transcripts are stored under a key built from a fast content hash of the
+audio, the model file, and every decode setting (language, beam, prompt,
+thresholds, chunking/VAD mode). A renamed file is restored from the cache
+instead of being transcribed again. A changed prompt or beam setting gives a
+new key, so old outputs are no longer treated as current.
+
+The cache is bounded in size. The least recently used entries are evicted
+first. Audio hashes are remembered by path, size and mtime, so checking an
+unchanged file again reads none of its audio.
+
+Usage:
+    python3 cache.py stats [--cache-max-gb 20]
+    python3 cache.py clear
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+from media import audio_duration
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "nasikh-nexus" / "transcripts"
+DEFAULT_MAX_BYTES = 2 * 1024**3
+
+# Transcript files copied into/out of a cache entry.
+CACHED_SUFFIXES = (".txt", ".srt", ".json")
+
+# Fast hash: file size + head + tail + evenly spaced samples of the content.
+HASH_EDGE_BYTES = 4 * 1024**2
+HASH_SAMPLE_BYTES = 64 * 1024
+HASH_SAMPLES = 32
+
+# Switches that only change console output, not the transcript.
+IGNORED_SWITCHES = {"-pp", "--print-progress"}
+
+# Per-output-folder record of which cache key produced each transcript.
+OUTPUT_KEYS_FILENAME = ".transcript-keys.json"
+
+# Audio hashes by resolved path, with the size and mtime they were computed for.
+AUDIO_HASHES_FILENAME = "audio-hashes.json"
+
+
+def fast_file_hash(path: Path) -> str:
+    """
+    Hashes a file's size, first and last 4 MB, and 32 evenly spaced 64 KB
+    samples. This reads at most ~10 MB however large the file is.
+    """
+    size = path.stat().st_size
+    digest = hashlib.blake2b(str(size).encode("ascii"), digest_size=20)
+    with open(path, "rb") as f:
+        if size <= 2 * HASH_EDGE_BYTES + HASH_SAMPLES * HASH_SAMPLE_BYTES:
+            while chunk := f.read(1 << 20):
+                digest.update(chunk)
+            return digest.hexdigest()
+        digest.update(f.read(HASH_EDGE_BYTES))
+        stride = (size - 2 * HASH_EDGE_BYTES) // HASH_SAMPLES
+        for index in range(HASH_SAMPLES):
+            f.seek(HASH_EDGE_BYTES + index * stride)
+            digest.update(f.read(HASH_SAMPLE_BYTES))
+        f.seek(size - HASH_EDGE_BYTES)
+        digest.update(f.read(HASH_EDGE_BYTES))
+    return digest.hexdigest()
+
+
+class TranscriptCache:
+    """A size-bounded transcript cache for one whisper.cpp model."""
+
+    def __init__(self, model_path, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        model_path = Path(model_path)
+        # The model is identified by content where possible (it may be replaced in place)
+        self.model_id = (
+            fast_file_hash(model_path) if model_path.is_file() else str(model_path)
+        )
+        self._audio_hashes = self._read_json(self.cache_dir / AUDIO_HASHES_FILENAME)
+
+    # --- Keys ---
+
+    def key(self, input_wav_path: Path, decode_args, **mode) -> str:
+        """
+        Builds the cache key for one file.
+
+        Args:
+            input_wav_path: The audio file.
+            decode_args: The profile's whisper.cpp decode flags.
+            mode: Any other settings that change the output (chunking, VAD, ...).
+                Settings that are off are left out, so scripts that do not
+                offer one (e.g. two_pass) share entries with those that do.
+        """
+        material = {
+            "audio": self.audio_hash(input_wav_path),
+            "model": self.model_id,
+            "decode_args": [arg for arg in decode_args if arg not in IGNORED_SWITCHES],
+            "mode": {name: value for name, value in mode.items() if value},
+        }
+        encoded = json.dumps(material, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        return hashlib.blake2b(encoded, digest_size=20).hexdigest()
+
+    def audio_hash(self, input_wav_path: Path) -> str:
+        """fast_file_hash of the audio, reused while the file's size and mtime are unchanged."""
+        path = Path(input_wav_path).resolve()
+        stat = path.stat()
+        stamp = [stat.st_size, stat.st_mtime_ns]
+        remembered = self._audio_hashes.get(str(path))
+        if remembered and remembered["stamp"] == stamp:
+            return remembered["hash"]
+        digest = fast_file_hash(path)
+        hashes_file = self.cache_dir / AUDIO_HASHES_FILENAME
+        with self._lock:
+            # Merged with what other processes have written since
+            self._audio_hashes = self._read_json(hashes_file)
+            self._audio_hashes[str(path)] = {"stamp": stamp, "hash": digest}
+            self._write_json(hashes_file, self._audio_hashes)
+        return digest
+
+    def _entry_dir(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key
+
+    # --- Restore / store ---
+
+    def restore(self, key: str, output_base: Path) -> bool:
+        """Copies a cached transcript into place. Returns False on a cache miss."""
+        entry_dir = self._entry_dir(key)
+        meta_path = entry_dir / "meta.json"
+        if not meta_path.exists():
+            self._update_stats(misses=1)
+            return False
+        for cached_file in entry_dir.iterdir():
+            if cached_file.suffix in CACHED_SUFFIXES:
+                shutil.copyfile(cached_file, f"{output_base}{cached_file.suffix}")
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        # Touch the entry so LRU eviction keeps it
+        os.utime(entry_dir)
+        self._update_stats(
+            hits=1,
+            bytes_saved=meta.get("audio_bytes", 0),
+            audio_seconds_saved=meta.get("audio_seconds", 0.0),
+        )
+        self.record_output(output_base, key)
+        return True
+
+    def store(self, key: str, output_base: Path, input_wav_path: Path):
+        """Copies freshly written transcripts into the cache, then enforces the size bound."""
+        entry_dir = self._entry_dir(key)
+        partial_dir = entry_dir.with_name(f"{key}.partial-{os.getpid()}-{threading.get_ident()}")
+        partial_dir.mkdir(parents=True, exist_ok=True)
+        for suffix in CACHED_SUFFIXES:
+            output_file = Path(f"{output_base}{suffix}")
+            if output_file.exists():
+                shutil.copyfile(output_file, partial_dir / f"transcript{suffix}")
+        meta = {
+            "source_name": Path(input_wav_path).name,
+            "audio_bytes": Path(input_wav_path).stat().st_size,
+            "audio_seconds": audio_duration(Path(input_wav_path)),
+            "created": time.time(),
+        }
+        (partial_dir / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        partial_dir.replace(entry_dir)
+        self.record_output(output_base, key)
+        self.evict()
+
+    # --- Output records (detect transcripts made with other settings) ---
+
+    def record_output(self, output_base: Path, key: str):
+        output_base = Path(output_base)
+        keys_file = output_base.parent / OUTPUT_KEYS_FILENAME
+        with self._lock:
+            keys = self._read_json(keys_file)
+            keys[output_base.name] = key
+            self._write_json(keys_file, keys)
+
+    def output_is_stale(self, output_base: Path, key: str) -> bool:
+        """
+        True when the existing transcript was produced with different audio,
+        model or settings. Transcripts with no record (made before the cache
+        existed) are treated as current.
+        """
+        output_base = Path(output_base)
+        recorded = self._read_json(output_base.parent / OUTPUT_KEYS_FILENAME)
+        return output_base.name in recorded and recorded[output_base.name] != key
+
+    def has_output_record(self, output_base: Path) -> bool:
+        """True when the cache knows which key produced this transcript (see output_is_stale)."""
+        output_base = Path(output_base)
+        return output_base.name in self._read_json(output_base.parent / OUTPUT_KEYS_FILENAME)
+
+    # --- Eviction and stats ---
+
+    def entries(self):
+        """Returns (entry_dir, size_bytes, last_used) for every cache entry."""
+        entries = []
+        for entry_dir in self.cache_dir.glob("??/*"):
+            if not entry_dir.is_dir() or ".partial-" in entry_dir.name:
+                continue
+            size = sum(f.stat().st_size for f in entry_dir.iterdir() if f.is_file())
+            entries.append((entry_dir, size, entry_dir.stat().st_mtime))
+        return entries
+
+    def evict(self):
+        """Removes least recently used entries until the cache fits in max_bytes."""
+        with self._lock:
+            entries = sorted(self.entries(), key=lambda entry: entry[2])
+            total = sum(size for _, size, _ in entries)
+            evicted = 0
+            for entry_dir, size, _ in entries:
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                total -= size
+                evicted += 1
+        if evicted:
+            self._update_stats(evictions=evicted)
+
+    def stats(self) -> dict:
+        stats = self._read_json(self.cache_dir / "stats.json")
+        entries = self.entries()
+        stats["entries"] = len(entries)
+        stats["size_bytes"] = sum(size for _, size, _ in entries)
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._audio_hashes = {}
+            for child in self.cache_dir.iterdir():
+                if child.is_dir():
+                    shutil.rmtree(child, ignore_errors=True)
+                else:
+                    child.unlink(missing_ok=True)
+
+    def _update_stats(self, **increments):
+        stats_file = self.cache_dir / "stats.json"
+        with self._lock:
+            stats = self._read_json(stats_file)
+            for name, value in increments.items():
+                stats[name] = stats.get(name, 0) + value
+            self._write_json(stats_file, stats)
+
+    @staticmethod
+    def _read_json(path: Path) -> dict:
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    @staticmethod
+    def _write_json(path: Path, data: dict):
+        temp_path = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+        temp_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        temp_path.replace(path)
+
+
+def print_stats(cache: TranscriptCache):
+    stats = cache.stats()
+    hits = stats.get("hits", 0)
+    misses = stats.get("misses", 0)
+    lookups = hits + misses
+    print("--- Transcript Cache ---")
+    print(f"Location: {cache.cache_dir}")
+    print(f"Entries: {stats['entries']} ({stats['size_bytes'] / 1024**2:.1f} MB of {cache.max_bytes / 1024**2:.0f} MB)")
+    print(f"Lookups: {lookups} ({hits} hits, {misses} misses)")
+    if lookups:
+        print(f"Hit rate: {hits / lookups:.1%}")
+    print(f"Audio not re-transcribed: {stats.get('bytes_saved', 0) / 1024**3:.2f} GB "
+          f"({stats.get('audio_seconds_saved', 0) / 3600:.1f} hours)")
+    print(f"Evictions: {stats.get('evictions', 0)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or clear the transcript cache.")
+    parser.add_argument("command", choices=("stats", "clear"))
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR))
+    parser.add_argument(
+        "--cache-max-gb",
+        type=float,
+        default=DEFAULT_MAX_BYTES / 1024**3,
+        help="The size limit the transcription scripts run with, for the stats report (default: 2).",
+    )
+    args = parser.parse_args()
+
+    # The model only matters for keys, which these commands do not build
+    cache = TranscriptCache(
+        model_path="", cache_dir=args.cache_dir, max_bytes=int(args.cache_max_gb * 1024**3)
+    )
+    if args.command == "stats":
+        print_stats(cache)
+    else:
+        cache.clear()
+        print(f"Cleared transcript cache at: {cache.cache_dir}")
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# flake8: noqa
+
+"""
+Chunked transcription for long recordings.
+
+A long WAV is split into overlapping windows that are transcribed in parallel
+(one whisper.cpp process per window). Each finished window is kept on disk as
+whisper.cpp JSON in `<output_base>.chunks/`, so an interrupted run only redoes
+the windows that are missing. Once every window exists, the segments are
+shifted to global timestamps, the overlaps are de-duplicated and a single
+`.txt`, `.srt` and whisper.cpp-style `.json` transcript is written.
+
+The folder also holds the settings its windows were made with (the input
+file's size and mtime, the windows and the decode flags). A run with other
+settings discards the folder instead of stitching in stale windows.
+"""
+
+import json
+import shutil
+import subprocess
+import wave
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from backends import BackendError, JSON_OUTPUT_SWITCHES
+
+# Output switches replaced by -oj while decoding windows.
+OUTPUT_SWITCHES = {
+    "-otxt",
+    "--output-txt",
+    "-osrt",
+    "--output-srt",
+    "-ovtt",
+    "--output-vtt",
+    "-ocsv",
+    "--output-csv",
+    "-ojf",
+    "--output-json-full",
+} | JSON_OUTPUT_SWITCHES
+# Segment times place each window's (or span's) text on the global timeline;
+# with -nt whisper.cpp would report every segment at 0.
+NO_TIMESTAMP_SWITCHES = {"-nt", "--no-timestamps"}
+
+DEFAULT_WINDOW_SECONDS = 600.0
+DEFAULT_OVERLAP_SECONDS = 10.0
+
+# Written into `<output_base>.chunks/`; see chunk_settings.
+CHUNK_SETTINGS_FILENAME = "settings.json"
+
+
+def plan_windows(duration, window_seconds, overlap_seconds):
+    """
+    Splits [0, duration) into windows of window_seconds that overlap by
+    overlap_seconds.
+
+    Returns:
+        A list of (start, end) tuples in seconds.
+    """
+    if overlap_seconds >= window_seconds:
+        raise ValueError("The overlap must be shorter than the window.")
+    windows = []
+    step = window_seconds - overlap_seconds
+    start = 0.0
+    while True:
+        end = min(start + window_seconds, duration)
+        windows.append((start, end))
+        if end >= duration:
+            break
+        start += step
+    return windows
+
+
+def json_decode_args(decode_args):
+    """Replaces the profile's output switches with whisper.cpp JSON output, with timestamps."""
+    return [
+        arg
+        for arg in decode_args
+        if arg not in OUTPUT_SWITCHES and arg not in NO_TIMESTAMP_SWITCHES
+    ] + ["-oj"]
+
+
+def chunk_settings(input_wav_path, windows, window_args):
+    """Everything the finished windows depend on, in the form stored in the work folder."""
+    stat = Path(input_wav_path).stat()
+    settings = {
+        "input": {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns},
+        "windows": windows,
+        "decode_args": window_args,
+    }
+    # Round-tripped so it compares equal to the stored copy (tuples become lists)
+    return json.loads(json.dumps(settings))
+
+
+def prepare_work_dir(work_dir: Path, settings: dict):
+    """Creates the work folder, first discarding one left by a run with other settings."""
+    settings_path = work_dir / CHUNK_SETTINGS_FILENAME
+    if work_dir.exists():
+        try:
+            stored = json.loads(settings_path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            stored = None
+        if stored != settings:
+            print(f"Discarding windows made with other settings: {work_dir}")
+            shutil.rmtree(work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    settings_path.write_text(json.dumps(settings), encoding="utf-8")
+
+
+def write_window_wav(source_wav_path, window_wav_path, start, end):
+    """Copies [start, end) seconds of a WAV into a new WAV file, block by block."""
+    with wave.open(str(source_wav_path), "rb") as source:
+        rate = source.getframerate()
+        first_frame = int(start * rate)
+        frames_left = int(end * rate) - first_frame
+        source.setpos(first_frame)
+        with wave.open(str(window_wav_path), "wb") as window:
+            window.setparams(source.getparams())
+            while frames_left > 0:
+                frames = source.readframes(min(frames_left, rate * 60))
+                if not frames:
+                    break
+                window.writeframes(frames)
+                frames_left -= min(frames_left, rate * 60)
+
+
+def load_segments(window_json_path, offset_seconds):
+    """Reads a whisper.cpp JSON transcript and shifts its segments to global time."""
+    with open(window_json_path, "r", encoding="utf-8") as f:
+        transcript = json.load(f)
+    offset_ms = int(round(offset_seconds * 1000))
+    return [
+        {
+            "start": segment["offsets"]["from"] + offset_ms,
+            "end": segment["offsets"]["to"] + offset_ms,
+            "text": segment["text"].strip(),
+        }
+        for segment in transcript.get("transcription", [])
+        if segment["text"].strip()
+    ]
+
+
+def stitch_windows(window_segments, windows):
+    """
+    Merges per-window segments into one list.
+
+    Each overlap is cut at its midpoint: a window contributes only the
+    segments that start between the previous cut and the next one. A segment
+    repeated verbatim across a cut is kept once.
+    """
+    cuts = [0.0]
+    for (_, previous_end), (next_start, _) in zip(windows, windows[1:]):
+        cuts.append((previous_end + next_start) / 2)
+    cuts.append(float("inf"))
+
+    merged = []
+    for index, segments in enumerate(window_segments):
+        lower_ms = cuts[index] * 1000
+        upper_ms = cuts[index + 1] * 1000
+        for segment in segments:
+            if not lower_ms <= segment["start"] < upper_ms:
+                continue
+            if merged and merged[-1]["text"] == segment["text"]:
+                continue
+            merged.append(segment)
+    return merged
+
+
+def format_srt_timestamp(ms):
+    hours, ms = divmod(int(ms), 3_600_000)
+    minutes, ms = divmod(ms, 60_000)
+    seconds, ms = divmod(ms, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{ms:03d}"
+
+
+def write_transcripts(segments, output_base):
+    """Writes segments as `<output_base>.txt`, `.srt` and whisper.cpp-style `.json`."""
+    transcript = {
+        "transcription": [
+            {
+                "offsets": {"from": segment["start"], "to": segment["end"]},
+                "text": segment["text"],
+            }
+            for segment in segments
+        ]
+    }
+    with open(f"{output_base}.json", "w", encoding="utf-8") as f:
+        json.dump(transcript, f, ensure_ascii=False)
+    with open(f"{output_base}.txt", "w", encoding="utf-8") as f:
+        for segment in segments:
+            f.write(segment["text"] + "\n")
+    with open(f"{output_base}.srt", "w", encoding="utf-8") as f:
+        for number, segment in enumerate(segments, 1):
+            f.write(f"{number}\n")
+            f.write(
+                f"{format_srt_timestamp(segment['start'])} --> "
+                f"{format_srt_timestamp(segment['end'])}\n"
+            )
+            f.write(segment["text"] + "\n\n")
+
+
+def transcribe_chunked(
+    input_wav_path,
+    output_base,
+    backend_pool,
+    decode_args,
+    duration,
+    window_seconds=DEFAULT_WINDOW_SECONDS,
+    overlap_seconds=DEFAULT_OVERLAP_SECONDS,
+    run=None,
+):
+    """
+    Transcribes a long WAV as overlapping windows, one per pooled backend at a time.
+
+    Args:
+        input_wav_path: The long .wav file.
+        output_base: Output path without extension (as passed to whisper.cpp -of).
+        backend_pool: A backends.BackendPool; its size is the window parallelism.
+        decode_args: The profile's whisper.cpp decode flags.
+        duration: Length of the recording in seconds.
+        run: Optional metrics.FileRun that receives each window's progress.
+
+    Returns:
+        True when every window succeeded and the merged transcript was written.
+        Otherwise the finished windows stay in `<output_base>.chunks/` for the
+        next run with the same settings.
+
+    Raises:
+        FileNotFoundError: If the whisper.cpp executable cannot be found.
+    """
+    windows = plan_windows(duration, window_seconds, overlap_seconds)
+    work_dir = Path(f"{output_base}.chunks")
+    window_args = json_decode_args(decode_args)
+    prepare_work_dir(work_dir, chunk_settings(input_wav_path, windows, window_args))
+
+    def window_base(index):
+        return work_dir / f"window-{index:04d}"
+
+    missing = [
+        index
+        for index in range(len(windows))
+        if not Path(f"{window_base(index)}.json").exists()
+    ]
+    print(
+        f"Chunked mode: {len(windows)} windows of {window_seconds:.0f}s "
+        f"({overlap_seconds:.0f}s overlap), {len(windows) - len(missing)} already done."
+    )
+
+    def transcribe_window(index):
+        start, end = windows[index]
+        window_wav_path = Path(f"{window_base(index)}.wav")
+        write_window_wav(input_wav_path, window_wav_path, start, end)
+        try:
+            with backend_pool.borrow() as backend:
+                # Write to a temporary base so a crash never leaves a partial window behind
+                partial_base = Path(f"{window_base(index)}.partial")
+                backend.transcribe(window_wav_path, partial_base, window_args, run=run)
+                Path(f"{partial_base}.json").replace(f"{window_base(index)}.json")
+        finally:
+            window_wav_path.unlink(missing_ok=True)
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=backend_pool.size) as executor:
+        futures = {executor.submit(transcribe_window, index): index for index in missing}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                future.result()
+                print(f"  Window {index + 1}/{len(windows)} done.")
+            except subprocess.CalledProcessError as e:
+                failed += 1
+                print(f"  Window {index + 1}/{len(windows)} failed (return code {e.returncode}).")
+                print(f"  whisper.cpp stderr:\n{e.stderr}")
+            except BackendError as e:
+                failed += 1
+                print(f"  Window {index + 1}/{len(windows)} failed: {e}")
+
+    if failed:
+        print(f"{failed} window(s) failed. Finished windows are kept in: {work_dir}")
+        return False
+
+    window_segments = [
+        load_segments(f"{window_base(index)}.json", start)
+        for index, (start, _) in enumerate(windows)
+    ]
+    write_transcripts(stitch_windows(window_segments, windows), output_base)
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return True
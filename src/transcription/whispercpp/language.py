@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# flake8: noqa
+
+"""
+Fast language detection used to route files between decode profiles.
+
+A few short samples of each recording are cut from the WAV (or decoded from
+compressed media by ffmpeg) and passed to whisper.cpp's language detection
+(-dl) with a small model (e.g. ggml-base).
+The per-sample probabilities are summed and the winning language picks the
+profile (see profiles.profile_for_language). Every decision is appended to a
+JSON-lines routing log. That log doubles as a lookup, so a recording is
+only detected once.
+"""
+
+import json
+import re
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from backends import wrapper_command
+from cache import fast_file_hash
+from chunking import write_window_wav
+from media import audio_duration, is_media, write_media_sample
+from profiles import profile_for_language
+
+DEFAULT_ROUTING_LOG = Path.home() / ".cache" / "nasikh-nexus" / "routing.jsonl"
+
+# e.g. "whisper_full_with_state: auto-detected language: ar (p = 0.954138)"
+DETECTED_PATTERN = re.compile(r"auto-detected language:\s*(\w+)\s*\(p\s*=\s*([\d.]+)\)")
+
+SAMPLE_SECONDS = 30.0
+SAMPLE_COUNT = 3
+
+
+def sample_starts(duration, sample_seconds=SAMPLE_SECONDS, count=SAMPLE_COUNT):
+    """Evenly spread sample start times, skipping the very start (intros) where possible."""
+    if duration <= sample_seconds:
+        return [0.0]
+    usable = duration - sample_seconds
+    return [usable * (index + 1) / (count + 1) for index in range(count)]
+
+
+class LanguageRouter:
+    """Detects each recording's language and picks its decode profile."""
+
+    def __init__(self, executable, model_path, threads="4", log_path=DEFAULT_ROUTING_LOG):
+        self.executable = str(executable)
+        self.model_path = str(model_path)
+        self.threads = str(threads)
+        self.log_path = Path(log_path)
+        self.log_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._decisions = {}
+        if self.log_path.exists():
+            with open(self.log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self._decisions[record["audio_hash"]] = record
+
+    def detect_sample(self, sample_wav_path: Path):
+        """Runs whisper.cpp language detection on one sample. Returns (language, probability)."""
+        command = wrapper_command() + [
+            self.executable,
+            "-m",
+            self.model_path,
+            "-t",
+            self.threads,
+            "-l",
+            "auto",
+            "-dl",
+            "-f",
+            str(sample_wav_path),
+        ]
+        process = subprocess.run(command, check=True, text=True, capture_output=True)
+        match = DETECTED_PATTERN.search(process.stderr) or DETECTED_PATTERN.search(
+            process.stdout
+        )
+        if not match:
+            return None, 0.0
+        return match.group(1), float(match.group(2))
+
+    def detect(self, wav_path: Path):
+        """
+        Detects the dominant language over a few samples.
+
+        Returns:
+            (language, confidence, samples) where samples lists each sample's result.
+
+        Raises:
+            subprocess.CalledProcessError: If whisper.cpp fails.
+            FileNotFoundError: If the whisper.cpp executable cannot be found.
+        """
+        duration = audio_duration(wav_path)
+        write_sample = write_media_sample if is_media(wav_path) else write_window_wav
+        scores = {}
+        samples = []
+        with tempfile.TemporaryDirectory(prefix="nasikh-langid-") as temp_dir:
+            for index, start in enumerate(sample_starts(duration)):
+                sample_wav_path = Path(temp_dir) / f"sample-{index}.wav"
+                write_sample(
+                    wav_path, sample_wav_path, start, min(start + SAMPLE_SECONDS, duration)
+                )
+                language, probability = self.detect_sample(sample_wav_path)
+                samples.append(
+                    {"start": round(start, 1), "language": language, "p": probability}
+                )
+                if language:
+                    scores[language] = scores.get(language, 0.0) + probability
+        if not scores:
+            return None, 0.0, samples
+        language = max(scores, key=scores.get)
+        return language, scores[language] / len(samples), samples
+
+    def route(self, wav_path: Path) -> dict:
+        """
+        Returns the routing decision for a recording, detecting it if it has
+        not been seen before. Undetectable audio falls back to the bilingual profile.
+        """
+        audio_hash = fast_file_hash(wav_path)
+        with self._lock:
+            known = self._decisions.get(audio_hash)
+        if known is not None:
+            return dict(known, reused=True)
+
+        start_time = time.monotonic()
+        language, confidence, samples = self.detect(wav_path)
+        decision = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "file": wav_path.name,
+            "audio_hash": audio_hash,
+            "language": language,
+            "confidence": round(confidence, 4),
+            "profile": profile_for_language(language),
+            "samples": samples,
+            "detect_seconds": round(time.monotonic() - start_time, 2),
+            "detect_model": Path(self.model_path).name,
+        }
+        with self._lock:
+            self._decisions[audio_hash] = decision
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(decision, ensure_ascii=False) + "\n")
+        return dict(decision, reused=False)
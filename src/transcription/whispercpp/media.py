@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# flake8: noqa
+
+"""
+Streaming transcription straight from compressed media.
+
+ffmpeg decodes .mp3/.m4a/.mp4/.opus files to 16 kHz mono 16-bit WAV on its
+stdout, and the stream goes directly to the backend: whisper.cpp reads it on
+stdin (`-f -`), and the server backend uploads it with chunked transfer
+encoding. No WAV is written to disk. Pass keep_wav_path to also save the
+decoded WAV (as convert-to-wav.py would) from the same ffmpeg run.
+
+Reading audio from stdin needs a whisper.cpp build from v1.7 or later.
+"""
+
+import subprocess
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+from scheduler import wav_duration
+
+# The probe index is shared with the conversion scripts in src/utils/audio
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "utils" / "audio"))
+from probe_index import ProbeIndex
+
+# Same inputs as src/utils/audio/convert-to-wav.py
+MEDIA_EXTENSIONS = (".mp3", ".m4a", ".mp4", ".opus")
+# Where convert-to-wav.py puts its WAVs, relative to the media folder
+CONVERTED_SUBDIR = "converted_to_wav"
+
+# The format whisper.cpp expects (same settings as convert-to-wav.py)
+WAV_OUTPUT_ARGS = ["-vn", "-ar", "16000", "-ac", "1", "-c:a", "pcm_s16le", "-f", "wav"]
+
+
+def is_media(path: Path) -> bool:
+    return Path(path).suffix.lower() in MEDIA_EXTENSIONS
+
+
+def kept_wav_path(media_path: Path) -> Path:
+    """Location of the WAV kept by --keep-wav, matching convert-to-wav.py's layout."""
+    media_path = Path(media_path)
+    return media_path.parent / CONVERTED_SUBDIR / f"{media_path.stem}.wav"
+
+
+_probe_index = None
+_probe_index_lock = threading.Lock()
+
+
+def shared_probe_index() -> ProbeIndex:
+    """The process-wide probe index (opened on first use)."""
+    global _probe_index
+    with _probe_index_lock:
+        if _probe_index is None:
+            _probe_index = ProbeIndex()
+        return _probe_index
+
+
+def probe_batch(paths):
+    """
+    Probes a batch of WAV or media files concurrently (cached in the probe index).
+
+    Returns:
+        ({path: duration} for readable files, [(path, error)] for the others).
+    """
+    probes = shared_probe_index().probe_many(paths)
+    durations = {}
+    unreadable = []
+    for path in paths:
+        probe = probes[Path(path).resolve()]
+        if probe["error"]:
+            unreadable.append((path, probe["error"]))
+        else:
+            durations[path] = probe["duration"]
+    return durations, unreadable
+
+
+def media_duration(media_path: Path) -> float:
+    """Returns a media file's duration in seconds (cached ffprobe), or 0.0 if it cannot be read."""
+    return shared_probe_index().duration(media_path)
+
+
+def audio_duration(path: Path) -> float:
+    """Duration of a WAV (read from its header) or of a compressed media file."""
+    return media_duration(path) if is_media(path) else wav_duration(path)
+
+
+def decode_command(media_path: Path, keep_wav_path: Path = None) -> list[str]:
+    """ffmpeg command writing the decoded WAV to stdout (and optionally to a file too)."""
+    command = [
+        "ffmpeg",
+        "-nostdin",
+        "-loglevel",
+        "error",
+        "-i",
+        str(media_path),
+    ] + WAV_OUTPUT_ARGS + ["pipe:1"]
+    if keep_wav_path is not None:
+        command += WAV_OUTPUT_ARGS + ["-y", str(keep_wav_path)]
+    return command
+
+
+def write_media_sample(media_path: Path, sample_wav_path: Path, start, end):
+    """Decodes [start, end) seconds of a media file into a WAV (e.g. a language detection sample)."""
+    command = [
+        "ffmpeg",
+        "-nostdin",
+        "-loglevel",
+        "error",
+        "-ss",
+        f"{start:.3f}",
+        "-t",
+        f"{end - start:.3f}",
+        "-i",
+        str(media_path),
+    ] + WAV_OUTPUT_ARGS + ["-y", str(sample_wav_path)]
+    subprocess.run(command, check=True, capture_output=True)
+
+def transcribe_media(
+    media_path, output_base, backend_pool, decode_args, run=None, keep_wav_path=None
+):
+    """
+    Decodes a media file with ffmpeg and pipes the audio into a borrowed backend.
+
+    Returns:
+        True on success.
+
+    Raises:
+        subprocess.CalledProcessError: If ffmpeg or whisper.cpp fails.
+        backends.BackendError: If the server backend fails.
+        FileNotFoundError: If ffmpeg or the whisper.cpp executable cannot be found.
+    """
+    media_path = Path(media_path)
+    partial_wav_path = None
+    if keep_wav_path is not None:
+        keep_wav_path = Path(keep_wav_path)
+        keep_wav_path.parent.mkdir(parents=True, exist_ok=True)
+        partial_wav_path = keep_wav_path.with_name(f"{keep_wav_path.name}.partial")
+
+    command = decode_command(media_path, partial_wav_path)
+    try:
+        # ffmpeg's stderr goes to a file so a chatty decoder can never block the pipe
+        with tempfile.TemporaryFile() as ffmpeg_log:
+            ffmpeg = subprocess.Popen(
+                command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=ffmpeg_log
+            )
+            try:
+                with backend_pool.borrow() as backend:
+                    backend.transcribe_stream(
+                        ffmpeg.stdout, media_path.name, output_base, decode_args, run=run
+                    )
+            finally:
+                # Closing our end makes ffmpeg stop if whisper.cpp exited early
+                ffmpeg.stdout.close()
+                ffmpeg.wait()
+            if ffmpeg.returncode != 0:
+                ffmpeg_log.seek(0)
+                stderr = ffmpeg_log.read().decode("utf-8", "replace")
+                raise subprocess.CalledProcessError(ffmpeg.returncode, command, "", stderr)
+
+        if partial_wav_path is not None:
+            partial_wav_path.replace(keep_wav_path)
+    except BaseException:
+        # A failed transcription never leaves a half-written WAV behind
+        if partial_wav_path is not None:
+            partial_wav_path.unlink(missing_ok=True)
+        raise
+    return True
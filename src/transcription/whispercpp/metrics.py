@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# flake8: noqa
+
+"""
+Live progress and per-file performance metrics for whisper.cpp runs.
+
+run_streaming() reads whisper.cpp's stdout and stderr as they are produced
+(instead of buffering them until the process exits), reports the -pp
+progress lines, and collects each process's wall time and peak RSS.
+FileRun aggregates those numbers for one input file (several processes in
+chunked mode), and MetricsLog appends one JSON line per file.
+"""
+
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_METRICS_LOG = Path.home() / ".cache" / "nasikh-nexus" / "transcription-metrics.jsonl"
+
+# e.g. "whisper_print_progress_callback: progress =  45%"
+PROGRESS_PATTERN = re.compile(r"progress\s*=\s*(\d+)%")
+# Progress is reported in steps of this many percent.
+PROGRESS_STEP = 10
+
+
+def normalize_maxrss(ru_maxrss: int) -> int:
+    """ru_maxrss is in bytes on macOS and in kilobytes on Linux."""
+    return ru_maxrss if sys.platform == "darwin" else ru_maxrss * 1024
+
+
+class FileRun:
+    """Progress display and resource totals for one input file."""
+
+    def __init__(self, label, echo_output=False):
+        self.label = label
+        self.echo_output = echo_output
+        self.process_count = 0
+        self.process_seconds = 0.0
+        self.peak_rss_bytes = None
+        self._last_progress = {}
+        self._lock = threading.Lock()
+
+    def on_line(self, tag, stream_name, line):
+        """Handles one line of whisper.cpp output as soon as it arrives."""
+        match = PROGRESS_PATTERN.search(line)
+        if match:
+            percent = int(match.group(1))
+            with self._lock:
+                step = percent // PROGRESS_STEP
+                if step <= self._last_progress.get(tag, -1):
+                    return
+                self._last_progress[tag] = step
+            print(f"  [{tag}] {percent}%", flush=True)
+        elif self.echo_output and stream_name == "stdout" and line.strip():
+            print(f"  {line.rstrip()}", flush=True)
+
+    def add_process(self, wall_seconds, peak_rss_bytes):
+        with self._lock:
+            self.process_count += 1
+            self.process_seconds += wall_seconds
+            if peak_rss_bytes is not None:
+                self.peak_rss_bytes = max(self.peak_rss_bytes or 0, peak_rss_bytes)
+
+
+def run_streaming(command, run=None, tag="", stdin=None):
+    """
+    Runs a command, streaming its output to `run` line by line. `stdin` may be
+    a pipe to feed the command (e.g. ffmpeg's stdout).
+
+    Returns:
+        A subprocess.CompletedProcess with the full stdout/stderr text.
+
+    Raises:
+        subprocess.CalledProcessError: If the command exits with an error.
+        FileNotFoundError: If the executable cannot be found.
+    """
+    start_time = time.monotonic()
+    process = subprocess.Popen(
+        command,
+        stdin=stdin,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        bufsize=1,
+        errors="replace",
+    )
+    captured = {"stdout": [], "stderr": []}
+
+    def pump(stream, stream_name):
+        for line in stream:
+            captured[stream_name].append(line)
+            if run is not None:
+                run.on_line(tag, stream_name, line)
+        stream.close()
+
+    readers = [
+        threading.Thread(target=pump, args=(process.stdout, "stdout"), daemon=True),
+        threading.Thread(target=pump, args=(process.stderr, "stderr"), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+
+    peak_rss_bytes = None
+    try:
+        # wait4 gives the child's own resource usage, unlike getrusage(RUSAGE_CHILDREN)
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        peak_rss_bytes = normalize_maxrss(usage.ru_maxrss)
+    except (AttributeError, ChildProcessError):
+        process.wait()
+    for reader in readers:
+        reader.join()
+
+    if run is not None:
+        run.add_process(time.monotonic() - start_time, peak_rss_bytes)
+
+    stdout = "".join(captured["stdout"])
+    stderr = "".join(captured["stderr"])
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command, stdout, stderr)
+    return subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+
+
+def process_peak_rss_bytes(pid):
+    """Best-effort peak RSS of a running process (Linux /proc only)."""
+    try:
+        with open(f"/proc/{pid}/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class MetricsLog:
+    """Appends one JSON record per transcribed file."""
+
+    def __init__(self, path=DEFAULT_METRICS_LOG):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def write(self, record: dict):
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def file_record(run: FileRun, audio_seconds, wall_seconds, status, **settings) -> dict:
+    """Builds the metrics record for one file."""
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "file": run.label,
+        "status": status,
+        "audio_seconds": round(audio_seconds, 3),
+        "wall_seconds": round(wall_seconds, 3),
+        "rtf": round(wall_seconds / audio_seconds, 4) if audio_seconds else None,
+        "peak_rss_bytes": run.peak_rss_bytes,
+        "processes": run.process_count,
+        **settings,
+    }
+
+
+def format_record(record: dict) -> str:
+    """One-line human summary of a metrics record."""
+    summary = f"Audio {record['audio_seconds']:.0f}s in {record['wall_seconds']:.1f}s"
+    if record["rtf"]:
+        summary += f" | RTF {record['rtf']:.3f} ({1 / record['rtf']:.1f}x real time)"
+    if record["peak_rss_bytes"]:
+        summary += f" | peak RSS {record['peak_rss_bytes'] / 1024**2:.0f} MB"
+    return summary
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# flake8: noqa
+
+"""
+The per-file transcription path shared by the whisper.cpp scripts.
+
+transcribe() takes one WAV through the optional pre-passes (voice activity
+detection, chunking or two-pass decoding) before handing it to a backend, so every script gets the
+same modes without repeating the plumbing. Compressed media files are piped
+from ffmpeg straight into the backend instead.
+"""
+
+from pathlib import Path
+
+from chunking import json_decode_args, load_segments, transcribe_chunked, write_transcripts
+from media import is_media, kept_wav_path, transcribe_media
+from scheduler import wav_duration
+from two_pass import transcribe_two_pass
+
+
+def decode(
+    input_wav_path,
+    output_base,
+    backend_pool,
+    decode_args,
+    duration,
+    chunking=None,
+    run=None,
+    two_pass=False,
+):
+    """Runs whisper.cpp on one WAV, chunked when it is longer than one window."""
+    if two_pass:
+        return transcribe_two_pass(
+            input_wav_path, output_base, backend_pool, decode_args, run=run
+        )
+    if chunking and duration > chunking["window_seconds"]:
+        return transcribe_chunked(
+            input_wav_path,
+            output_base,
+            backend_pool,
+            decode_args,
+            duration,
+            run=run,
+            **chunking,
+        )
+    with backend_pool.borrow() as backend:
+        backend.transcribe(input_wav_path, output_base, decode_args, run=run)
+    return True
+
+
+def transcribe_speech_only(
+    input_wav_path,
+    output_base,
+    backend_pool,
+    decode_args,
+    chunking=None,
+    run=None,
+    two_pass=False,
+):
+    """
+    Transcribes only the speech regions of a WAV and writes `.txt`, `.srt` and
+    `.json` transcripts on the original recording's timeline.
+    """
+    # NumPy is only needed for the VAD pre-pass
+    import vad
+
+    samples, rate = vad.read_wav_mono(input_wav_path)
+    regions = vad.detect_speech(samples, rate)
+    print(vad.format_report(samples, rate, regions))
+    if not regions:
+        write_transcripts([], output_base)
+        return True
+
+    speech_base = Path(f"{output_base}.speech")
+    speech_wav_path = Path(f"{speech_base}.wav")
+    time_map = vad.write_speech_wav(samples, rate, regions, speech_wav_path)
+    del samples
+    try:
+        if not decode(
+            speech_wav_path,
+            speech_base,
+            backend_pool,
+            json_decode_args(decode_args),
+            wav_duration(speech_wav_path),
+            chunking,
+            run,
+            two_pass,
+        ):
+            return False
+        segments = load_segments(f"{speech_base}.json", 0)
+    finally:
+        speech_wav_path.unlink(missing_ok=True)
+
+    for segment in segments:
+        segment["start"] = vad.to_original_ms(segment["start"], time_map)
+        segment["end"] = vad.to_original_ms(segment["end"], time_map)
+    write_transcripts(segments, output_base)
+    for suffix in (".json", ".txt", ".srt"):
+        Path(f"{speech_base}{suffix}").unlink(missing_ok=True)
+    return True
+
+
+def transcribe(
+    input_wav_path,
+    output_base,
+    backend_pool,
+    decode_args,
+    chunking=None,
+    use_vad=False,
+    run=None,
+    two_pass=False,
+    keep_wav=False,
+):
+    """
+    Transcribes one WAV (or .mp3/.m4a/.mp4/.opus file) into `<output_base>.txt` (plus `.srt`/`.json` in the
+    chunked, VAD and two-pass modes).
+
+    Args:
+        input_wav_path: The .wav file.
+        output_base: Output path without extension (as passed to whisper.cpp -of).
+        backend_pool: A backends.BackendPool.
+        decode_args: The profile's whisper.cpp decode flags.
+        chunking: None, or {"window_seconds": ..., "overlap_seconds": ...}.
+        use_vad: Strip silence and music with the VAD pre-pass before decoding.
+        run: Optional metrics.FileRun for live progress and resource totals.
+        two_pass: Decode greedily first and re-decode only low-confidence spans
+            with decode_args (not combined with chunking).
+        keep_wav: For media input, also save the decoded WAV in the
+            `converted_to_wav` folder next to it.
+
+    Returns:
+        True on success, False when a chunked run left windows to redo.
+
+    Raises:
+        ValueError: If media input is combined with chunking, VAD or two-pass
+            decoding (these need random access to a WAV).
+        subprocess.CalledProcessError, backends.BackendError: If decoding fails.
+        FileNotFoundError: If the whisper.cpp executable cannot be found.
+    """
+    if is_media(input_wav_path):
+        if chunking or use_vad or two_pass:
+            raise ValueError(
+                "Chunked, VAD and two-pass modes need a WAV; convert media files first."
+            )
+        return transcribe_media(
+            input_wav_path,
+            output_base,
+            backend_pool,
+            decode_args,
+            run=run,
+            keep_wav_path=kept_wav_path(input_wav_path) if keep_wav else None,
+        )
+    if use_vad:
+        return transcribe_speech_only(
+            input_wav_path, output_base, backend_pool, decode_args, chunking, run, two_pass
+        )
+    return decode(
+        input_wav_path,
+        output_base,
+        backend_pool,
+        decode_args,
+        wav_duration(input_wav_path),
+        chunking,
+        run,
+        two_pass,
+    )
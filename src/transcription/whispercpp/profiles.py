@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# flake8: noqa
+
+"""
+Decode profiles shared by the whisper.cpp scripts.
+
+Each profile is the list of whisper.cpp decode flags one script uses:
+  - bilingual: transcriber.py, English lectures with Arabic (auto language, greedy)
+  - arabic: transcriber-ar.py, Arabic-only audio (beam search, hallucination control)
+"""
+
+# --- Bilingual profile: auto-detected language, greedy decoding ---
+BILINGUAL_DECODE_ARGS = ["-l", "auto", "-otxt", "-pp"]
+
+# --- FINAL ADVANCED DECODE PROFILE FOR HALLUCINATION CONTROL ---
+ARABIC_DECODE_ARGS = [
+    "-l",
+    "ar",
+    "-otxt",
+    "-pp",
+    "-nt",
+    "-bs",
+    "8",
+    "--best-of",
+    "5",
+    # ADVANCED: Use thresholds to enable anti-hallucination fallbacks
+    "--logprob-thold",
+    "-0.8",
+    "--entropy-thold",
+    "2.6",
+    # ADVANCED: Use a highly specific prompt to prevent code-switching
+    "--prompt",
+    "بسم الله الرحمن الرحيم. الحمد لله. هذا باب في النحو عن حروف العطف. الناسخ يدخل على الجملة الاسمية كالمبتدأ والخبر ويغير الإعراب. الكلام في هذا الدرس عن الصفة والإعراب والعطف بالواو والفاء ثم أو.",
+]
+
+PROFILES = {
+    "bilingual": BILINGUAL_DECODE_ARGS,
+    "arabic": ARABIC_DECODE_ARGS,
+}
+
+
+def profile_for_language(language: str) -> str:
+    """Arabic audio gets the Arabic-only profile; everything else is treated as bilingual."""
+    return "arabic" if language == "ar" else "bilingual"
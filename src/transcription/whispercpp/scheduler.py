@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# flake8: noqa
+
+"""
+Worker-pool scheduling helpers for running several whisper.cpp processes at once.
+
+The transcription scripts import this module to:
+  - split a machine's core budget between concurrent whisper.cpp workers,
+  - order a batch longest-file-first so it does not end on one straggler,
+  - estimate the time left while the batch runs,
+  - report combined throughput once the batch finishes.
+"""
+
+import os
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+
+def wav_duration(wav_path: Path) -> float:
+    """Returns the duration of a .wav file in seconds (0.0 if it cannot be read)."""
+    try:
+        with wave.open(str(wav_path), "rb") as wav_file:
+            return wav_file.getnframes() / float(wav_file.getframerate())
+    except (wave.Error, EOFError, OSError):
+        return 0.0
+
+
+def default_core_budget() -> int:
+    """Number of cores this process may use (respects CPU affinity where available)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def split_core_budget(core_budget: int, workers: int) -> int:
+    """
+    Splits a core budget evenly between workers.
+
+    Returns:
+        The number of whisper.cpp threads (-t) each worker should use.
+    """
+    workers = max(1, workers)
+    return max(1, core_budget // workers)
+
+
+def order_longest_first(wav_files: list[Path], duration=wav_duration) -> list[tuple[Path, float]]:
+    """Pairs each file with its duration and sorts the batch longest-first."""
+    jobs = [(wav_path, duration(wav_path)) for wav_path in wav_files]
+    jobs.sort(key=lambda job: job[1], reverse=True)
+    return jobs
+
+
+def format_duration(seconds: float) -> str:
+    """Formats seconds as H:MM:SS."""
+    seconds = int(round(seconds))
+    return f"{seconds // 3600}:{(seconds % 3600) // 60:02d}:{seconds % 60:02d}"
+
+
+class BatchProgress:
+    """Estimates the time left in a batch from the audio processed so far."""
+
+    def __init__(self, total_audio_seconds: float, total_files: int):
+        self.total_audio_seconds = total_audio_seconds
+        self.total_files = total_files
+        self.done_audio_seconds = 0.0
+        self.done_files = 0
+        self.start_time = time.monotonic()
+
+    def file_done(self, audio_seconds: float, processed: bool = True) -> str:
+        """
+        Records one finished file and returns a progress line with the ETA.
+        Files that took no work (skipped, restored from cache) are taken out
+        of the total instead, so they do not inflate the rate.
+        """
+        self.done_files += 1
+        if processed:
+            self.done_audio_seconds += audio_seconds
+        else:
+            self.total_audio_seconds -= audio_seconds
+        line = (
+            f"Progress: {self.done_files}/{self.total_files} files, "
+            f"{format_duration(self.done_audio_seconds)} of "
+            f"{format_duration(self.total_audio_seconds)} audio"
+        )
+        elapsed = time.monotonic() - self.start_time
+        remaining = self.total_audio_seconds - self.done_audio_seconds
+        if self.done_audio_seconds > 0 and remaining > 0:
+            rate = self.done_audio_seconds / elapsed
+            line += f", ETA {format_duration(remaining / rate)}"
+        return line
+
+
+def run_pool(jobs, worker_fn, workers: int):
+    """
+    Runs worker_fn(wav_path) for every (wav_path, duration) job with up to
+    `workers` jobs in flight, submitting longest-first.
+
+    worker_fn must return one of "success", "cached", "skipped" or "error". Raising
+    FileNotFoundError aborts the batch: queued jobs are cancelled and the
+    jobs already running are allowed to finish.
+
+    Returns:
+        (results, stats) where results maps wav_path -> status and stats holds
+        the wall time and audio seconds transcribed.
+    """
+    results = {}
+    transcribed_audio_seconds = 0.0
+    start_time = time.monotonic()
+    progress = BatchProgress(sum(duration for _, duration in jobs), len(jobs))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {
+            executor.submit(worker_fn, wav_path): (wav_path, duration)
+            for wav_path, duration in jobs
+        }
+        for future in as_completed(futures):
+            wav_path, duration = futures[future]
+            if future.cancelled():
+                continue
+            try:
+                status = future.result()
+            except FileNotFoundError:
+                results[wav_path] = "error"
+                for pending in futures:
+                    pending.cancel()
+                continue
+            except Exception as e_global:
+                print(f"An unexpected error occurred while processing {wav_path.name}: {e_global}")
+                status = "error"
+            results[wav_path] = status
+            if status == "success":
+                transcribed_audio_seconds += duration
+            print(progress.file_done(duration, processed=status not in ("skipped", "cached")))
+
+    stats = {
+        "wall_seconds": time.monotonic() - start_time,
+        "audio_seconds": transcribed_audio_seconds,
+    }
+    return results, stats
+
+
+def print_throughput(stats: dict, workers: int, threads_per_worker: int):
+    """Prints the combined throughput of a pooled batch."""
+    wall_seconds = stats["wall_seconds"]
+    audio_seconds = stats["audio_seconds"]
+    print("\n--- Throughput ---")
+    print(f"Workers: {workers} x {threads_per_worker} threads")
+    print(f"Wall time: {format_duration(wall_seconds)}")
+    print(f"Audio transcribed: {format_duration(audio_seconds)}")
+    if wall_seconds > 0 and audio_seconds > 0:
+        print(f"Speed: {audio_seconds / wall_seconds:.2f}x real time")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# flake8: noqa
+
+"""
+Stand-in for the whisper.cpp `main` executable, used by benchmark.py.
+
+It accepts the same flags as whisper.cpp, "decodes" by burning CPU time in
+proportion to the audio length, and writes the same output files (.txt,
+and .json for -oj/-ojf). The CPU work is split over -t x -p processes, so
+running several stubs at once contends for cores like the real thing.
+
+Timing is controlled through environment variables:
+    STUB_LOAD_SECONDS   single-core model load time per run (default 0.2)
+    STUB_COST           core-seconds of work per second of audio (default 0.02)
+"""
+
+import json
+import multiprocessing
+import os
+import sys
+import time
+import wave
+
+
+def burn(cpu_seconds):
+    """Spins until this process has used cpu_seconds of CPU time."""
+    deadline = time.process_time() + cpu_seconds
+    while time.process_time() < deadline:
+        pass
+
+
+def flag_value(args, *names, default=None):
+    for name in names:
+        if name in args:
+            return args[args.index(name) + 1]
+    return default
+
+
+def main(args):
+    input_path = flag_value(args, "-f", "--file")
+    output_base = flag_value(args, "-of", "--output-file")
+    threads = int(flag_value(args, "-t", "--threads", default="4"))
+    processors = int(flag_value(args, "-p", "--processors", default="1"))
+    load_seconds = float(os.environ.get("STUB_LOAD_SECONDS", "0.2"))
+    cost = float(os.environ.get("STUB_COST", "0.02"))
+
+    if input_path == "-":
+        with wave.open(sys.stdin.buffer) as wav_file:
+            duration = wav_file.getnframes() / wav_file.getframerate()
+    else:
+        with wave.open(input_path) as wav_file:
+            duration = wav_file.getnframes() / wav_file.getframerate()
+
+    burn(load_seconds)
+    if "-dl" in args:
+        print("whisper_full_with_state: auto-detected language: ar (p = 0.950000)", file=sys.stderr)
+        return
+
+    lanes = max(threads * processors, 1)
+    work = duration * cost / lanes
+    workers = [multiprocessing.Process(target=burn, args=(work,)) for _ in range(lanes - 1)]
+    for worker in workers:
+        worker.start()
+    for percent in range(0, 101, 25):
+        burn(work / 5)
+        print(f"whisper_print_progress_callback: progress = {percent:3d}%", file=sys.stderr, flush=True)
+    for worker in workers:
+        worker.join()
+
+    segments = [
+        {
+            "offsets": {"from": int(start * 1000), "to": int(min(start + 5, duration) * 1000)},
+            "text": f" segment at {start}s",
+            "tokens": [{"text": " segment", "p": 0.9}],
+        }
+        for start in range(0, int(duration), 5)
+    ]
+    print("".join(segment["text"] + "\n" for segment in segments), end="")
+    if output_base is None:
+        return
+    if {"-oj", "--output-json", "-ojf", "--output-json-full"}.intersection(args):
+        with open(f"{output_base}.json", "w", encoding="utf-8") as f:
+            json.dump({"transcription": segments}, f)
+    if "-otxt" in args or "--output-txt" in args:
+        with open(f"{output_base}.txt", "w", encoding="utf-8") as f:
+            f.writelines(segment["text"].strip() + "\n" for segment in segments)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,12 +1,24 @@
 #!/usr/bin/env python3
 # flake8: noqa
 
+import argparse
 import subprocess
 import os
+import time
 from pathlib import Path
 
+from backends import BackendError, create_backend_pool
+from cache import DEFAULT_CACHE_DIR, TranscriptCache
+from chunking import DEFAULT_OVERLAP_SECONDS, DEFAULT_WINDOW_SECONDS
+from media import MEDIA_EXTENSIONS, is_media, probe_batch
+from metrics import DEFAULT_METRICS_LOG, FileRun, MetricsLog, file_record, format_record
+from pipeline import transcribe
+from profiles import ARABIC_DECODE_ARGS
+from scheduler import BatchProgress, default_core_budget, format_duration, split_core_budget
+
 # --- Configuration ---
 whisper_cpp_executable = "/Users/viz1er/Codebase/whisper.cpp/main"
+whisper_server_executable = "/Users/viz1er/Codebase/whisper.cpp/server"
 model_path = "/Users/viz1er/Codebase/whisper.cpp/models/ggml-large-v3-turbo.bin"
 transcripts_output_dir = Path(
     "/Users/viz1er/Codebase/obsidian-vault/05 Projects/Nasikh Nexus - Transcription Automation/Transcriptions/Completed"
@@ -16,8 +28,24 @@ transcripts_output_dir = Path(
 num_threads = "8"
 num_processors = "2"
 
+# --- FINAL ADVANCED DECODE PROFILE FOR HALLUCINATION CONTROL (see profiles.py) ---
+decode_args = ARABIC_DECODE_ARGS
+
 
-def main():
+def main(
+    input_path_str=None,
+    backend_kind="cli",
+    server_url=None,
+    chunking=None,
+    workers=1,
+    core_budget=None,
+    use_vad=False,
+    cache=None,
+    metrics_log=None,
+    two_pass=False,
+    stream=False,
+    keep_wav=False,
+):
     try:
         transcripts_output_dir.mkdir(parents=True, exist_ok=True)
         print(f"Transcripts will be saved in: {transcripts_output_dir}")
@@ -27,9 +55,11 @@ def main():
         )
         return
 
-    input_path_str = input(
-        "Enter the full path to a folder or a single .wav file: "
-    ).strip()
+    if input_path_str is None:
+        input_path_str = input(
+            "Enter the full path to a folder or a single .wav file: "
+        )
+    input_path_str = input_path_str.strip()
 
     if not input_path_str:
         print("Error: No input path provided.")
@@ -41,11 +71,17 @@ def main():
         print(f"Error: Input path not found: {input_path}")
         return
 
+    # With --stream, media files are piped from ffmpeg without writing a WAV
+    accepted_extensions = (".wav",) + (MEDIA_EXTENSIONS if stream else ())
     wav_files = []
     if input_path.is_dir():
         print(f"Scanning folder: {input_path}")
-        wav_files = list(input_path.glob("*.wav"))
-    elif input_path.is_file() and input_path.suffix.lower() == ".wav":
+        wav_files = sorted(
+            path
+            for path in input_path.iterdir()
+            if path.is_file() and path.suffix.lower() in accepted_extensions
+        )
+    elif input_path.is_file() and input_path.suffix.lower() in accepted_extensions:
         wav_files = [input_path]
     else:
         print(
@@ -60,94 +96,279 @@ def main():
     print(f"\nFound {len(wav_files)} .wav file(s) to process.")
     total_files = len(wav_files)
     success_count = 0
+    cached_count = 0
     error_count = 0
     skipped_count = 0
 
-    caffeinate_command = ["caffeinate", "-s"]
+    # Probe every file up front (cached): unreadable files are skipped before any work
+    durations, unreadable = probe_batch(wav_files)
+    for unreadable_path, probe_error in unreadable:
+        print(f"Skipping unreadable file: {unreadable_path.name} ({probe_error})")
+    error_count += len(unreadable)
+    wav_files = [wav_path for wav_path in wav_files if wav_path in durations]
+    progress = BatchProgress(sum(durations.values()), len(wav_files))
+    print(f"Total audio: {format_duration(progress.total_audio_seconds)}")
 
-    for i, input_wav_file_path in enumerate(wav_files):
-        print(
-            f"\n--- Checking file {i + 1}/{total_files}: {input_wav_file_path.name} ---"
-        )
+    # Workers only apply to chunked and two-pass modes, where they decode
+    # windows (or re-decoded spans) of one file in parallel
+    if (chunking or two_pass) and workers > 1:
+        threads = str(split_core_budget(core_budget or default_core_budget(), workers))
+        processors = "1"
+    else:
+        workers, threads, processors = 1, num_threads, num_processors
+    backend_pool = create_backend_pool(
+        backend_kind,
+        workers,
+        whisper_cpp_executable,
+        whisper_server_executable,
+        model_path,
+        threads,
+        processors,
+        server_url,
+    )
 
-        output_file_base = transcripts_output_dir / input_wav_file_path.stem
-        output_txt_file = Path(f"{output_file_base}.txt")
-
-        if output_txt_file.exists():
-            print(f"Transcript already exists: {output_txt_file}. Skipping.")
-            skipped_count += 1
-            continue
-
-        print("Transcript does not exist. Starting transcription...")
-
-        # --- FINAL ADVANCED COMMAND FOR HALLUCINATION CONTROL ---
-        whisper_command = [
-            str(whisper_cpp_executable),
-            "-m",
-            str(model_path),
-            "-f",
-            str(input_wav_file_path),
-            "-of",
-            str(output_file_base),
-            "-l",
-            "ar",
-            "-t",
-            num_threads,
-            "-p",
-            num_processors,
-            "-otxt",
-            "-nt",
-            "-bs",
-            "8",
-            "--best-of",
-            "5",
-            # ADVANCED: Use thresholds to enable anti-hallucination fallbacks
-            "--logprob-thold",
-            "-0.8",
-            "--entropy-thold",
-            "2.6",
-            # ADVANCED: Use a highly specific prompt to prevent code-switching
-            "--prompt",
-            "بسم الله الرحمن الرحيم. الحمد لله. هذا باب في النحو عن حروف العطف. الناسخ يدخل على الجملة الاسمية كالمبتدأ والخبر ويغير الإعراب. الكلام في هذا الدرس عن الصفة والإعراب والعطف بالواو والفاء ثم أو.",
-        ]
-
-        full_command = caffeinate_command + whisper_command
-
-        print("Using advanced settings for hallucination control.")
-
-        try:
-            process = subprocess.run(
-                full_command, check=True, text=True, capture_output=True
+    try:
+        for i, input_wav_file_path in enumerate(wav_files):
+            print(
+                f"\n--- Checking file {i + 1}/{total_files}: {input_wav_file_path.name} ---"
             )
-            print("--- whisper.cpp output ---")
-            print(process.stdout)
-            print("--------------------------")
-            print(f"Transcription process finished for: {input_wav_file_path.name}")
-            print(f"Transcription file saved to: {output_txt_file}")
-            success_count += 1
-
-        except subprocess.CalledProcessError as e:
-            error_count += 1
-            print("--- ERROR ---")
-            print(f"Error during transcription for file: {input_wav_file_path.name}")
-            print(f"Return code: {e.returncode}")
-            print(f"whisper.cpp stdout:\n{e.stdout}")
-            print(f"whisper.cpp stderr:\n{e.stderr}")
-        except FileNotFoundError:
-            error_count += 1
-            print(f"Critical Error: The command '{full_command[0]}' was not found.")
-            break
-        except Exception as e_global:
-            error_count += 1
-            print(f"An unexpected error occurred: {e_global}")
+
+            output_file_base = transcripts_output_dir / input_wav_file_path.stem
+            output_txt_file = Path(f"{output_file_base}.txt")
+
+            # A transcript with no record of its settings counts as current,
+            # so the audio is not hashed for it
+            output_exists = output_txt_file.exists()
+            cache_key = None
+            stale = False
+            if cache is not None and (
+                not output_exists or cache.has_output_record(output_file_base)
+            ):
+                cache_key = cache.key(
+                    input_wav_file_path,
+                    decode_args,
+                    chunking=chunking,
+                    vad=use_vad,
+                    two_pass=two_pass,
+                )
+                stale = output_exists and cache.output_is_stale(output_file_base, cache_key)
+
+            if output_exists:
+                if not stale:
+                    print(f"Transcript already exists: {output_txt_file}. Skipping.")
+                    skipped_count += 1
+                    progress.file_done(durations[input_wav_file_path], processed=False)
+                    continue
+                print(f"Transcript {output_txt_file} was made with other settings.")
+
+            if cache is not None and cache.restore(cache_key, output_file_base):
+                print(f"Restored from cache: {output_txt_file}")
+                cached_count += 1
+                progress.file_done(durations[input_wav_file_path], processed=False)
+                continue
+
+            print("Transcript does not exist. Starting transcription...")
+            print("Using advanced settings for hallucination control.")
+
+            # --- whisper.cpp output is streamed live while it runs ---
+            run = FileRun(input_wav_file_path.name, echo_output=True)
+            start_time = time.monotonic()
+            status = "error"
+            try:
+                if not transcribe(
+                    input_wav_file_path,
+                    output_file_base,
+                    backend_pool,
+                    decode_args,
+                    chunking=chunking,
+                    use_vad=use_vad,
+                    run=run,
+                    two_pass=two_pass,
+                    keep_wav=keep_wav,
+                ):
+                    error_count += 1
+                    continue
+                if cache is not None:
+                    cache.store(cache_key, output_file_base, input_wav_file_path)
+                print(f"Transcription process finished for: {input_wav_file_path.name}")
+                print(f"Transcription file saved to: {output_txt_file}")
+                success_count += 1
+                status = "success"
+
+            except subprocess.CalledProcessError as e:
+                error_count += 1
+                print("--- ERROR ---")
+                print(f"Error during transcription for file: {input_wav_file_path.name}")
+                print(f"Return code: {e.returncode}")
+                print(f"whisper.cpp stdout:\n{e.stdout}")
+                print(f"whisper.cpp stderr:\n{e.stderr}")
+            except BackendError as e:
+                error_count += 1
+                print("--- ERROR ---")
+                print(f"Error during transcription for file: {input_wav_file_path.name}")
+                print(f"{e}")
+            except FileNotFoundError:
+                error_count += 1
+                print(f"Critical Error: The command '{whisper_cpp_executable}' was not found.")
+                break
+            except Exception as e_global:
+                error_count += 1
+                print(f"An unexpected error occurred: {e_global}")
+            finally:
+                print(progress.file_done(durations[input_wav_file_path]))
+                if metrics_log is not None:
+                    record = file_record(
+                        run,
+                        durations[input_wav_file_path],
+                        time.monotonic() - start_time,
+                        status,
+                        profile="arabic",
+                        model=Path(model_path).name,
+                        chunked=bool(chunking),
+                        vad=use_vad,
+                        two_pass=two_pass,
+                        streamed=is_media(input_wav_file_path),
+                        **backend_pool.settings,
+                    )
+                    metrics_log.write(record)
+                    print(format_record(record))
+    finally:
+        backend_pool.close()
 
     print("\n--- Processing Summary ---")
     print(f"Total files checked: {total_files}")
     print(f"Successfully transcribed: {success_count}")
+    print(f"Restored from cache: {cached_count}")
     print(f"Skipped (already exist): {skipped_count}")
     print(f"Failed to transcribe: {error_count}")
     print(f"All transcripts are located in: {transcripts_output_dir}")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(
+        description="Transcribe Arabic-only .wav files with whisper.cpp (beam search, hallucination control)."
+    )
+    parser.add_argument(
+        "input_path",
+        nargs="?",
+        help="Folder or single .wav file. You are prompted for it when omitted.",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=("cli", "server"),
+        default="cli",
+        help="cli: one whisper.cpp process per file. server: keep the model loaded "
+        "in a long-lived whisper.cpp server (falls back to cli if it cannot start).",
+    )
+    parser.add_argument(
+        "--server-url",
+        default=None,
+        help="Use an already running whisper.cpp server (e.g. http://127.0.0.1:8080).",
+    )
+    parser.add_argument(
+        "--chunked",
+        action="store_true",
+        help="Split recordings longer than one window into overlapping windows that are "
+        "transcribed in parallel (--workers at a time) and resumed after a crash.",
+    )
+    parser.add_argument(
+        "--window-seconds",
+        type=float,
+        default=DEFAULT_WINDOW_SECONDS,
+        help=f"Chunked mode window length (default: {DEFAULT_WINDOW_SECONDS:.0f}).",
+    )
+    parser.add_argument(
+        "--overlap-seconds",
+        type=float,
+        default=DEFAULT_OVERLAP_SECONDS,
+        help=f"Chunked mode overlap between windows (default: {DEFAULT_OVERLAP_SECONDS:.0f}).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Chunked and two-pass modes: number of windows or spans decoded at once (default: 1).",
+    )
+    parser.add_argument(
+        "--core-budget",
+        type=int,
+        default=None,
+        help="Chunked and two-pass modes: total cores split between workers (default: all available cores).",
+    )
+    parser.add_argument(
+        "--vad",
+        action="store_true",
+        help="Skip silence and music: only speech regions are sent to whisper.cpp "
+        "and timestamps are mapped back to the original recording (needs NumPy).",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the content-addressed transcript cache.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=str(DEFAULT_CACHE_DIR),
+        help=f"Transcript cache location (default: {DEFAULT_CACHE_DIR}).",
+    )
+    parser.add_argument(
+        "--cache-max-gb",
+        type=float,
+        default=2.0,
+        help="Least recently used cache entries are evicted above this size (default: 2).",
+    )
+    parser.add_argument(
+        "--metrics-log",
+        default=str(DEFAULT_METRICS_LOG),
+        help=f"JSON-lines file receiving per-file timing and memory metrics (default: {DEFAULT_METRICS_LOG}).",
+    )
+    parser.add_argument(
+        "--two-pass",
+        action="store_true",
+        help="Decode greedily first, then re-decode only low-confidence spans with the "
+        "beam-search settings and prompt (cannot be combined with --chunked).",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help=f"Also transcribe {'/'.join(MEDIA_EXTENSIONS)} files by piping ffmpeg's output "
+        "straight into whisper.cpp, without writing WAVs to disk.",
+    )
+    parser.add_argument(
+        "--keep-wav",
+        action="store_true",
+        help="With --stream, also save each decoded WAV in a converted_to_wav folder next to the media.",
+    )
+    args = parser.parse_args()
+    if args.two_pass and args.chunked:
+        parser.error("--two-pass cannot be combined with --chunked")
+    if args.stream and (args.chunked or args.vad or args.two_pass):
+        parser.error("--stream cannot be combined with --chunked, --vad or --two-pass (they need a WAV)")
+
+    main(
+        args.input_path,
+        backend_kind=args.backend,
+        server_url=args.server_url,
+        chunking=(
+            {
+                "window_seconds": args.window_seconds,
+                "overlap_seconds": args.overlap_seconds,
+            }
+            if args.chunked
+            else None
+        ),
+        workers=args.workers,
+        core_budget=args.core_budget,
+        use_vad=args.vad,
+        cache=(
+            None
+            if args.no_cache
+            else TranscriptCache(
+                model_path, args.cache_dir, int(args.cache_max_gb * 1024**3)
+            )
+        ),
+        metrics_log=MetricsLog(args.metrics_log),
+        two_pass=args.two_pass,
+        stream=args.stream,
+        keep_wav=args.keep_wav,
+    )
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# flake8: noqa
+
+"""
+One entry point for mixed folders: each file's language is detected on a few
+short samples with a small whisper model, then the file is transcribed with
+the matching profile:
+
+  - Arabic audio   -> the Arabic-only profile of transcriber-ar.py (beam search)
+  - anything else  -> the bilingual profile of transcriber.py (auto, greedy)
+
+Paths, threads, outputs and the command-line options (except --routing-log)
+come from transcriber.py.
+"""
+
+import argparse
+import subprocess
+import wave
+from pathlib import Path
+
+import transcriber
+from language import DEFAULT_ROUTING_LOG, LanguageRouter
+from profiles import PROFILES
+from scheduler import default_core_budget, order_longest_first, print_throughput, run_pool
+
+# --- Configuration ---
+# Small model used only for language detection
+language_model_path = "/Users/viz1er/Codebase/whisper.cpp/models/ggml-base.bin"
+
+
+def main(
+    input_path_str=None,
+    workers=1,
+    core_budget=None,
+    backend_kind="cli",
+    server_url=None,
+    chunking=None,
+    use_vad=False,
+    cache=None,
+    metrics_log=None,
+    stream=False,
+    keep_wav=False,
+    routing_log=DEFAULT_ROUTING_LOG,
+):
+    """
+    Detects the language of every .wav file and transcribes it with the matching profile.
+
+    Args:
+        routing_log: JSON-lines log of routing decisions (see language.py).
+        Everything else: See transcriber.main.
+    """
+    if core_budget is None:
+        core_budget = default_core_budget()
+
+    output_dir = transcriber.transcripts_output_dir
+    if not transcriber.ensure_output_dir():
+        return
+    wav_files = transcriber.collect_inputs(input_path_str, stream=stream)
+    if not wav_files:
+        return
+
+    print(f"\nFound {len(wav_files)} .wav file(s) to process.")
+    total_files = len(wav_files)
+
+    wav_files, durations, _ = transcriber.probe_inputs(wav_files)
+    backend_pool, threads, processors = transcriber.worker_backends(
+        backend_kind, workers, core_budget, server_url
+    )
+    router = LanguageRouter(
+        transcriber.whisper_cpp_executable,
+        language_model_path,
+        threads=threads,
+        log_path=routing_log,
+    )
+    profile_by_file = {}
+
+    def finished_status(wav_path):
+        """
+        "skipped" or "cached" when a transcript made under either profile is
+        already current (or in the cache), so the file needs no language detection.
+        """
+        output_base = output_dir / wav_path.stem
+        output_exists = Path(f"{output_base}.txt").exists()
+        if output_exists and (cache is None or not cache.has_output_record(output_base)):
+            print(f"Transcript already exists at: {output_base}.txt")
+            return "skipped"
+        if cache is None:
+            return None
+        for profile in PROFILES:
+            key = cache.key(wav_path, PROFILES[profile], chunking=chunking, vad=use_vad)
+            if output_exists and not cache.output_is_stale(output_base, key):
+                print(f"Transcript already exists at: {output_base}.txt")
+                return "skipped"
+            if cache.restore(key, output_base):
+                print(f"Restored from cache: {output_base}.txt")
+                return "cached"
+        return None
+
+    def route_and_transcribe(wav_path, verbose=True):
+        status = finished_status(wav_path)
+        if status is not None:
+            return status
+        try:
+            decision = router.route(wav_path)
+        except (subprocess.CalledProcessError, wave.Error, EOFError) as e:
+            # A missing detection model or an unreadable sample should not stop the batch
+            reason = f"exit code {e.returncode}" if isinstance(e, subprocess.CalledProcessError) else e
+            print(f"Language detection failed for {wav_path.name} ({reason}); using the bilingual profile.")
+            decision = {"language": None, "confidence": 0.0, "profile": "bilingual", "reused": False}
+        profile_by_file[wav_path] = decision["profile"]
+        print(
+            f"Routing {wav_path.name}: language={decision['language']} "
+            f"(confidence {decision['confidence']:.2f}) -> {decision['profile']} profile"
+            + (" [from routing log]" if decision["reused"] else "")
+        )
+        return transcriber.transcribe_file(
+            wav_path,
+            backend_pool,
+            verbose=verbose,
+            chunking=chunking,
+            use_vad=use_vad,
+            cache=cache,
+            metrics_log=metrics_log,
+            profile=decision["profile"],
+            keep_wav=keep_wav,
+        )
+
+    try:
+        if workers > 1 and not chunking:
+            results, stats = run_pool(
+                order_longest_first(wav_files, duration=durations.get),
+                lambda wav_path: route_and_transcribe(wav_path, verbose=False),
+                workers,
+            )
+            statuses = list(results.values())
+        else:
+            statuses = []
+            for i, wav_path in enumerate(wav_files):
+                print(f"\n--- Checking file {i + 1}/{len(wav_files)}: {wav_path.name} ---")
+                try:
+                    statuses.append(route_and_transcribe(wav_path))
+                except FileNotFoundError:
+                    statuses.append("error")
+                    print(f"Critical Error: The command '{transcriber.whisper_cpp_executable}' was not found.")
+                    print("Aborting processing.")
+                    break
+                except Exception as e_global:
+                    statuses.append("error")
+                    print(f"An unexpected error occurred while processing {wav_path.name}: {e_global}")
+    finally:
+        backend_pool.close()
+
+    print("\n--- Processing Summary ---")
+    print(f"Total files checked: {total_files}")
+    routed = list(profile_by_file.values())
+    print(f"Routed to Arabic profile: {routed.count('arabic')}")
+    print(f"Routed to bilingual profile: {routed.count('bilingual')}")
+    print(f"Successfully transcribed: {statuses.count('success')}")
+    print(f"Restored from cache: {statuses.count('cached')}")
+    print(f"Skipped (already exist): {statuses.count('skipped')}")
+    print(f"Failed to transcribe: {total_files - statuses.count('success') - statuses.count('cached') - statuses.count('skipped')}")
+    print(f"Routing decisions are logged in: {router.log_path}")
+    print(f"All transcripts are located in: {output_dir}")
+
+    if workers > 1 and not chunking:
+        print_throughput(stats, workers, threads)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Detect each file's language and transcribe it with the bilingual or Arabic-only profile."
+    )
+    parser.add_argument(
+        "input_path",
+        nargs="?",
+        help="Folder or single .wav file. You are prompted for it when omitted.",
+    )
+    transcriber.add_batch_arguments(parser)
+    parser.add_argument(
+        "--routing-log",
+        default=str(DEFAULT_ROUTING_LOG),
+        help=f"JSON-lines log of routing decisions, also reused as a lookup (default: {DEFAULT_ROUTING_LOG}).",
+    )
+    args = parser.parse_args()
+
+    main(
+        args.input_path,
+        **transcriber.batch_options(parser, args),
+        routing_log=args.routing_log,
+    )
@@ -1,12 +1,33 @@
 #!/usr/bin/env python3
 # flake8: noqa
 
+import argparse
 import subprocess
 import os
+import time
 from pathlib import Path
 
+from backends import BackendError, create_backend_pool
+from cache import DEFAULT_CACHE_DIR, TranscriptCache
+from chunking import DEFAULT_OVERLAP_SECONDS, DEFAULT_WINDOW_SECONDS
+from media import MEDIA_EXTENSIONS, audio_duration, is_media, probe_batch
+from metrics import DEFAULT_METRICS_LOG, FileRun, MetricsLog, file_record, format_record
+from pipeline import transcribe
+from profiles import PROFILES
+from scheduler import (
+    BatchProgress,
+    default_core_budget,
+    order_longest_first,
+    format_duration,
+    print_throughput,
+    run_pool,
+    split_core_budget,
+)
+
 # --- Configuration ---
 whisper_cpp_executable = "/Users/viz1er/Codebase/whisper.cpp/main"
+# Long-lived whisper.cpp server used by the "server" backend (keeps the model loaded)
+whisper_server_executable = "/Users/viz1er/Codebase/whisper.cpp/server"
 model_path = "/Users/viz1er/Codebase/whisper.cpp/models/ggml-large-v3-turbo.bin"
 # This is now the single, consistent directory for all transcripts
 transcripts_output_dir = Path(
@@ -18,157 +39,503 @@ num_threads = "8"
 num_processors = "2"
 
 
-def main():
+def transcribe_file(
+    input_wav_file_path,
+    backend_pool,
+    verbose=True,
+    chunking=None,
+    use_vad=False,
+    cache=None,
+    metrics_log=None,
+    profile="bilingual",
+    keep_wav=False,
+):
+    """
+    Transcribes a single .wav file with whisper.cpp.
+
+    Args:
+        input_wav_file_path: Path to the .wav file, or to a .mp3/.m4a/.mp4/.opus
+            file that is decoded by ffmpeg and piped into whisper.cpp.
+        backend_pool: A BackendPool from backends.py. One backend is borrowed for
+            the file, or one per window in chunked mode.
+        verbose: Print the full per-file log (off in worker-pool mode to keep
+            interleaved output readable).
+        chunking: None, or {"window_seconds": ..., "overlap_seconds": ...} to
+            split recordings longer than one window into parallel windows.
+        use_vad: Only decode the speech regions found by the VAD pre-pass.
+        cache: A TranscriptCache, or None to always transcribe.
+        metrics_log: A MetricsLog that receives the file's audio duration, wall
+            time, real-time factor and peak RSS.
+        profile: Decode profile from profiles.py ("bilingual" or "arabic").
+        keep_wav: Also save the WAV decoded from a media file (see media.py).
+
+    Returns:
+        "success", "cached", "skipped" or "error".
+
+    Raises:
+        FileNotFoundError: If the whisper.cpp executable could not be found.
+    """
+    decode_args = PROFILES[profile]
+
+    # --- Determine output file path and check if it already exists ---
+    output_file_base = transcripts_output_dir / input_wav_file_path.stem
+    output_txt_file = Path(f"{output_file_base}.txt")
+
+    # Check if the transcript already exists (and was made with the current settings).
+    # One with no record of its settings counts as current, so the audio is not hashed for it.
+    output_exists = output_txt_file.exists()
+    cache_key = None
+    stale = False
+    if cache is not None and (not output_exists or cache.has_output_record(output_file_base)):
+        cache_key = cache.key(
+            input_wav_file_path, decode_args, chunking=chunking, vad=use_vad
+        )
+        stale = output_exists and cache.output_is_stale(output_file_base, cache_key)
+    if output_exists:
+        if not stale:
+            print(f"Transcript already exists at: {output_txt_file}")
+            print("Skipping transcription.")
+            return "skipped"
+        print(f"Transcript at {output_txt_file} was made with other settings.")
+
+    if cache is not None and cache.restore(cache_key, output_file_base):
+        print(f"Restored from cache: {output_txt_file}")
+        return "cached"
+
+    if verbose:
+        print(f"Transcript does not exist. Starting transcription...")
+        print(f"Output text file will be: {output_txt_file}")
+        print("-" * 30)
+    else:
+        print(f"Started: {input_wav_file_path.name}")
+
+    # whisper.cpp output is streamed live; segment text is echoed when running one file at a time
+    run = FileRun(input_wav_file_path.name, echo_output=verbose)
+    start_time = time.monotonic()
+    status = "error"
+    try:
+        if not transcribe(
+            input_wav_file_path,
+            output_file_base,
+            backend_pool,
+            decode_args,
+            chunking=chunking,
+            use_vad=use_vad,
+            run=run,
+            keep_wav=keep_wav,
+        ):
+            return "error"
+        if cache is not None:
+            cache.store(cache_key, output_file_base, input_wav_file_path)
+        if verbose:
+            print("-" * 30)
+        print(f"Transcription successful for: {input_wav_file_path.name}")
+        print(f"Transcription saved to: {output_txt_file}")
+        status = "success"
+        return "success"
+
+    except subprocess.CalledProcessError as e:
+        if verbose:
+            print("-" * 30)
+        print(f"Error during transcription for file: {input_wav_file_path.name}")
+        print(f"Return code: {e.returncode}")
+        print(f"whisper.cpp stdout:\n{e.stdout}")
+        print(f"whisper.cpp stderr:\n{e.stderr}")
+        return "error"
+    except BackendError as e:
+        print(f"Error during transcription for file: {input_wav_file_path.name}")
+        print(f"{e}")
+        return "error"
+    except FileNotFoundError:
+        print(f"Critical Error: The whisper.cpp executable was not found.")
+        print(f"Please check the path for '{whisper_cpp_executable}'.")
+        raise
+    except Exception as e_global:
+        print(
+            f"An unexpected error occurred while processing {input_wav_file_path.name}: {e_global}"
+        )
+        return "error"
+    finally:
+        if metrics_log is not None:
+            record = file_record(
+                run,
+                audio_duration(input_wav_file_path),
+                time.monotonic() - start_time,
+                status,
+                profile=profile,
+                model=Path(model_path).name,
+                chunked=bool(chunking),
+                vad=use_vad,
+                streamed=is_media(input_wav_file_path),
+                **backend_pool.settings,
+            )
+            metrics_log.write(record)
+            print(f"{input_wav_file_path.name}: {format_record(record)}")
+
+
+def ensure_output_dir() -> bool:
+    """Creates the transcripts folder. False (after printing why) if it cannot be created."""
     # --- Ensure the single, consistent output directory exists ---
     try:
         transcripts_output_dir.mkdir(parents=True, exist_ok=True)
         print(f"Transcripts will be saved in: {transcripts_output_dir}")
+        return True
     except OSError as e:
         print(
             f"Error: Could not create output directory '{transcripts_output_dir}': {e}"
         )
-        return
+        return False
+
 
+def collect_inputs(input_path_str=None, stream=False):
+    """
+    Collects the files to transcribe from a folder or a single file path,
+    prompting for the path when it is not given.
+
+    Returns:
+        The sorted list of .wav files (and media files when stream is set),
+        or None after printing why there is nothing to do.
+    """
     # --- MODIFIED: Get input PATH from user (file or folder) ---
-    input_path_str = input(
-        "Enter the full path to a folder or a single .wav file: "
-    ).strip()
+    if input_path_str is None:
+        input_path_str = input(
+            "Enter the full path to a folder or a single .wav file: "
+        )
+    input_path_str = input_path_str.strip()
 
     # --- Validate input path ---
     if not input_path_str:
         print("Error: No input path provided.")
-        return
+        return None
 
     input_path = Path(input_path_str).resolve()  # Resolve to absolute path
 
     if not input_path.exists():
         print(f"Error: Input path not found: {input_path}")
-        return
+        return None
 
     # --- MODIFIED: Collect WAV files from either a folder or a single file path ---
+    accepted_extensions = (".wav",) + (MEDIA_EXTENSIONS if stream else ())
     wav_files = []
     if input_path.is_dir():
-        # Path is a directory, find all .wav files inside
+        # Path is a directory, find all .wav (and, when streaming, media) files inside
         print(f"Scanning folder: {input_path}")
-        wav_files = list(input_path.glob("*.wav"))
+        wav_files = sorted(
+            path
+            for path in input_path.iterdir()
+            if path.is_file() and path.suffix.lower() in accepted_extensions
+        )
     elif input_path.is_file():
         # Path is a file, check if it's a .wav file
-        if input_path.suffix.lower() == ".wav":
+        if input_path.suffix.lower() in accepted_extensions:
             wav_files = [input_path]
         else:
             print(f"Error: The provided file is not a .wav file: {input_path}")
-            return
+            return None
     else:
         # Path is not a file or directory (e.g., a broken symlink)
         print(
             f"Error: The provided path is not a valid file or directory: {input_path}"
         )
-        return
+        return None
 
     # --- Check if any processable files were found ---
     if not wav_files:
         # This message is now more general
         print(f"No .wav files to process at the specified path: '{input_path}'.")
-        return
+        return None
+    return wav_files
 
-    print(f"\nFound {len(wav_files)} .wav file(s) to process.")
-    total_files = len(wav_files)
-    processed_count = 0
-    success_count = 0
-    error_count = 0
-    skipped_count = 0
 
-    # --- Construct the caffeinate command wrapper ---
-    # This ensures caffeinate is active for the entire duration of the script's core logic
-    caffeinate_command = ["caffeinate", "-s"]
+def probe_inputs(wav_files):
+    """
+    Probes every file up front (cached), so unreadable files are skipped before any work.
 
-    # --- Loop through WAV files and process them ---
-    # This loop works for both single and multiple files without modification
-    for i, input_wav_file_path in enumerate(wav_files):
-        processed_count += 1
-        print(
-            f"\n--- Checking file {processed_count}/{total_files}: {input_wav_file_path.name} ---"
-        )
+    Returns:
+        (readable files, {path: duration}, number of unreadable files)
+    """
+    durations, unreadable = probe_batch(wav_files)
+    for unreadable_path, probe_error in unreadable:
+        print(f"Skipping unreadable file: {unreadable_path.name} ({probe_error})")
+    wav_files = [wav_path for wav_path in wav_files if wav_path in durations]
+    print(f"Total audio: {format_duration(sum(durations.values()))}")
+    return wav_files, durations, len(unreadable)
 
-        # --- Determine output file path and check if it already exists ---
-        output_file_base = transcripts_output_dir / input_wav_file_path.stem
-        output_txt_file = Path(f"{output_file_base}.txt")
 
-        # Check if the transcript already exists
-        if output_txt_file.exists():
-            print(f"Transcript already exists at: {output_txt_file}")
-            print("Skipping transcription.")
-            skipped_count += 1
-            continue  # Move to the next file
+def worker_backends(backend_kind, workers, core_budget, server_url=None):
+    """
+    Splits the core budget between workers and creates their backends.
 
-        # --- Construct the whisper.cpp command ---
-        print(f"Transcript does not exist. Starting transcription...")
-        whisper_command = [
-            str(whisper_cpp_executable),
-            "-m",
-            str(model_path),
-            "-l",
-            "auto",
-            "-otxt",
-            "-pp",
-            "-t",
-            num_threads,
-            "-p",
-            num_processors,
-            "-f",
-            str(input_wav_file_path),
-            "-of",
-            str(output_file_base),
-        ]
-
-        # Combine caffeinate with the whisper command
-        full_command = caffeinate_command + whisper_command
+    Returns:
+        (backend_pool, threads, processors), the last two per worker.
+    """
+    if workers > 1:
+        threads, processors = str(split_core_budget(core_budget, workers)), "1"
+    else:
+        threads, processors = num_threads, num_processors
+    # Each worker gets its own backend (and, in server mode, its own loaded model),
+    # except with --server-url: workers then take turns on that one server
+    backend_pool = create_backend_pool(
+        backend_kind,
+        workers,
+        whisper_cpp_executable,
+        whisper_server_executable,
+        model_path,
+        threads,
+        processors,
+        server_url,
+    )
+    print(f"Using {threads} threads and {processors} processors per worker.")
+    return backend_pool, threads, processors
 
-        print(f"Output text file will be: {output_txt_file}")
-        print(f"Using {num_threads} threads and {num_processors} processors.")
-        print("-" * 30)
 
-        try:
-            # Use subprocess.run with the full command
-            process = subprocess.run(
-                full_command, check=True, text=True, capture_output=True
-            )
-            print("-" * 30)
-            print(f"Transcription successful for: {input_wav_file_path.name}")
-            print(f"Transcription saved to: {output_txt_file}")
-            success_count += 1
+def main(
+    input_path_str=None,
+    workers=1,
+    core_budget=None,
+    backend_kind="cli",
+    server_url=None,
+    chunking=None,
+    use_vad=False,
+    cache=None,
+    metrics_log=None,
+    stream=False,
+    keep_wav=False,
+):
+    """
+    Transcribes a folder or a single .wav file.
 
-        except subprocess.CalledProcessError as e:
-            error_count += 1
-            print("-" * 30)
-            print(f"Error during transcription for file: {input_wav_file_path.name}")
-            print(f"Return code: {e.returncode}")
-            print(f"whisper.cpp stdout:\n{e.stdout}")
-            print(f"whisper.cpp stderr:\n{e.stderr}")
-        except FileNotFoundError:
-            error_count += 1
-            print(
-                f"Critical Error: The whisper.cpp executable or caffeinate command was not found."
-            )
+    Args:
+        input_path_str: Folder or .wav path. Prompted for when not given.
+        workers: Number of whisper.cpp processes to run at once. In chunked
+            mode the workers decode windows of one file instead of whole files.
+        core_budget: Total cores to split between workers (defaults to all).
+        backend_kind: "cli" (one process per file) or "server" (model stays loaded).
+        server_url: Use an already running whisper.cpp server instead of starting one.
+        stream: Also pick up .mp3/.m4a/.mp4/.opus files and pipe them from
+            ffmpeg into whisper.cpp without writing a WAV.
+        chunking, use_vad, cache, metrics_log, keep_wav: See transcribe_file.
+    """
+    if core_budget is None:
+        core_budget = default_core_budget()
+
+    if not ensure_output_dir():
+        return
+    wav_files = collect_inputs(input_path_str, stream=stream)
+    if not wav_files:
+        return
+
+    print(f"\nFound {len(wav_files)} .wav file(s) to process.")
+    total_files = len(wav_files)
+    success_count = 0
+    cached_count = 0
+    skipped_count = 0
+
+    wav_files, durations, error_count = probe_inputs(wav_files)
+    backend_pool, threads, processors = worker_backends(
+        backend_kind, workers, core_budget, server_url
+    )
+
+    try:
+        if workers > 1 and not chunking:
+            # --- Worker-pool mode: several whisper.cpp processes share the core budget ---
+            jobs = order_longest_first(wav_files, duration=durations.get)
             print(
-                f"Please check the path for '{whisper_cpp_executable}' and ensure 'caffeinate' is available on your system."
+                f"Running {workers} workers (core budget: {core_budget}), longest files first."
             )
-            print("Aborting processing.")
-            break
-        except Exception as e_global:
-            error_count += 1
-            print(
-                f"An unexpected error occurred while processing {input_wav_file_path.name}: {e_global}"
+            results, stats = run_pool(
+                jobs,
+                lambda wav_path: transcribe_file(
+                    wav_path,
+                    backend_pool,
+                    verbose=False,
+                    use_vad=use_vad,
+                    cache=cache,
+                    metrics_log=metrics_log,
+                    keep_wav=keep_wav,
+                ),
+                workers,
             )
+            success_count = sum(1 for status in results.values() if status == "success")
+            cached_count = sum(1 for status in results.values() if status == "cached")
+            skipped_count = sum(1 for status in results.values() if status == "skipped")
+            error_count = total_files - success_count - cached_count - skipped_count
+        else:
+            # --- Loop through WAV files and process them one after another ---
+            progress = BatchProgress(sum(durations.values()), len(wav_files))
+            for i, input_wav_file_path in enumerate(wav_files):
+                print(
+                    f"\n--- Checking file {i + 1}/{total_files}: {input_wav_file_path.name} ---"
+                )
+                try:
+                    status = transcribe_file(
+                        input_wav_file_path,
+                        backend_pool,
+                        chunking=chunking,
+                        use_vad=use_vad,
+                        cache=cache,
+                        metrics_log=metrics_log,
+                        keep_wav=keep_wav,
+                    )
+                except FileNotFoundError:
+                    error_count += 1
+                    print("Aborting processing.")
+                    break
+                print(
+                    progress.file_done(
+                        durations[input_wav_file_path],
+                        processed=status not in ("skipped", "cached"),
+                    )
+                )
+                if status == "success":
+                    success_count += 1
+                elif status == "cached":
+                    cached_count += 1
+                elif status == "skipped":
+                    skipped_count += 1
+                else:
+                    error_count += 1
+    finally:
+        backend_pool.close()
 
     # --- MODIFIED: More generic summary title ---
     print("\n--- Processing Summary ---")
     print(f"Total files checked: {total_files}")
     print(f"Successfully transcribed: {success_count}")
+    print(f"Restored from cache: {cached_count}")
     print(f"Skipped (already exist): {skipped_count}")
     print(f"Failed to transcribe: {error_count}")
     print(f"All transcripts are located in: {transcripts_output_dir}")
 
+    if workers > 1 and not chunking:
+        print_throughput(stats, workers, threads)
+
+
+def add_batch_arguments(parser):
+    """Adds the options shared by the transcription scripts (all but the input path)."""
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of whisper.cpp processes to run at once (default: 1, sequential).",
+    )
+    parser.add_argument(
+        "--core-budget",
+        type=int,
+        default=None,
+        help="Total cores split evenly between workers (default: all available cores).",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=("cli", "server"),
+        default="cli",
+        help="cli: one whisper.cpp process per file. server: keep the model loaded "
+        "in a long-lived whisper.cpp server (falls back to cli if it cannot start).",
+    )
+    parser.add_argument(
+        "--server-url",
+        default=None,
+        help="Use an already running whisper.cpp server (e.g. http://127.0.0.1:8080).",
+    )
+    parser.add_argument(
+        "--chunked",
+        action="store_true",
+        help="Split recordings longer than one window into overlapping windows that are "
+        "transcribed in parallel (--workers at a time) and resumed after a crash.",
+    )
+    parser.add_argument(
+        "--window-seconds",
+        type=float,
+        default=DEFAULT_WINDOW_SECONDS,
+        help=f"Chunked mode window length (default: {DEFAULT_WINDOW_SECONDS:.0f}).",
+    )
+    parser.add_argument(
+        "--overlap-seconds",
+        type=float,
+        default=DEFAULT_OVERLAP_SECONDS,
+        help=f"Chunked mode overlap between windows (default: {DEFAULT_OVERLAP_SECONDS:.0f}).",
+    )
+    parser.add_argument(
+        "--vad",
+        action="store_true",
+        help="Skip silence and music: only speech regions are sent to whisper.cpp "
+        "and timestamps are mapped back to the original recording (needs NumPy).",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the content-addressed transcript cache.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=str(DEFAULT_CACHE_DIR),
+        help=f"Transcript cache location (default: {DEFAULT_CACHE_DIR}).",
+    )
+    parser.add_argument(
+        "--cache-max-gb",
+        type=float,
+        default=2.0,
+        help="Least recently used cache entries are evicted above this size (default: 2).",
+    )
+    parser.add_argument(
+        "--metrics-log",
+        default=str(DEFAULT_METRICS_LOG),
+        help=f"JSON-lines file receiving per-file timing and memory metrics (default: {DEFAULT_METRICS_LOG}).",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help=f"Also transcribe {'/'.join(MEDIA_EXTENSIONS)} files by piping ffmpeg's output "
+        "straight into whisper.cpp, without writing WAVs to disk.",
+    )
+    parser.add_argument(
+        "--keep-wav",
+        action="store_true",
+        help="With --stream, also save each decoded WAV in a converted_to_wav folder next to the media.",
+    )
+
+
+def batch_options(parser, args):
+    """main() keyword arguments for the options added by add_batch_arguments."""
+    if args.stream and (args.chunked or args.vad):
+        parser.error("--stream cannot be combined with --chunked or --vad (they need a WAV)")
+    return {
+        "workers": args.workers,
+        "core_budget": args.core_budget,
+        "backend_kind": args.backend,
+        "server_url": args.server_url,
+        "chunking": (
+            {
+                "window_seconds": args.window_seconds,
+                "overlap_seconds": args.overlap_seconds,
+            }
+            if args.chunked
+            else None
+        ),
+        "use_vad": args.vad,
+        "cache": (
+            None
+            if args.no_cache
+            else TranscriptCache(
+                model_path, args.cache_dir, int(args.cache_max_gb * 1024**3)
+            )
+        ),
+        "metrics_log": MetricsLog(args.metrics_log),
+        "stream": args.stream,
+        "keep_wav": args.keep_wav,
+    }
+
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(
+        description="Transcribe .wav files with whisper.cpp (auto language detection)."
+    )
+    parser.add_argument(
+        "input_path",
+        nargs="?",
+        help="Folder or single .wav file. You are prompted for it when omitted.",
+    )
+    add_batch_arguments(parser)
+    args = parser.parse_args()
+
+    main(args.input_path, **batch_options(parser, args))
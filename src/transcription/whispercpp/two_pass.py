@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# flake8: noqa
+
+"""
+Adaptive two-pass decoding.
+
+Pass 1 decodes the whole file with fast greedy search and full JSON output
+(per-token probabilities). Segments whose average log-probability or
+compression ratio fails the thresholds are grouped into time spans. Pass 2
+re-decodes only those spans with the profile's beam-search settings and
+prompt, and the results are spliced back into the pass-1 transcript.
+
+On clear lecture audio most segments pass, so the result is close to
+full beam-search quality for a fraction of the decode time.
+"""
+
+import json
+import math
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from chunking import json_decode_args, load_segments, write_transcripts, write_window_wav
+from scheduler import wav_duration
+
+# Same threshold the Arabic profile passes to whisper.cpp (--logprob-thold).
+LOGPROB_THRESHOLD = -0.8
+# Highly repetitive text (a common hallucination) compresses unusually well.
+COMPRESSION_RATIO_THRESHOLD = 2.4
+# Context added around each low-confidence span, and the gap below which spans merge.
+SPAN_PADDING_MS = 500
+SPAN_MERGE_GAP_MS = 1000
+
+
+def greedy_decode_args(decode_args):
+    """First-pass flags: the profile's language, greedy search, full JSON output."""
+    args = list(decode_args)
+    language = args[args.index("-l") + 1] if "-l" in args else "auto"
+    greedy_args = ["-l", language, "-bs", "1", "-bo", "1", "-ojf"]
+    if "-pp" in args:
+        greedy_args.append("-pp")
+    return greedy_args
+
+
+def compression_ratio(text: str) -> float:
+    encoded = text.encode("utf-8")
+    if not encoded:
+        return 0.0
+    return len(encoded) / len(zlib.compress(encoded))
+
+
+def average_logprob(segment: dict):
+    """Mean log-probability of a segment's text tokens (special tokens like [_BEG_] skipped)."""
+    if segment.get("avg_logprob") is not None:
+        return segment["avg_logprob"]
+    probabilities = [
+        token["p"]
+        for token in segment.get("tokens", [])
+        if "p" in token and not token.get("text", "").startswith("[_")
+    ]
+    if not probabilities:
+        return None
+    return sum(math.log(max(p, 1e-10)) for p in probabilities) / len(probabilities)
+
+
+def low_confidence_spans(segments, duration_ms):
+    """
+    Groups the segments that fail a threshold into merged spans.
+
+    Returns:
+        (start_ms, end_ms, core_start_ms, core_end_ms) per span: the padded
+        audio to re-decode, and the unpadded stretch it replaces. The padding
+        only gives the decoder context.
+    """
+    spans = []
+    for segment in segments:
+        logprob = average_logprob(segment)
+        failed = (logprob is not None and logprob < LOGPROB_THRESHOLD) or (
+            compression_ratio(segment["text"]) > COMPRESSION_RATIO_THRESHOLD
+        )
+        if not failed:
+            continue
+        core_start = segment["offsets"]["from"]
+        core_end = segment["offsets"]["to"]
+        start = max(core_start - SPAN_PADDING_MS, 0)
+        end = min(core_end + SPAN_PADDING_MS, duration_ms)
+        if spans and start - spans[-1][1] < SPAN_MERGE_GAP_MS:
+            previous = spans[-1]
+            spans[-1] = (previous[0], max(previous[1], end), previous[2], max(previous[3], core_end))
+        else:
+            spans.append((start, end, core_start, core_end))
+    return spans
+
+
+def midpoint(segment):
+    return (segment["start"] + segment["end"]) / 2
+
+
+def transcribe_two_pass(input_wav_path, output_base, backend_pool, decode_args, run=None):
+    """
+    Transcribes a WAV with greedy decoding, re-decoding low-confidence spans
+    with the full profile. Writes `.txt`, `.srt` and `.json` transcripts.
+
+    The pass-1 JSON (`<output_base>.pass1.json`) is kept until the file is
+    finished, so an interrupted run does not repeat the first pass.
+
+    Returns:
+        True on success.
+
+    Raises:
+        subprocess.CalledProcessError, backends.BackendError: If decoding fails.
+        FileNotFoundError: If the whisper.cpp executable cannot be found.
+    """
+    input_wav_path = Path(input_wav_path)
+    pass1_base = Path(f"{output_base}.pass1")
+    pass1_json = Path(f"{pass1_base}.json")
+    if not pass1_json.exists():
+        with backend_pool.borrow() as backend:
+            backend.transcribe(
+                input_wav_path, pass1_base, greedy_decode_args(decode_args), run=run
+            )
+    with open(pass1_json, "r", encoding="utf-8") as f:
+        pass1_segments = [
+            segment
+            for segment in json.load(f).get("transcription", [])
+            if segment["text"].strip()
+        ]
+
+    duration_ms = int(wav_duration(input_wav_path) * 1000)
+    spans = low_confidence_spans(pass1_segments, duration_ms)
+    span_ms = sum(end - start for start, end, _, _ in spans)
+    print(
+        f"Two-pass: {len(spans)} low-confidence span(s) covering {span_ms / 1000:.0f}s "
+        f"of {duration_ms / 1000:.0f}s ({span_ms / max(duration_ms, 1):.1%}) re-decoded with beam search."
+    )
+
+    span_args = json_decode_args(decode_args)
+
+    def redecode(index):
+        start, end, core_start, core_end = spans[index]
+        span_base = Path(f"{output_base}.span-{index:04d}")
+        span_wav_path = Path(f"{span_base}.wav")
+        write_window_wav(input_wav_path, span_wav_path, start / 1000, end / 1000)
+        try:
+            with backend_pool.borrow() as backend:
+                backend.transcribe(span_wav_path, span_base, span_args, run=run)
+            # Re-decoded text from the padding would repeat the pass-1 neighbours
+            return [
+                segment
+                for segment in load_segments(f"{span_base}.json", start / 1000)
+                if core_start <= midpoint(segment) < core_end
+            ]
+        finally:
+            span_wav_path.unlink(missing_ok=True)
+            Path(f"{span_base}.json").unlink(missing_ok=True)
+
+    with ThreadPoolExecutor(max_workers=backend_pool.size) as executor:
+        span_segments = list(executor.map(redecode, range(len(spans))))
+
+    # Keep pass-1 segments outside every replaced stretch and every kept
+    # re-decoded segment (which may run past its core), then splice those in
+    redecoded = [segment for segments in span_segments for segment in segments]
+    replaced = [(core_start, core_end) for _, _, core_start, core_end in spans] + [
+        (segment["start"], segment["end"]) for segment in redecoded
+    ]
+    merged = [
+        segment
+        for segment in load_segments(pass1_json, 0)
+        if not any(start <= midpoint(segment) < end for start, end in replaced)
+    ]
+    merged.extend(redecoded)
+    merged.sort(key=lambda segment: segment["start"])
+
+    write_transcripts(merged, output_base)
+    pass1_json.unlink(missing_ok=True)
+    return True
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# flake8: noqa
+
+"""
+Voice-activity pre-pass for whisper.cpp.
+
+Finds the speech regions of a 16 kHz mono WAV with a vectorized energy
+detector, writes only those regions to a compact WAV for whisper.cpp, and
+keeps a time map so the transcript timestamps can be put back on the
+original recording's timeline.
+
+Steady background music is rejected with a syllabic-modulation check: speech
+energy rises and falls several times a second, while music stays at a
+comparatively even level.
+"""
+
+import wave
+from pathlib import Path
+
+import numpy as np
+
+FRAME_MS = 30
+# Frames this far above the recording's noise floor count as speech...
+NOISE_MARGIN_DB = 12.0
+# ...as long as they are also louder than this (dBFS).
+ABSOLUTE_FLOOR_DB = -50.0
+# Std-dev of frame energy (dB) over ~1 s below which loud audio is treated as music.
+MIN_MODULATION_DB = 4.0
+MIN_SPEECH_MS = 300
+MIN_SILENCE_MS = 700
+PAD_MS = 200
+# Silence inserted between kept regions so whisper does not run words together.
+GAP_MS = 300
+
+
+def read_wav_mono(wav_path: Path):
+    """Reads a 16-bit PCM WAV as a mono int16 array. Returns (samples, sample_rate)."""
+    with wave.open(str(wav_path), "rb") as wav_file:
+        if wav_file.getsampwidth() != 2:
+            raise ValueError(f"{wav_path.name} is not 16-bit PCM.")
+        channels = wav_file.getnchannels()
+        rate = wav_file.getframerate()
+        samples = np.frombuffer(wav_file.readframes(wav_file.getnframes()), dtype="<i2")
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    return samples, rate
+
+
+def frame_energy_db(samples, frame_len):
+    """RMS level of each non-overlapping frame in dBFS."""
+    n_frames = len(samples) // frame_len
+    frames = samples[: n_frames * frame_len].reshape(n_frames, frame_len)
+    frames = frames.astype(np.float32) / 32768.0
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20.0 * np.log10(np.maximum(rms, 1e-10))
+
+
+def sliding_std(values, width):
+    """Standard deviation of `values` over a centred window of `width` frames."""
+    padded = np.pad(values, (width // 2, width - width // 2 - 1), mode="edge")
+    cumsum = np.concatenate(([0.0], np.cumsum(padded, dtype=np.float64)))
+    cumsum_sq = np.concatenate(([0.0], np.cumsum(padded.astype(np.float64) ** 2)))
+    mean = (cumsum[width:] - cumsum[:-width]) / width
+    mean_sq = (cumsum_sq[width:] - cumsum_sq[:-width]) / width
+    return np.sqrt(np.maximum(mean_sq - mean * mean, 0.0))
+
+
+def mask_to_runs(mask):
+    """Returns (start, end) frame indices of each run of True values."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def detect_speech(samples, rate, reject_music=True):
+    """
+    Finds speech regions.
+
+    Returns:
+        A list of (start_sample, end_sample) tuples, sorted and non-overlapping.
+    """
+    frame_len = int(rate * FRAME_MS / 1000)
+    energy_db = frame_energy_db(samples, frame_len)
+    if energy_db.size == 0:
+        return []
+
+    noise_floor_db = np.percentile(energy_db, 10)
+    threshold_db = max(noise_floor_db + NOISE_MARGIN_DB, ABSOLUTE_FLOOR_DB)
+    mask = energy_db > threshold_db
+    if reject_music:
+        modulation_db = sliding_std(energy_db, max(3, 1000 // FRAME_MS))
+        mask &= modulation_db > MIN_MODULATION_DB
+
+    # Close short pauses, then drop blips that are too short to be speech
+    starts, ends = mask_to_runs(mask)
+    if starts.size == 0:
+        return []
+    min_silence_frames = MIN_SILENCE_MS // FRAME_MS
+    keep_gap = (starts[1:] - ends[:-1]) >= min_silence_frames
+    starts = np.concatenate((starts[:1], starts[1:][keep_gap]))
+    ends = np.concatenate((ends[:-1][keep_gap], ends[-1:]))
+    long_enough = (ends - starts) >= MIN_SPEECH_MS // FRAME_MS
+    starts, ends = starts[long_enough], ends[long_enough]
+
+    # Pad each region and merge the ones that now touch
+    pad = int(rate * PAD_MS / 1000)
+    start_samples = np.maximum(starts * frame_len - pad, 0)
+    end_samples = np.minimum(ends * frame_len + pad, len(samples))
+    regions = []
+    for start, end in zip(start_samples.tolist(), end_samples.tolist()):
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    return regions
+
+
+def write_speech_wav(samples, rate, regions, output_wav_path):
+    """
+    Writes the speech regions back to back (separated by GAP_MS of silence).
+
+    Returns:
+        The time map: a list of (compact_start_ms, original_start_ms, length_ms).
+    """
+    gap = np.zeros(int(rate * GAP_MS / 1000), dtype=np.int16)
+    time_map = []
+    compact_samples = 0
+    with wave.open(str(output_wav_path), "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(rate)
+        for index, (start, end) in enumerate(regions):
+            if index:
+                wav_file.writeframes(gap.tobytes())
+                compact_samples += gap.size
+            time_map.append(
+                (
+                    compact_samples * 1000 // rate,
+                    start * 1000 // rate,
+                    (end - start) * 1000 // rate,
+                )
+            )
+            wav_file.writeframes(samples[start:end].astype("<i2").tobytes())
+            compact_samples += end - start
+    return time_map
+
+
+def to_original_ms(compact_ms, time_map):
+    """Maps a timestamp in the compact WAV back to the original recording."""
+    region = time_map[0]
+    for entry in time_map:
+        if entry[0] > compact_ms:
+            break
+        region = entry
+    compact_start, original_start, length = region
+    return original_start + min(max(compact_ms - compact_start, 0), length)
+
+
+def format_report(samples, rate, regions):
+    """One-line summary of how much audio the pre-pass removed."""
+    total_seconds = len(samples) / rate
+    kept_seconds = sum(end - start for start, end in regions) / rate
+    skipped_seconds = total_seconds - kept_seconds
+    share = skipped_seconds / total_seconds * 100 if total_seconds else 0.0
+    return (
+        f"VAD: kept {kept_seconds:.0f}s of {total_seconds:.0f}s in {len(regions)} "
+        f"speech region(s), skipped {skipped_seconds:.0f}s ({share:.0f}%)."
+    )
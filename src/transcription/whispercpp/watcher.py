@@ -0,0 +1,582 @@
+#!/usr/bin/env python3
+# flake8: noqa
+
+"""
+Watch-folder daemon: download → convert → transcribe as files land.
+
+Watches the audio-lectures folder (recursively) and runs each file through
+the same steps as yt-get-audio.py, convert-to-wav.py and transcriber.py,
+without waiting for whole batches:
+
+- a youtube-urls.txt saved in a batch folder downloads its URLs with yt-dlp
+  (already downloaded URLs are skipped through yt-dlp's download archive),
+- a finished .mp3/.m4a/.mp4/.opus/.wav file is converted to
+  converted_to_wav/<name>.wav next to it,
+- a WAV in converted_to_wav is transcribed with whisper.cpp.
+
+Every stage has a bounded queue and its own number of workers, so the stages
+overlap: the first lecture is transcribed while the rest still download.
+A full queue blocks the stage feeding it rather than piling up work.
+
+Files are picked up when complete: on Linux through inotify (close-after-write
+or rename into the folder), elsewhere by polling until a file's size and
+mtime stop changing. Media in a batch folder (one holding youtube-urls.txt)
+is only taken from the paths yt-dlp reports when it finishes, since yt-dlp
+renames and deletes intermediate files there. Jobs writing the same WAV or
+transcript run one at a time. Ctrl+C (or SIGTERM) stops watching and drains the
+queued work stage by stage; press Ctrl+C again to abort immediately.
+
+Usage:
+    python3 watcher.py /path/to/audio-lectures --convert-workers 4
+"""
+
+import argparse
+import collections
+import ctypes
+import ctypes.util
+import importlib
+import os
+import queue
+import select
+import signal
+import struct
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import transcriber
+from backends import create_backend_pool
+from cache import DEFAULT_CACHE_DIR, TranscriptCache
+from media import CONVERTED_SUBDIR, kept_wav_path
+from metrics import DEFAULT_METRICS_LOG, MetricsLog
+from profiles import PROFILES
+from scheduler import default_core_budget, split_core_budget
+
+# The conversion and download scripts live in src/utils; their file names have
+# dashes, so they are imported with importlib
+UTILS_DIR = Path(__file__).resolve().parents[2] / "utils"
+sys.path.insert(0, str(UTILS_DIR / "audio"))
+sys.path.insert(0, str(UTILS_DIR / "downloaders" / "youtube"))
+convert_to_wav = importlib.import_module("convert-to-wav")
+yt_get_audio = importlib.import_module("yt-get-audio")
+
+# yt-dlp records downloaded video IDs here (one file per batch folder)
+DOWNLOAD_ARCHIVE_FILENAME = ".yt-dlp-archive.txt"
+# Files still being written by yt-dlp, ffmpeg or our own scripts, and aria2c's
+# control files (yt-dlp downloads through aria2c)
+INCOMPLETE_SUFFIXES = (".part", ".ytdl", ".partial", ".tmp", ".aria2")
+# A file is complete once it has not changed for this long (startup scan and polling)
+SETTLE_SECONDS = 5.0
+DEFAULT_POLL_SECONDS = 5.0
+DEFAULT_QUEUE_SIZE = 32
+# Finished items each stage remembers to ignore repeat events for. Older ones
+# are forgotten; if they come up again, the handlers find their output current.
+DONE_MEMORY = 4096
+
+# inotify(7) event bits
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+def classify(path: Path):
+    """
+    Returns the stage a file belongs to: "urls", "convert", "transcribe", or
+    None for files the watcher ignores.
+    """
+    name = path.name.lower()
+    if name.startswith(".") or name.endswith(INCOMPLETE_SUFFIXES) or ".temp." in name:
+        return None
+    if path.name == yt_get_audio.YOUTUBE_URLS_FILE:
+        return "urls"
+    if path.parent.name == CONVERTED_SUBDIR:
+        return "transcribe" if name.endswith(".wav") else None
+    if CONVERTED_SUBDIR in path.parts:
+        return None
+    if name.endswith(convert_to_wav.SUPPORTED_EXTENSIONS):
+        return "convert"
+    return None
+
+
+def is_download_batch(directory: Path) -> bool:
+    """True for a batch folder the watcher downloads into (it holds youtube-urls.txt)."""
+    return (directory / yt_get_audio.YOUTUBE_URLS_FILE).is_file()
+
+
+def is_settled(path: Path, now=None) -> bool:
+    """True for a file that has not been modified for SETTLE_SECONDS."""
+    try:
+        return path.is_file() and (now or time.time()) - path.stat().st_mtime >= SETTLE_SECONDS
+    except OSError:
+        return False
+
+
+def settled_files(root: Path):
+    """Files under root that have not been modified for SETTLE_SECONDS."""
+    now = time.time()
+    for path in sorted(root.rglob("*")):
+        if is_settled(path, now):
+            yield path
+
+
+def recent_files(root: Path):
+    """Files under root modified within the last SETTLE_SECONDS."""
+    now = time.time()
+    for path in sorted(root.rglob("*")):
+        try:
+            if path.is_file() and now - path.stat().st_mtime < SETTLE_SECONDS:
+                yield path
+        except OSError:
+            continue
+
+
+class InotifyWatcher:
+    """Reports files as they are closed after writing or moved in (Linux only)."""
+
+    def __init__(self, root: Path):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available on this platform.")
+        self._libc = libc
+        self._fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.root = root
+        self._dirs = {}
+        self._watch_tree(root)
+
+    def _watch_tree(self, directory: Path):
+        """Watches directory and its subfolders. Returns the files already inside."""
+        found = []
+        for path in [directory, *directory.rglob("*")]:
+            if path.is_dir():
+                wd = self._libc.inotify_add_watch(
+                    self._fd,
+                    os.fsencode(path),
+                    IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE,
+                )
+                if wd >= 0:
+                    self._dirs[wd] = path
+            elif path.is_file():
+                found.append(path)
+        return found
+
+    def changes(self, timeout: float) -> list[Path]:
+        """Complete files reported within timeout seconds."""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        data = os.read(self._fd, 64 * 1024)
+        files = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = data[offset : offset + name_length].rstrip(b"\0")
+            offset += name_length
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped: fall back to a full scan
+                files.extend(settled_files(self.root))
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None or not name:
+                continue
+            path = directory / os.fsdecode(name)
+            if mask & IN_ISDIR:
+                # New folder: watch it, and pick up what landed before the watch existed
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    files.extend(self._watch_tree(path))
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                files.append(path)
+        return files
+
+    def close(self):
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """Reports files once their size and mtime stay the same between two scans."""
+
+    def __init__(self, root: Path, interval: float = DEFAULT_POLL_SECONDS):
+        self.root = root
+        self.interval = interval
+        self._seen = {}
+        self._reported = {}
+        self._scan()
+        # Settled files present at startup are handled by the startup scan
+        settled = set(settled_files(root))
+        self._reported = {path: sig for path, sig in self._seen.items() if path in settled}
+
+    def _scan(self):
+        current = {}
+        for path in self.root.rglob("*"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if path.is_file():
+                current[path] = (stat.st_size, stat.st_mtime_ns)
+        previous, self._seen = self._seen, current
+        return previous
+
+    def changes(self, timeout: float) -> list[Path]:
+        time.sleep(min(timeout, self.interval))
+        previous = self._scan()
+        files = []
+        for path, stamp in self._seen.items():
+            if previous.get(path) == stamp and self._reported.get(path) != stamp:
+                self._reported[path] = stamp
+                files.append(path)
+        return files
+
+    def close(self):
+        pass
+
+
+def signature(item):
+    """Identifies a unit of work: a file counts as new again once it changes."""
+    if isinstance(item, Path):
+        try:
+            return item, item.stat().st_mtime_ns
+        except OSError:
+            return item, None
+    return item
+
+
+class Stage:
+    """
+    A bounded queue served by a fixed number of worker threads. Items already
+    queued, in progress, or recently done (and unchanged since) are not queued
+    again.
+    """
+
+    _STOP = object()
+
+    def __init__(self, name: str, handler, workers: int, queue_size: int = DEFAULT_QUEUE_SIZE):
+        self.name = name
+        self.handler = handler
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._pending = set()
+        # Least recently seen first, capped at DONE_MEMORY
+        self._done = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"{name}-{i + 1}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, item) -> bool:
+        """Queues item, blocking while the queue is full. False for duplicates."""
+        key = signature(item)
+        with self._lock:
+            if key in self._done:
+                self._done.move_to_end(key)
+                return False
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+        self._queue.put((key, item))
+        return True
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is self._STOP:
+                return
+            key, item = job
+            done = False
+            try:
+                self.handler(item)
+                done = True
+            except Exception as e:
+                print(f"[{self.name}] Error on {item}: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+                    if done:
+                        # Failed items can be retried when they show up again
+                        self._done[key] = None
+                        if len(self._done) > DONE_MEMORY:
+                            self._done.popitem(last=False)
+
+    def drain(self):
+        """Finishes everything queued so far, then stops the workers."""
+        for _ in self._threads:
+            self._queue.put(self._STOP)
+        for thread in self._threads:
+            thread.join()
+
+
+def output_is_current(source_path: Path, output_path: Path) -> bool:
+    try:
+        return output_path.stat().st_mtime_ns >= source_path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+def download_url(batch_dir: Path, url: str):
+    """
+    Downloads one URL with yt-dlp (same settings as yt-get-audio.py).
+
+    Returns:
+        The paths of the audio files written.
+    """
+    command = yt_get_audio.YT_DLP_STATIC_ARGS + [
+        "--download-archive",
+        str(batch_dir / DOWNLOAD_ARCHIVE_FILENAME),
+        "--print",
+        "after_move:filepath",
+        "-o",
+        str(batch_dir / "%(title)s.%(ext)s"),
+        url,
+    ]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"yt-dlp failed for {url}:\n{result.stderr.strip()}")
+    return [Path(line) for line in result.stdout.splitlines() if line.strip()]
+
+
+class Pipeline:
+    """The three stages and the rules that move a file from one to the next."""
+
+    def __init__(
+        self,
+        backend_pool,
+        download_workers,
+        convert_workers,
+        transcribe_workers,
+        queue_size=DEFAULT_QUEUE_SIZE,
+        cache=None,
+        metrics_log=None,
+        profile="bilingual",
+    ):
+        self.backend_pool = backend_pool
+        self.cache = cache
+        self.metrics_log = metrics_log
+        self.profile = profile
+        # One lock per WAV: its conversion and its transcription never overlap
+        # with another job writing the same files
+        self._output_locks = {}
+        self._output_locks_lock = threading.Lock()
+        # Created downstream first, so every stage exists before work reaches it
+        self.transcribe = Stage("transcribe", self._transcribe, transcribe_workers, queue_size)
+        self.convert = Stage("convert", self._convert, convert_workers, queue_size)
+        self.download = Stage("download", self._download, download_workers, queue_size)
+
+    def output_lock(self, wav_path: Path) -> threading.Lock:
+        with self._output_locks_lock:
+            return self._output_locks.setdefault(wav_path, threading.Lock())
+
+    def route(self, path: Path, final=False):
+        """
+        Sends a complete file to the stage it belongs to.
+
+        Args:
+            final: The file is known to be finished: reported by yt-dlp, or
+                settled when the watcher started. Media in download batch
+                folders is only routed when final, since a file event there
+                may be an intermediate download yt-dlp is about to replace.
+        """
+        kind = classify(path)
+        if kind == "convert" and not final and is_download_batch(path.parent):
+            return
+        if kind == "urls":
+            try:
+                lines = path.read_text(encoding="utf-8").splitlines()
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"[download] Cannot read {path}: {e}")
+                return
+            for url in dict.fromkeys(line.strip() for line in lines if line.strip()):
+                self.download.submit((path.parent, url))
+        elif kind == "convert":
+            self.convert.submit(path)
+        elif kind == "transcribe":
+            self.transcribe.submit(path)
+
+    def _download(self, job):
+        batch_dir, url = job
+        print(f"[download] {url}")
+        for media_path in download_url(batch_dir, url):
+            print(f"[download] Saved: {media_path.name}")
+            self.route(media_path, final=True)
+
+    def _convert(self, media_path: Path):
+        wav_path = kept_wav_path(media_path)
+        # a.mp3 and a.m4a, or two versions of one file, share a WAV
+        with self.output_lock(wav_path):
+            if not output_is_current(media_path, wav_path):
+                wav_path.parent.mkdir(parents=True, exist_ok=True)
+                lines = []
+                converted = convert_to_wav.run_conversion(media_path, wav_path, log=lines.append)
+                # One write per file so lines from parallel workers do not interleave
+                print("".join(f"[convert] {line}\n" for line in lines), end="")
+                if not converted:
+                    return
+        # Outside the lock: submit blocks while the transcribe queue is full
+        self.transcribe.submit(wav_path)
+
+    def _transcribe(self, wav_path: Path):
+        with self.output_lock(wav_path):
+            if not wav_path.exists():
+                return
+            status = transcriber.transcribe_file(
+                wav_path,
+                self.backend_pool,
+                verbose=False,
+                cache=self.cache,
+                metrics_log=self.metrics_log,
+                profile=self.profile,
+            )
+        print(f"[transcribe] {wav_path.name}: {status}")
+
+    def drain(self):
+        # Upstream first: whatever a stage still produces reaches the next one
+        for stage in (self.download, self.convert, self.transcribe):
+            print(f"Draining {stage.name}...")
+            stage.drain()
+
+
+def create_watcher(root: Path, poll: bool, poll_interval: float):
+    if not poll:
+        try:
+            return InotifyWatcher(root)
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable ({e}); polling every {poll_interval:g}s instead.")
+    return PollingWatcher(root, poll_interval)
+
+
+def watch(root: Path, pipeline: Pipeline, poll=False, poll_interval=DEFAULT_POLL_SECONDS):
+    """Routes files until SIGINT/SIGTERM, then drains the pipeline."""
+    stop = threading.Event()
+
+    def request_stop(signum, frame):
+        print("\nStopping: finishing queued work (Ctrl+C again to abort).")
+        stop.set()
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    watcher = create_watcher(root, poll, poll_interval)
+    print(f"Watching: {root} ({type(watcher).__name__})")
+    try:
+        # Files written just before the watch began may have been closed before
+        # it could see them; they are routed once they settle
+        recent = set(recent_files(root))
+        # Work that landed while the watcher was not running
+        for path in settled_files(root):
+            if stop.is_set():
+                break
+            pipeline.route(path, final=True)
+        while not stop.is_set():
+            for path in watcher.changes(timeout=1.0):
+                pipeline.route(path)
+            settled = {path for path in recent if is_settled(path) or not path.exists()}
+            for path in sorted(settled):
+                if path.exists():
+                    pipeline.route(path, final=True)
+            recent -= settled
+    finally:
+        watcher.close()
+        pipeline.drain()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Watch a folder and download, convert and transcribe files as they land."
+    )
+    parser.add_argument(
+        "root",
+        nargs="?",
+        default=str(yt_get_audio.BASE_OUTPUT_PARENT_DIR),
+        help=f"Folder to watch, recursively (default: {yt_get_audio.BASE_OUTPUT_PARENT_DIR}).",
+    )
+    parser.add_argument("--download-workers", type=int, default=2, help="Concurrent yt-dlp runs (default: 2).")
+    parser.add_argument(
+        "--convert-workers",
+        type=int,
+        default=convert_to_wav.default_workers(),
+        help="Concurrent conversions (default: one per core, at most "
+        f"{convert_to_wav.MAX_DEFAULT_WORKERS}).",
+    )
+    parser.add_argument(
+        "--transcribe-workers",
+        type=int,
+        default=1,
+        help="Concurrent whisper.cpp runs; the core budget is split between them (default: 1).",
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=DEFAULT_QUEUE_SIZE,
+        help=f"Files waiting per stage before the previous stage blocks (default: {DEFAULT_QUEUE_SIZE}).",
+    )
+    parser.add_argument("--poll", action="store_true", help="Poll for changes even where inotify is available.")
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=DEFAULT_POLL_SECONDS,
+        help=f"Seconds between scans in polling mode (default: {DEFAULT_POLL_SECONDS:g}).",
+    )
+    parser.add_argument("--profile", choices=tuple(PROFILES), default="bilingual")
+    parser.add_argument("--backend", choices=("cli", "server"), default="cli")
+    parser.add_argument("--server-url", default=None)
+    parser.add_argument("--no-cache", action="store_true", help="Do not use the transcript cache.")
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR))
+    parser.add_argument(
+        "--cache-max-gb",
+        type=float,
+        default=2.0,
+        help="Least recently used cache entries are evicted above this size (default: 2).",
+    )
+    parser.add_argument("--metrics-log", default=str(DEFAULT_METRICS_LOG))
+    args = parser.parse_args()
+
+    root = Path(args.root).expanduser().resolve()
+    if not root.is_dir():
+        parser.error(f"not a folder: {root}")
+    transcriber.transcripts_output_dir.mkdir(parents=True, exist_ok=True)
+
+    if args.transcribe_workers > 1:
+        threads, processors = str(split_core_budget(default_core_budget(), args.transcribe_workers)), "1"
+    else:
+        threads, processors = transcriber.num_threads, transcriber.num_processors
+    backend_pool = create_backend_pool(
+        args.backend,
+        args.transcribe_workers,
+        transcriber.whisper_cpp_executable,
+        transcriber.whisper_server_executable,
+        transcriber.model_path,
+        threads,
+        processors,
+        args.server_url,
+    )
+    try:
+        watch(
+            root,
+            Pipeline(
+                backend_pool,
+                args.download_workers,
+                args.convert_workers,
+                args.transcribe_workers,
+                queue_size=args.queue_size,
+                cache=None
+                if args.no_cache
+                else TranscriptCache(
+                    transcriber.model_path, args.cache_dir, int(args.cache_max_gb * 1024**3)
+                ),
+                metrics_log=MetricsLog(args.metrics_log),
+                profile=args.profile,
+            ),
+            poll=args.poll,
+            poll_interval=args.poll_interval,
+        )
+    finally:
+        backend_pool.close()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# flake8: noqa
+
+"""
+Compares the in-process WAV normalizer (wav_normalizer.py) with an ffmpeg
+subprocess on the same 44.1 kHz stereo input: wall time, peak memory, and
+how closely the two 16 kHz mono outputs agree.
+
+Usage:
+    python3 benchmark_normalizer.py --minutes 10 --runs 3
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import wave
+from pathlib import Path
+
+import numpy as np
+
+from wav_normalizer import normalize_wav
+
+FIXTURE_RATE = 44100
+
+
+def write_fixture(path: Path, minutes: float):
+    """Writes a 44.1 kHz stereo WAV of tones with a speech-like envelope plus noise, in 10 s blocks."""
+    rng = np.random.default_rng(0)
+    total = int(minutes * 60 * FIXTURE_RATE)
+    block = 10 * FIXTURE_RATE
+    with wave.open(str(path), "wb") as wav_file:
+        wav_file.setnchannels(2)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(FIXTURE_RATE)
+        for start in range(0, total, block):
+            t = np.arange(start, min(start + block, total)) / FIXTURE_RATE
+            envelope = 0.6 + 0.4 * np.sin(2 * np.pi * 4 * t)
+            left = envelope * (6000 * np.sin(2 * np.pi * 220 * t) + 2000 * np.sin(2 * np.pi * 3100 * t))
+            right = envelope * 6000 * np.sin(2 * np.pi * 330 * t)
+            stereo = np.stack([left, right], axis=1) + rng.normal(0, 300, (len(t), 2))
+            wav_file.writeframes(np.clip(stereo, -32768, 32767).astype("<i2").tobytes())
+
+
+def run_in_process(input_path: Path, output_path: Path):
+    """Returns (wall seconds, peak traced bytes) for one normalize_wav call."""
+    tracemalloc.start()
+    start_time = time.monotonic()
+    normalize_wav(input_path, output_path)
+    wall_seconds = time.monotonic() - start_time
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return wall_seconds, peak_bytes
+
+
+def run_ffmpeg(input_path: Path, output_path: Path):
+    """Returns (wall seconds, peak RSS bytes) for one ffmpeg conversion."""
+    command = [
+        "ffmpeg",
+        "-nostdin",
+        "-loglevel",
+        "error",
+        "-y",
+        "-i",
+        str(input_path),
+        "-ar",
+        "16000",
+        "-ac",
+        "1",
+        "-c:a",
+        "pcm_s16le",
+        str(output_path),
+    ]
+    start_time = time.monotonic()
+    process = subprocess.Popen(command)
+    _, status, usage = os.wait4(process.pid, 0)
+    wall_seconds = time.monotonic() - start_time
+    if os.waitstatus_to_exitcode(status) != 0:
+        raise RuntimeError("ffmpeg failed.")
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    peak_bytes = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    return wall_seconds, peak_bytes
+
+
+def read_samples(path: Path):
+    with wave.open(str(path), "rb") as wav_file:
+        return np.frombuffer(wav_file.readframes(wav_file.getnframes()), dtype="<i2").astype(np.float64)
+
+
+def agreement_db(a, b) -> float:
+    """Signal-to-difference ratio between two outputs (higher means closer)."""
+    length = min(len(a), len(b))
+    # Skip the edges, where the two resamplers pad differently
+    edge = min(1600, length // 4)
+    a, b = a[edge : length - edge], b[edge : length - edge]
+    difference = np.sum((a - b) ** 2)
+    return float("inf") if difference == 0 else 10 * np.log10(np.sum(a * a) / difference)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the in-process WAV normalizer against ffmpeg.")
+    parser.add_argument("--minutes", type=float, default=10.0, help="Fixture length (default: 10).")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per path; the median is reported (default: 3).")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="nasikh-normalizer-") as temp_dir:
+        temp_dir = Path(temp_dir)
+        input_path = temp_dir / "fixture-44k-stereo.wav"
+        print(f"Generating a {args.minutes:g}-minute 44.1 kHz stereo fixture...")
+        write_fixture(input_path, args.minutes)
+        audio_seconds = args.minutes * 60
+
+        results = {}
+        numpy_runs = [run_in_process(input_path, temp_dir / "numpy.wav") for _ in range(args.runs)]
+        results["numpy (in-process)"] = numpy_runs
+        if shutil.which("ffmpeg"):
+            results["ffmpeg (subprocess)"] = [
+                run_ffmpeg(input_path, temp_dir / "ffmpeg.wav") for _ in range(args.runs)
+            ]
+        else:
+            print("ffmpeg not found: only the in-process path is measured.")
+
+        print(f"\n{'Path':<22}{'Wall (s)':>10}{'x real time':>13}{'Peak memory':>14}")
+        for name, runs in results.items():
+            wall_seconds = statistics.median(run[0] for run in runs)
+            peak_mb = max(run[1] for run in runs) / 1024**2
+            print(f"{name:<22}{wall_seconds:>10.2f}{audio_seconds / wall_seconds:>13.0f}{peak_mb:>11.1f} MB")
+        print("(numpy peak = traced allocations; ffmpeg peak = process RSS)")
+
+        if "ffmpeg (subprocess)" in results:
+            similarity = agreement_db(read_samples(temp_dir / "numpy.wav"), read_samples(temp_dir / "ffmpeg.wav"))
+            print(f"\nOutput agreement: {similarity:.1f} dB signal-to-difference")
@@ -1,31 +1,109 @@
+import argparse
 import subprocess
 import os
-import sys
+import re
 import math
 
+from probe_index import ProbeIndex
+
+# Fixed Output Directory
+DEFAULT_OUTPUT_DIR = "/Users/viz1er/Movies/Trading Sessions"
+
+# Output formats: (sample rate, channels, part length in seconds).
+# Part lengths keep each WAV under 200MB:
+#   archive:       16-bit, 44.1kHz, stereo = ~176.4 KB/s -> 1100s (~185MB)
+#   transcription: 16-bit, 16kHz, mono     = ~32 KB/s    -> 6000s (~183MB),
+#                  the format whisper.cpp reads (about 1/11 of the bytes)
+TARGETS = {
+    "archive": (44100, 2, 1100),
+    "transcription": (16000, 1, 6000),
+}
+
+# Silence-aware cuts: look this far back from each planned boundary for a
+# pause, so parts never get longer than planned.
+SILENCE_SEARCH_SECONDS = 60
+SILENCE_NOISE = "-35dB"
+SILENCE_MIN_SECONDS = 0.4
+
 
 def get_duration(input_file):
-    """Gets the duration of the input file using ffprobe."""
+    """
+    Gets the duration of the input file from the probe index (ffprobe runs
+    only the first time a file is seen). Returns None for unreadable files.
+    """
+    probe_index = ProbeIndex()
+    probe = probe_index.probe(input_file)
+    probe_index.close()
+    if probe["error"]:
+        print(f"Error: Cannot read '{input_file}': {probe['error']}")
+        return None
+    return probe["duration"]
+
+
+def detect_silences(input_file, total_duration=None):
+    """
+    Returns (start, end) of every pause found by ffmpeg's silencedetect filter.
+    A pause still running at the end of the file ends at total_duration, or
+    is dropped when that is not given.
+    """
     cmd = [
-        "ffprobe",
-        "-v",
-        "error",
-        "-show_entries",
-        "format=duration",
-        "-of",
-        "default=noprint_wrappers=1:nokey=1",
+        "ffmpeg",
+        "-nostdin",
+        "-i",
         input_file,
+        "-vn",
+        "-af",
+        f"silencedetect=noise={SILENCE_NOISE}:d={SILENCE_MIN_SECONDS}",
+        "-f",
+        "null",
+        "-",
     ]
     result = subprocess.run(
-        cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+        cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
     )
-    return float(result.stdout)
-
-
-def convert_and_split(input_path):
-    # Fixed Output Directory
-    output_dir = "/Users/viz1er/Movies/Trading Sessions"
-
+    silences = []
+    start = None
+    # Starts can be slightly negative at the beginning of a file
+    for kind, value in re.findall(r"silence_(start|end): (-?[\d.]+)", result.stderr):
+        if kind == "start":
+            start = float(value)
+        elif start is not None:
+            silences.append((max(start, 0.0), float(value)))
+            start = None
+    if start is not None and total_duration is not None:
+        silences.append((max(start, 0.0), total_duration))
+    return silences
+
+
+def plan_cuts(total_duration, chunk_duration_seconds, silences=None):
+    """
+    Returns the cut points between parts. Without silences the parts are
+    fixed-length; with silences each cut moves back to the middle of the
+    latest pause within SILENCE_SEARCH_SECONDS of the planned boundary.
+    """
+    cuts = []
+    previous_cut = 0.0
+    while previous_cut + chunk_duration_seconds < total_duration:
+        boundary = previous_cut + chunk_duration_seconds
+        pauses = [
+            (start + end) / 2
+            for start, end in silences or []
+            if boundary - SILENCE_SEARCH_SECONDS <= (start + end) / 2 <= boundary
+        ]
+        cut = max(pauses) if pauses else boundary
+        cuts.append(round(cut, 3))
+        previous_cut = cut
+    return cuts
+
+
+def convert_and_split(
+    input_path, output_dir=DEFAULT_OUTPUT_DIR, target="archive", cut_at_silence=False
+):
+    """
+    Converts a video to WAV parts in one ffmpeg run: the segment muxer starts
+    a new part at each cut point, so the conversion decodes the file once.
+    With cut_at_silence, finding the pauses takes one more decode first.
+    """
     # Ensure the directory exists
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
@@ -35,54 +113,88 @@ def convert_and_split(input_path):
         print(f"Error: Input file '{input_path}' not found.")
         return
 
-    # Configuration for < 200MB chunks
-    # WAV (16-bit, 44.1kHz, Stereo) = ~176.4 KB/s
-    # 200MB / 176.4 KB/s = ~1188 seconds.
-    # We use 1100 seconds (~185MB) to stay safely under the limit.
-    chunk_duration_seconds = 1100
+    sample_rate, channels, chunk_duration_seconds = TARGETS[target]
 
     base_name = os.path.splitext(os.path.basename(input_path))[0]
     total_duration = get_duration(input_path)
-    num_chunks = math.ceil(total_duration / chunk_duration_seconds)
+    if total_duration is None:
+        return
 
     print(f"--- Processing: {base_name} ---")
+    silences = None
+    if cut_at_silence:
+        print("Detecting pauses near part boundaries...")
+        silences = detect_silences(input_path, total_duration)
+    cuts = plan_cuts(total_duration, chunk_duration_seconds, silences)
+    num_chunks = len(cuts) + 1
     print(
-        f"Total Duration: {total_duration:.2f}s | Splitting into {num_chunks} parts..."
+        f"Total Duration: {total_duration:.2f}s | Splitting into {num_chunks} parts "
+        f"({sample_rate} Hz, {'mono' if channels == 1 else 'stereo'})..."
     )
 
-    for i in range(num_chunks):
-        start_time = i * chunk_duration_seconds
-        output_filename = f"{base_name}-part-{str(i+1).zfill(2)}.wav"
-        full_output_path = os.path.join(output_dir, output_filename)
-
-        # ffmpeg command
-        cmd = [
-            "ffmpeg",
-            "-y",
-            "-ss",
-            str(start_time),
-            "-t",
-            str(chunk_duration_seconds),
-            "-i",
-            input_path,
-            "-vn",  # No video
-            "-acodec",
-            "pcm_s16le",  # Standard 16-bit WAV
-            "-ar",
-            "44100",  # 44.1kHz sample rate
-            "-ac",
-            "2",  # Stereo
-            full_output_path,
-        ]
+    # The segment muxer reads % as a pattern; a literal one is written %%
+    output_pattern = os.path.join(output_dir, f"{base_name.replace('%', '%%')}-part-%02d.wav")
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-nostdin",
+        "-i",
+        input_path,
+        "-vn",  # No video
+        "-acodec",
+        "pcm_s16le",  # Standard 16-bit WAV
+        "-ar",
+        str(sample_rate),
+        "-ac",
+        str(channels),
+        "-f",
+        "segment",
+        "-segment_start_number",
+        "1",
+        "-reset_timestamps",
+        "1",
+    ]
+    if cuts:
+        cmd += ["-segment_times", ",".join(str(cut) for cut in cuts)]
+    else:
+        # A single part: never split
+        cmd += ["-segment_time", str(math.ceil(total_duration) + 1)]
+    cmd.append(output_pattern)
 
-        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
-        print(f"Saved: {full_output_path}")
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        print(f"Error: ffmpeg failed for '{input_path}':\n{result.stderr.strip()}")
+        return
+
+    part_starts = [0.0] + cuts
+    for i, start_time in enumerate(part_starts):
+        output_filename = f"{base_name}-part-{str(i+1).zfill(2)}.wav"
+        print(f"Saved: {os.path.join(output_dir, output_filename)} (from {start_time:.1f}s)")
 
-    print("\nAll parts successfully saved to Trading Sessions folder!")
+    print(f"\nAll parts successfully saved to {output_dir}!")
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
+    parser = argparse.ArgumentParser(
+        description="Convert a .mov file to WAV parts of under 200MB in one ffmpeg run."
+    )
+    parser.add_argument("path", nargs="?", help="The .mov file. You are prompted for it when omitted.")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument(
+        "--target",
+        choices=tuple(TARGETS),
+        default="archive",
+        help="archive: 44.1kHz stereo, 1100s parts. transcription: 16kHz mono "
+        "(what whisper.cpp reads), 6000s parts.",
+    )
+    parser.add_argument(
+        "--cut-at-silence",
+        action="store_true",
+        help="Move each cut back to a pause (within 60s) so words are not split.",
+    )
+    args = parser.parse_args()
+
+    if args.path is None:
         path = (
             input("Drag and drop the .mov file here (or enter path): ")
             .strip()
@@ -90,6 +202,8 @@ if __name__ == "__main__":
             .strip('"')
         )
     else:
-        path = sys.argv[1].strip("'").strip('"')
+        path = args.path.strip("'").strip('"')
 
-    convert_and_split(path)
+    convert_and_split(
+        path, args.output_dir, target=args.target, cut_at_silence=args.cut_at_silence
+    )
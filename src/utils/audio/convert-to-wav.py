@@ -5,10 +5,46 @@ import os
 import subprocess
 import shutil
 import argparse
+import hashlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+from probe_index import ProbeIndex, format_eta
+
 # Define supported file extensions for easier management
-SUPPORTED_EXTENSIONS = (".mp3", ".m4a", ".mp4", ".opus")
+SUPPORTED_EXTENSIONS = (".mp3", ".m4a", ".mp4", ".opus", ".wav")
+# WAV inputs are resampled in-process (wav_normalizer.py) instead of by ffmpeg
+WAV_EXTENSION = ".wav"
+
+# Upper bound on concurrent ffmpeg processes. Decoding compressed audio is
+# cheap enough that more processes mostly compete for disk bandwidth.
+MAX_DEFAULT_WORKERS = 8
+
+# ffmpeg output settings. They are also recorded in the manifest, so changing
+# them makes every file convert again.
+WAV_ARGS = [
+    "-vn",  # No video: explicitly disable video recording
+    "-ar",
+    "16000",  # Audio sample rate: 16kHz
+    "-ac",
+    "1",  # Audio channels: 1 (mono)
+    "-c:a",
+    "pcm_s16le",  # Codec: PCM signed 16-bit little-endian
+]
+
+# Record of converted sources, stored beside the 'converted_to_wav' folder
+MANIFEST_FILENAME = "converted_to_wav.manifest.json"
+
+
+def default_workers() -> int:
+    """One single-threaded ffmpeg per available core, capped to limit concurrent disk I/O."""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:  # macOS
+        cores = os.cpu_count() or 1
+    return max(1, min(cores, MAX_DEFAULT_WORKERS))
 
 
 def check_ffmpeg():
@@ -22,31 +58,28 @@ def check_ffmpeg():
     return True
 
 
-def run_ffmpeg_conversion(input_path: Path, output_path: Path) -> bool:
+def run_ffmpeg_conversion(input_path: Path, output_path: Path, log=print) -> bool:
     """
     Runs the ffmpeg command to convert a single media file to WAV.
 
     Args:
         input_path: The Path object for the source media file.
         output_path: The Path object for the destination .wav file.
+        log: Receives the progress messages (lets the pool buffer them per file).
 
     Returns:
         True if conversion was successful, False otherwise.
     """
-    print(f"Converting '{input_path.name}'...")
+    log(f"Converting '{input_path.name}'...")
     # This ffmpeg command extracts audio, resamples, and converts to WAV.
     # It works for both audio-only and video files (like .mp4).
     cmd = [
         "ffmpeg",
         "-i",
         str(input_path),
-        "-vn",  # No video: explicitly disable video recording
-        "-ar",
-        "16000",  # Audio sample rate: 16kHz
-        "-ac",
-        "1",  # Audio channels: 1 (mono)
-        "-c:a",
-        "pcm_s16le",  # Codec: PCM signed 16-bit little-endian
+        *WAV_ARGS,
+        "-threads",
+        "1",  # One core per file; the pool runs files in parallel instead
         str(output_path),
         "-loglevel",
         "error",  # Only show errors
@@ -54,15 +87,99 @@ def run_ffmpeg_conversion(input_path: Path, output_path: Path) -> bool:
     ]
     try:
         subprocess.run(cmd, check=True, capture_output=True, text=True)
-        print(f"✅ Created: {output_path.name}")
+        log(f"✅ Created: {output_path.name}")
         return True
     except subprocess.CalledProcessError as e:
-        print(f"❌ Error converting {input_path.name}:")
-        print(f"   FFmpeg stderr: {e.stderr.strip()}")
+        log(f"❌ Error converting {input_path.name}:")
+        log(f"   FFmpeg stderr: {e.stderr.strip()}")
         return False
     except FileNotFoundError:
-        print("❌ Error: ffmpeg command not found during conversion.")
+        log("❌ Error: ffmpeg command not found during conversion.")
+        return False
+
+
+def run_wav_normalization(input_path: Path, output_path: Path, log=print) -> bool:
+    """
+    Converts a WAV to 16kHz mono in-process, without starting ffmpeg.
+    WAVs in a sample format the normalizer cannot read go through ffmpeg.
+    """
+    # Imported here so converting compressed files does not need NumPy
+    from wav_normalizer import UnsupportedWav, normalize_wav
+
+    log(f"Normalizing '{input_path.name}'...")
+    try:
+        normalize_wav(input_path, output_path)
+    except UnsupportedWav as e:
+        log(f"   {e} Falling back to ffmpeg.")
+        return run_ffmpeg_conversion(input_path, output_path, log=log)
+    except OSError as e:
+        log(f"❌ Error normalizing {input_path.name}: {e}")
         return False
+    log(f"✅ Created: {output_path.name}")
+    return True
+
+
+def run_conversion(input_path: Path, output_path: Path, log=print) -> bool:
+    """Converts one file, picking the in-process path for WAVs and ffmpeg for the rest."""
+    if input_path.suffix.lower() == WAV_EXTENSION:
+        return run_wav_normalization(input_path, output_path, log=log)
+    return run_ffmpeg_conversion(input_path, output_path, log=log)
+
+
+def conversion_params(input_path: Path):
+    """
+    The settings a source is converted with, as recorded in the manifest:
+    ffmpeg's for compressed files, the normalizer's for WAVs (with ffmpeg's
+    too, for WAVs it falls back on).
+    """
+    if input_path.suffix.lower() == WAV_EXTENSION:
+        from wav_normalizer import NORMALIZER_SETTINGS
+
+        return {"normalizer": NORMALIZER_SETTINGS, "ffmpeg": WAV_ARGS}
+    return WAV_ARGS
+
+
+def file_hash(path: Path) -> str:
+    """BLAKE2b of the file's content."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(manifest_path: Path) -> dict:
+    try:
+        return json.loads(manifest_path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_manifest(manifest_path: Path, manifest: dict):
+    """Writes the manifest atomically so an interrupted run never leaves it half-written."""
+    temp_path = manifest_path.with_name(f"{manifest_path.name}.tmp")
+    temp_path.write_text(
+        json.dumps(manifest, indent=2, ensure_ascii=False, sort_keys=True), encoding="utf-8"
+    )
+    temp_path.replace(manifest_path)
+
+
+def is_up_to_date(entry: dict, source_path: Path, output_path: Path) -> bool:
+    """
+    True when the source was converted with the current settings and has not
+    changed since. Checked with one stat per file; the content hash is only
+    read when size or mtime changed (e.g. a file touched by a sync tool).
+    """
+    if not entry or entry.get("params") != conversion_params(source_path) or not output_path.exists():
+        return False
+    stat = source_path.stat()
+    if entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+        return True
+    if entry["size"] != stat.st_size or entry["hash"] != file_hash(source_path):
+        return False
+    # Same content with a new mtime: remember it so the next run is a stat again
+    entry["mtime_ns"] = stat.st_mtime_ns
+    return True
 
 
 def convert_single_file(file_path: Path):
@@ -77,19 +194,37 @@ def convert_single_file(file_path: Path):
         return
 
     output_wav_path = file_path.with_suffix(".wav")
+    if output_wav_path == file_path:
+        # Never overwrite a WAV input with its own conversion
+        output_wav_path = file_path.with_name(f"{file_path.stem}-16k.wav")
     print(f"\n--- Converting Single File ---")
     print(f"Input:  {file_path}")
     print(f"Output: {output_wav_path}")
     print("-" * 30)
-    run_ffmpeg_conversion(file_path, output_wav_path)
+    run_conversion(file_path, output_wav_path)
     print("-" * 30)
 
 
-def convert_directory(dir_path: Path):
+def convert_directory(dir_path: Path, workers: int = None, force: bool = False):
     """
     Handles batch conversion of all supported media files in a directory.
     Outputs are saved to a 'converted_to_wav' subdirectory.
+
+    Files are converted by a bounded pool of ffmpeg processes (WAV inputs are
+    resampled in-process by wav_normalizer.py instead). Each file's
+    messages are printed together, in the original file order, and failed
+    files are listed in the summary instead of stopping the batch.
+
+    A manifest beside the output folder records each converted source (size,
+    mtime, content hash, conversion settings). Unchanged sources are skipped
+    unless force is set, and WAVs with no matching source are reported.
+
+    Outputs are named by stem, so a WAV beside a media file of the same stem
+    is skipped, and of several sources mapping to one output only the first
+    is converted.
     """
+    if workers is None:
+        workers = default_workers()
     output_subdir_name = "converted_to_wav"
     output_dir = dir_path / output_subdir_name
 
@@ -102,12 +237,28 @@ def convert_directory(dir_path: Path):
     print(f"\n--- Batch Converting Directory ---")
     print(f"Source:      {dir_path}")
     print(f"Destination: {output_dir}")
+    print(f"Workers:     {workers}")
     print("-" * 30)
 
     files_to_process = [
         p
         for p in dir_path.rglob("*")
-        if p.is_file() and p.name.lower().endswith(SUPPORTED_EXTENSIONS)
+        if p.is_file()
+        and p.name.lower().endswith(SUPPORTED_EXTENSIONS)
+        # WAVs are inputs too now: never pick up our own outputs, nor those
+        # of a run on a subdirectory
+        and output_subdir_name not in p.relative_to(dir_path).parts
+    ]
+
+    # A WAV beside a media file of the same stem is usually that file's
+    # single-file-mode conversion; converting both would target one output
+    media_stems = {
+        (p.parent, p.stem) for p in files_to_process if p.suffix.lower() != WAV_EXTENSION
+    }
+    files_to_process = [
+        p
+        for p in files_to_process
+        if p.suffix.lower() != WAV_EXTENSION or (p.parent, p.stem) not in media_stems
     ]
 
     if not files_to_process:
@@ -116,18 +267,128 @@ def convert_directory(dir_path: Path):
         )
         return
 
-    success_count = 0
-    for i, media_file_path in enumerate(files_to_process, 1):
-        print(f"Processing file {i} of {len(files_to_process)}: {media_file_path.name}")
+    manifest_path = dir_path / MANIFEST_FILENAME
+    manifest = load_manifest(manifest_path)
+    entries = manifest.setdefault("files", {})
+
+    def output_path_for(media_file_path):
         # Ensure the output filename is correct, even if it's in a subdirectory
-        output_wav_path = output_dir / media_file_path.with_suffix(".wav").name
-        if run_ffmpeg_conversion(media_file_path, output_wav_path):
-            success_count += 1
+        return output_dir / media_file_path.with_suffix(".wav").name
+
+    # Outputs are named by stem only: two sources mapping to one WAV would be
+    # written at the same time by the pool. Keep the first, report the rest.
+    sources_by_output = {}
+    duplicate_files = []
+    for p in sorted(files_to_process):
+        if sources_by_output.setdefault(output_path_for(p), p) != p:
+            duplicate_files.append(p)
+    if duplicate_files:
+        print(f"ℹ️ {len(duplicate_files)} file(s) skipped, their WAV name is already taken:")
+        for p in duplicate_files:
+            print(
+                f"   {p.relative_to(dir_path)} (same output as "
+                f"{sources_by_output[output_path_for(p)].relative_to(dir_path)})"
+            )
+    files_to_process = [p for p in files_to_process if p not in duplicate_files]
+
+    pending = [
+        p
+        for p in files_to_process
+        if force
+        or not is_up_to_date(
+            entries.get(str(p.relative_to(dir_path))), p, output_path_for(p)
+        )
+    ]
+    up_to_date_count = len(files_to_process) - len(pending)
+    if up_to_date_count:
+        print(f"Up to date (skipped): {up_to_date_count} file(s)")
+
+    # Probe everything up front: unreadable files fail before any work starts,
+    # and the longest files are started first so the batch ends evenly
+    failed_files = []
+    probe_index = ProbeIndex()
+    probes = probe_index.probe_many(pending)
+    probe_index.close()
+    durations = {}
+    for media_file_path in pending:
+        probe = probes[media_file_path.resolve()]
+        if probe["error"]:
+            print(f"❌ Unreadable, skipped: {media_file_path.name} ({probe['error']})")
+            failed_files.append(media_file_path)
+        else:
+            durations[media_file_path] = probe["duration"]
+    pending = sorted(durations, key=durations.get, reverse=True)
+    total = len(pending)
+    total_audio_seconds = sum(durations.values())
+    if total:
+        print(f"To convert: {total} file(s), {format_eta(total_audio_seconds)} of audio")
+
+    def convert(job):
+        i, media_file_path = job
+        lines = [f"Processing file {i} of {total}: {media_file_path.name}"]
+        try:
+            # Stat before converting so a source modified meanwhile is redone next run
+            stat = media_file_path.stat()
+            output_wav_path = output_path_for(media_file_path)
+            if not run_conversion(media_file_path, output_wav_path, log=lines.append):
+                return media_file_path, None, lines
+            entry = {
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "hash": file_hash(media_file_path),
+                "params": conversion_params(media_file_path),
+                "output": output_wav_path.name,
+            }
+        except Exception as e:
+            # A vanished or unreadable file must not end the batch
+            lines.append(f"❌ Error processing {media_file_path.name}: {e}")
+            return media_file_path, None, lines
+        return media_file_path, entry, lines
+
+    success_count = 0
+    done_audio_seconds = 0.0
+    start_time = time.monotonic()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # map() yields in submission order, so output stays readable
+            for media_file_path, entry, lines in executor.map(
+                convert, enumerate(pending, 1)
+            ):
+                print("\n".join(lines))
+                done_audio_seconds += durations[media_file_path]
+                if done_audio_seconds < total_audio_seconds:
+                    # Audio converted per wall second so far predicts the rest
+                    rate = done_audio_seconds / (time.monotonic() - start_time)
+                    print(f"   ETA: {format_eta((total_audio_seconds - done_audio_seconds) / rate)}")
+                if entry is not None:
+                    entries[str(media_file_path.relative_to(dir_path))] = entry
+                    success_count += 1
+                else:
+                    failed_files.append(media_file_path)
+    finally:
+        # Forget sources that no longer exist; their WAVs show up as orphans below
+        current_sources = {str(p.relative_to(dir_path)) for p in files_to_process}
+        for source in set(entries) - current_sources:
+            del entries[source]
+        save_manifest(manifest_path, manifest)
 
     print("-" * 30)
     print(
-        f"Batch conversion complete. {success_count}/{len(files_to_process)} files converted successfully."
+        f"Batch conversion complete. {success_count}/{total} files converted successfully, "
+        f"{up_to_date_count} already up to date."
     )
+    if failed_files:
+        print(f"❌ {len(failed_files)} file(s) failed:")
+        for media_file_path in failed_files:
+            print(f"   {media_file_path.relative_to(dir_path)}")
+    expected_outputs = {output_path_for(p).name for p in files_to_process}
+    orphaned_outputs = sorted(
+        p.name for p in output_dir.glob("*.wav") if p.name not in expected_outputs
+    )
+    if orphaned_outputs:
+        print(f"ℹ️ {len(orphaned_outputs)} WAV file(s) in {output_subdir_name} have no source anymore:")
+        for name in orphaned_outputs:
+            print(f"   {name}")
 
 
 if __name__ == "__main__":
@@ -135,13 +396,24 @@ if __name__ == "__main__":
         exit(1)
 
     parser = argparse.ArgumentParser(
-        description="Convert .mp3, .m4a, or .mp4 files to .wav format (16kHz, mono).",
+        description="Convert .mp3, .m4a, .mp4, .opus or .wav files to .wav format (16kHz, mono).",
         formatter_class=argparse.RawTextHelpFormatter,
     )
     parser.add_argument(
         "input_path",
         help=f"Path to a single media file {SUPPORTED_EXTENSIONS} or a directory of files to convert.",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help=f"Directory mode: ffmpeg processes run at once (default: one per core, at most {MAX_DEFAULT_WORKERS}).",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Directory mode: convert every file again, even when the manifest says it is up to date.",
+    )
     args = parser.parse_args()
 
     input_path = Path(args.input_path).resolve()
@@ -153,7 +425,7 @@ if __name__ == "__main__":
     if input_path.is_file():
         convert_single_file(input_path)
     elif input_path.is_dir():
-        convert_directory(input_path)
+        convert_directory(input_path, workers=args.workers, force=args.force)
     else:
         print(
             f"❌ Error: The specified path is not a valid file or directory: {input_path}"
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# flake8: noqa
+
+"""
+Cached media probe results shared by the conversion and transcription scripts.
+
+Each file is probed once (ffprobe, or the WAV header for .wav files) and the
+duration, codec, sample rate and channel count are stored in a small SQLite
+index keyed on path, size and mtime. A file is probed again only when it
+changes. Batches are probed concurrently, so durations are known up front
+for ETA estimates, longest-first ordering and skipping unreadable files
+before any work starts.
+
+Usage:
+    python3 probe_index.py /path/to/media        # probe a folder and print a summary
+"""
+
+import argparse
+import json
+import sqlite3
+import subprocess
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+DEFAULT_INDEX_PATH = Path.home() / ".cache" / "nasikh-nexus" / "probe-index.sqlite3"
+DEFAULT_PROBE_WORKERS = 8
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS probes (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    duration REAL,
+    codec TEXT,
+    sample_rate INTEGER,
+    channels INTEGER,
+    error TEXT,
+    probed_at REAL NOT NULL
+)
+"""
+FIELDS = ("duration", "codec", "sample_rate", "channels", "error")
+
+
+def failed_probe(error: str) -> dict:
+    return {"duration": None, "codec": None, "sample_rate": None, "channels": None, "error": error}
+
+
+def probe_wav(path: Path) -> dict:
+    """Reads a WAV header directly, which is much faster than starting ffprobe."""
+    with wave.open(str(path), "rb") as wav_file:
+        frames = wav_file.getnframes()
+        return {
+            "duration": frames / float(wav_file.getframerate()),
+            "codec": f"pcm_s{wav_file.getsampwidth() * 8}le",
+            "sample_rate": wav_file.getframerate(),
+            "channels": wav_file.getnchannels(),
+            "error": None if frames else "no audio frames",
+        }
+
+
+def probe_ffprobe(path: Path) -> dict:
+    """Probes the first audio stream of a media file with ffprobe."""
+    cmd = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-select_streams",
+        "a:0",
+        "-show_entries",
+        "format=duration:stream=codec_name,sample_rate,channels",
+        "-of",
+        "json",
+        str(path),
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        return failed_probe(
+            result.stderr.strip() or f"ffprobe exited with code {result.returncode}"
+        )
+    info = json.loads(result.stdout or "{}")
+    streams = info.get("streams") or [{}]
+    stream = streams[0]
+    duration = info.get("format", {}).get("duration")
+    probe = {
+        "duration": float(duration) if duration not in (None, "N/A") else None,
+        "codec": stream.get("codec_name"),
+        "sample_rate": int(stream["sample_rate"]) if stream.get("sample_rate") else None,
+        "channels": stream.get("channels"),
+        "error": None,
+    }
+    if not info.get("streams"):
+        probe["error"] = "no audio stream"
+    elif not probe["duration"]:
+        probe["error"] = "unknown duration"
+    return probe
+
+
+def probe_file(path: Path) -> dict:
+    if path.suffix.lower() == ".wav":
+        try:
+            return probe_wav(path)
+        except (wave.Error, EOFError):
+            # Not plain PCM (e.g. float or extensible WAV): let ffprobe decide
+            pass
+        except OSError as e:
+            return failed_probe(str(e))
+    try:
+        return probe_ffprobe(path)
+    except FileNotFoundError:
+        return failed_probe("ffprobe not found")
+
+
+class ProbeIndex:
+    """A SQLite-backed cache of media probe results."""
+
+    def __init__(self, index_path=DEFAULT_INDEX_PATH):
+        self.index_path = Path(index_path)
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.index_path, check_same_thread=False)
+        self._db.execute(SCHEMA)
+        self._db.commit()
+
+    def _cached(self, path: Path, stat):
+        row = self._db.execute(
+            "SELECT duration, codec, sample_rate, channels, error FROM probes "
+            "WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (str(path), stat.st_size, stat.st_mtime_ns),
+        ).fetchone()
+        return dict(zip(FIELDS, row)) if row else None
+
+    def _store(self, path: Path, stat, probe: dict):
+        self._db.execute(
+            "INSERT OR REPLACE INTO probes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                str(path),
+                stat.st_size,
+                stat.st_mtime_ns,
+                *(probe[field] for field in FIELDS),
+                time.time(),
+            ),
+        )
+
+    def probe_many(self, paths, workers=DEFAULT_PROBE_WORKERS) -> dict:
+        """
+        Returns {path: probe} for every path, probing new or changed files
+        concurrently. A probe has duration, codec, sample_rate, channels and
+        error (None for readable files).
+        """
+        paths = [Path(path).resolve() for path in paths]
+        results = {}
+        to_probe = []
+        with self._lock:
+            for path in paths:
+                try:
+                    stat = path.stat()
+                except OSError as e:
+                    results[path] = failed_probe(str(e))
+                    continue
+                cached = self._cached(path, stat)
+                if cached is not None:
+                    results[path] = cached
+                else:
+                    to_probe.append((path, stat))
+
+        if to_probe:
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+                probes = list(executor.map(lambda job: probe_file(job[0]), to_probe))
+            with self._lock:
+                for (path, stat), probe in zip(to_probe, probes):
+                    self._store(path, stat, probe)
+                    results[path] = probe
+                self._db.commit()
+        return results
+
+    def probe(self, path) -> dict:
+        return self.probe_many([path])[Path(path).resolve()]
+
+    def duration(self, path) -> float:
+        """Duration in seconds, or 0.0 for files that cannot be read."""
+        return self.probe(path)["duration"] or 0.0
+
+    def close(self):
+        self._db.close()
+
+
+def format_eta(seconds: float) -> str:
+    """Formats seconds as H:MM:SS."""
+    seconds = int(round(max(seconds, 0)))
+    return f"{seconds // 3600}:{(seconds % 3600) // 60:02d}:{seconds % 60:02d}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Probe media files and cache their durations.")
+    parser.add_argument("path", help="Folder (searched recursively) or single media file.")
+    parser.add_argument("--index", default=str(DEFAULT_INDEX_PATH))
+    parser.add_argument("--workers", type=int, default=DEFAULT_PROBE_WORKERS)
+    args = parser.parse_args()
+
+    root = Path(args.path).resolve()
+    extensions = (".wav", ".mp3", ".m4a", ".mp4", ".opus", ".mov")
+    files = (
+        [p for p in root.rglob("*") if p.is_file() and p.suffix.lower() in extensions]
+        if root.is_dir()
+        else [root]
+    )
+    index = ProbeIndex(args.index)
+    start_time = time.monotonic()
+    probes = index.probe_many(files, workers=args.workers)
+    index.close()
+
+    unreadable = {path: probe for path, probe in probes.items() if probe["error"]}
+    total = sum(probe["duration"] or 0.0 for probe in probes.values())
+    print(f"Probed {len(probes)} file(s) in {time.monotonic() - start_time:.2f}s")
+    print(f"Total duration: {format_eta(total)}")
+    for path, probe in unreadable.items():
+        print(f"Unreadable: {path} ({probe['error']})")
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# flake8: noqa
+
+"""
+In-process WAV normalizer: any 16-bit PCM WAV to 16 kHz mono pcm_s16le.
+
+The input is memory-mapped and processed in fixed-size blocks, so memory use
+stays bounded whatever the file length. Each block is downmixed to mono and
+resampled with a polyphase FIR filter (Kaiser-windowed sinc, the same design
+as scipy.signal.resample_poly). For every output phase, the filter is
+applied to strided windows of the input as one matrix-vector product, so
+the heavy lifting happens in NumPy instead of a Python loop.
+
+WAVs in other sample formats raise UnsupportedWav. Callers fall back to
+ffmpeg for those, and for compressed formats.
+
+Usage:
+    python3 wav_normalizer.py input.wav output.wav
+"""
+
+import argparse
+import struct
+import wave
+from math import gcd
+from pathlib import Path
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+TARGET_RATE = 16000
+# Output samples per block (rounded up to a whole number of filter phases)
+BLOCK_SAMPLES = 1 << 18
+# Filter length in zero crossings per side, and Kaiser window shape
+FILTER_HALF_ZEROS = 10
+KAISER_BETA = 5.0
+# Settings that shape the output, recorded in convert-to-wav.py's manifest
+NORMALIZER_SETTINGS = {
+    "rate": TARGET_RATE,
+    "filter_half_zeros": FILTER_HALF_ZEROS,
+    "kaiser_beta": KAISER_BETA,
+}
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class UnsupportedWav(ValueError):
+    """Raised for WAVs this module cannot read (anything but 16-bit integer PCM)."""
+
+
+def read_wav_layout(wav_path: Path):
+    """
+    Walks the RIFF chunks of a WAV file.
+
+    Returns:
+        (channels, sample_rate, data_offset, frame_count)
+    """
+    with open(wav_path, "rb") as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            raise UnsupportedWav(f"{wav_path} is not a RIFF/WAVE file.")
+        fmt = None
+        while True:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                raise UnsupportedWav(f"{wav_path} has no data chunk.")
+            chunk_id, chunk_size = struct.unpack("<4sI", chunk_header)
+            if chunk_id == b"fmt ":
+                fmt = f.read(chunk_size)
+                if chunk_size % 2:
+                    f.seek(1, 1)
+            elif chunk_id == b"data":
+                data_offset = f.tell()
+                break
+            else:
+                # Chunks are word-aligned
+                f.seek(chunk_size + chunk_size % 2, 1)
+
+    if fmt is None:
+        raise UnsupportedWav(f"{wav_path} has no fmt chunk.")
+    format_tag, channels, sample_rate, _, _, bits = struct.unpack("<HHIIHH", fmt[:16])
+    if format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+        format_tag = struct.unpack("<H", fmt[24:26])[0]
+    if format_tag != WAVE_FORMAT_PCM or bits != 16:
+        raise UnsupportedWav(f"{wav_path} is not 16-bit PCM (format {format_tag}, {bits} bits).")
+
+    # Streamed WAVs may leave the data size unset (0 or 0xFFFFFFFF): use the file size
+    available = Path(wav_path).stat().st_size - data_offset
+    if chunk_size in (0, 0xFFFFFFFF) or chunk_size > available:
+        chunk_size = available
+    return channels, sample_rate, data_offset, chunk_size // (2 * channels)
+
+
+def design_filter(up: int, down: int):
+    """
+    Returns the polyphase filter bank (shape [up, taps]) and its centre
+    offset. Row p holds h[p], h[p + up], h[p + 2 * up], ...
+    """
+    max_rate = max(up, down)
+    half_len = FILTER_HALF_ZEROS * max_rate
+    n = np.arange(-half_len, half_len + 1)
+    cutoff = 0.5 / max_rate
+    h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(len(n), KAISER_BETA)
+    # Unity gain at DC after inserting up - 1 zeros between input samples
+    h *= up / h.sum()
+    taps = -(-len(h) // up)
+    h = np.pad(h, (0, taps * up - len(h)))
+    return h.reshape(taps, up).T.astype(np.float32), half_len
+
+
+def normalize_wav(input_wav_path, output_wav_path, target_rate=TARGET_RATE, block_samples=BLOCK_SAMPLES):
+    """
+    Writes a 16 kHz (target_rate) mono 16-bit copy of a 16-bit PCM WAV.
+
+    Returns:
+        The output duration in seconds.
+
+    Raises:
+        UnsupportedWav: If the input is not 16-bit integer PCM.
+    """
+    input_wav_path = Path(input_wav_path)
+    channels, rate, data_offset, frames = read_wav_layout(input_wav_path)
+    divisor = gcd(rate, target_rate)
+    up, down = target_rate // divisor, rate // divisor
+
+    samples = (
+        np.memmap(input_wav_path, dtype="<i2", mode="r", offset=data_offset, shape=(frames, channels))
+        if frames
+        else np.zeros((0, channels), dtype="<i2")
+    )
+    output_frames = -(-frames * up // down)
+
+    if up == down:
+        bank, centre = None, 0
+    else:
+        bank, centre = design_filter(up, down)
+        # Each row reversed: windows hold x[base - taps + 1 .. base]
+        reversed_bank = np.ascontiguousarray(bank[:, ::-1])
+        taps = bank.shape[1]
+    block_samples = max(up, block_samples // up * up)
+
+    def mono(start, stop):
+        """Downmixed float32 samples [start, stop), zero-padded outside the file."""
+        block = np.zeros(stop - start, dtype=np.float32)
+        lo, hi = max(start, 0), min(stop, frames)
+        if hi > lo:
+            chunk = np.asarray(samples[lo:hi], dtype=np.float32)
+            block[lo - start : hi - start] = chunk.mean(axis=1) if channels > 1 else chunk[:, 0]
+        return block
+
+    with wave.open(str(output_wav_path), "wb") as output:
+        output.setnchannels(1)
+        output.setsampwidth(2)
+        output.setframerate(target_rate)
+        for n0 in range(0, output_frames, block_samples):
+            n1 = min(n0 + block_samples, output_frames)
+            if bank is None:
+                result = mono(n0, n1)
+            else:
+                # Output n reads input x[base - k] for base = (n * down + centre) // up
+                first_base = (n0 * down + centre) // up
+                last_base = ((n1 - 1) * down + centre) // up
+                lo = first_base - taps + 1
+                windows = sliding_window_view(mono(lo, last_base + 1), taps)
+                result = np.empty(n1 - n0, dtype=np.float32)
+                for residue in range(min(up, n1 - n0)):
+                    # Outputs n, n + up, n + 2 * up ... share one phase, and their
+                    # base index advances by `down` each time
+                    n = n0 + residue
+                    phase = (n * down + centre) % up
+                    base = (n * down + centre) // up
+                    count = -(-(n1 - n) // up)
+                    start = base - taps + 1 - lo
+                    result[residue::up] = windows[start : start + count * down : down] @ reversed_bank[phase]
+            output.writeframes(
+                np.clip(np.rint(result), -32768, 32767).astype("<i2").tobytes()
+            )
+    return output_frames / target_rate
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a 16-bit PCM WAV to 16 kHz mono without ffmpeg.")
+    parser.add_argument("input_wav")
+    parser.add_argument("output_wav")
+    args = parser.parse_args()
+    seconds = normalize_wav(args.input_wav, args.output_wav)
+    print(f"Wrote {seconds:.1f}s of 16 kHz mono audio to: {args.output_wav}")
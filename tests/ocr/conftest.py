@@ -0,0 +1,64 @@
+import os
+import sys
+from pathlib import Path
+
+import pypdf
+import pytest
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject, NumberObject
+
+# The OCR scripts import their sibling modules directly
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src" / "ocr"))
+
+from mock_mistral import MockMistral  # noqa: E402
+
+
+def make_pdf(path, page_texts, padding_bytes=0):
+    """
+    Writes a PDF with one line of text per page. padding_bytes adds an image
+    to the first page's resources that its content never draws, so the file
+    is large but text extraction does not read it.
+    """
+    writer = pypdf.PdfWriter()
+    font = writer._add_object(
+        DictionaryObject(
+            {
+                NameObject("/Type"): NameObject("/Font"),
+                NameObject("/Subtype"): NameObject("/Type1"),
+                NameObject("/BaseFont"): NameObject("/Helvetica"),
+            }
+        )
+    )
+    for index, text in enumerate(page_texts):
+        page = writer.add_blank_page(200, 300)
+        resources = DictionaryObject({NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})})
+        if padding_bytes and index == 0:
+            image = DecodedStreamObject()
+            image.set_data(os.urandom(padding_bytes))
+            image.update(
+                {
+                    NameObject("/Type"): NameObject("/XObject"),
+                    NameObject("/Subtype"): NameObject("/Image"),
+                    NameObject("/Width"): NumberObject(1000),
+                    NameObject("/Height"): NumberObject(padding_bytes // 1000),
+                    NameObject("/ColorSpace"): NameObject("/DeviceGray"),
+                    NameObject("/BitsPerComponent"): NumberObject(8),
+                }
+            )
+            resources[NameObject("/XObject")] = DictionaryObject(
+                {NameObject("/Im0"): writer._add_object(image)}
+            )
+        page[NameObject("/Resources")] = resources
+        content = DecodedStreamObject()
+        content.set_data(f"BT /F1 12 Tf 10 10 Td ({text}) Tj ET".encode("latin-1"))
+        page[NameObject("/Contents")] = writer._add_object(content)
+    with open(path, "wb") as f:
+        writer.write(f)
+    return Path(path)
+
+
+@pytest.fixture
+def mock_mistral():
+    server = MockMistral()
+    server.start()
+    yield server
+    server.stop()
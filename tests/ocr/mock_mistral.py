@@ -0,0 +1,192 @@
+"""
+Local stand-in for the Mistral files and OCR endpoints used by mistral_shards.py.
+
+    POST   /v1/files             multipart upload, spooled to disk in chunks
+    GET    /v1/files/{id}/url    signed URL for an uploaded file
+    DELETE /v1/files/{id}
+    POST   /v1/ocr               one page of markdown per PDF page (its text)
+
+Tests script failures through the attributes: queued status codes for the
+next uploads or OCR requests, page texts whose OCR always fails, and a delay
+per OCR request.
+"""
+
+import json
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pypdf
+
+CHUNK_BYTES = 64 * 1024
+# Queued into upload_failures: read the whole body, then hang up without answering
+DROP_CONNECTION = "drop"
+
+
+class MockMistral:
+    def __init__(self):
+        self.files_dir = Path(tempfile.mkdtemp(prefix="mock-mistral-"))
+        self.files = {}  # file id -> path of the uploaded PDF
+        self.upload_attempts = 0
+        self.deleted = []
+        self.ocr_documents = []  # document_url of every OCR request
+        self.upload_failures = []  # status codes (or DROP_CONNECTION) for the next uploads
+        self.ocr_failures = []  # status codes for the next OCR requests
+        self.failing_texts = set()  # OCR of a document holding one of these page texts fails
+        self.ocr_delay = lambda page_texts: 0.0
+        self.lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self):
+        mock = self
+
+        class Handler(MockHandler):
+            pass
+
+        Handler.mock = mock
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        shutil.rmtree(self.files_dir, ignore_errors=True)
+
+    def page_texts(self, file_id):
+        with open(self.files[file_id], "rb") as pdf_file:
+            return [(page.extract_text() or "").strip() for page in pypdf.PdfReader(pdf_file).pages]
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    mock = None
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body, headers=()):
+        encoded = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def fail(self, status):
+        headers = [("Retry-After", "0")] if status == 429 else []
+        self.reply(status, {"message": f"mock failure {status}"}, headers)
+
+    def body_chunks(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            while size := int(self.rfile.readline().split(b";")[0], 16):
+                yield self.rfile.read(size)
+                self.rfile.readline()
+            self.rfile.readline()
+            return
+        remaining = int(self.headers.get("Content-Length", 0))
+        while remaining:
+            chunk = self.rfile.read(min(remaining, CHUNK_BYTES))
+            remaining -= len(chunk)
+            yield chunk
+
+    def do_POST(self):
+        if self.path == "/v1/files":
+            return self.upload()
+        if self.path == "/v1/ocr":
+            return self.ocr()
+        self.reply(404, {"message": "not found"})
+
+    def do_GET(self):
+        parts = self.path.split("?")[0].strip("/").split("/")
+        if parts[:2] == ["v1", "files"] and parts[-1] == "url" and parts[2] in self.mock.files:
+            return self.reply(200, {"url": f"{self.mock.url}/signed/{parts[2]}"})
+        self.reply(404, {"message": "not found"})
+
+    def do_DELETE(self):
+        file_id = self.path.strip("/").split("/")[2]
+        with self.mock.lock:
+            self.mock.files.pop(file_id, None)
+            self.mock.deleted.append(file_id)
+        self.reply(200, {"id": file_id, "object": "file", "deleted": True})
+
+    def upload(self):
+        mock = self.mock
+        boundary = self.headers["Content-Type"].split("boundary=")[1].encode("ascii")
+        # The file is the last multipart field: spool the body, then copy out the PDF bytes
+        with tempfile.TemporaryFile(dir=mock.files_dir) as spool:
+            for chunk in self.body_chunks():
+                spool.write(chunk)
+            body_size = spool.tell()
+            spool.seek(0)
+            pdf_start = spool.read(CHUNK_BYTES).find(b"%PDF")
+            pdf_end = body_size - len(b"\r\n--" + boundary + b"--\r\n")
+            with mock.lock:
+                mock.upload_attempts += 1
+                file_id = f"file-{mock.upload_attempts}"
+                failure = mock.upload_failures.pop(0) if mock.upload_failures else None
+            if failure not in (None, DROP_CONNECTION):
+                return self.fail(failure)
+            file_path = mock.files_dir / f"{file_id}.pdf"
+            spool.seek(pdf_start)
+            with open(file_path, "wb") as f:
+                remaining = pdf_end - pdf_start
+                while remaining:
+                    chunk = spool.read(min(remaining, CHUNK_BYTES))
+                    f.write(chunk)
+                    remaining -= len(chunk)
+        with mock.lock:
+            mock.files[file_id] = file_path
+        if failure == DROP_CONNECTION:
+            # Stored, but the client never hears about it
+            self.close_connection = True
+            return
+        self.reply(
+            200,
+            {
+                "id": file_id,
+                "object": "file",
+                "bytes": file_path.stat().st_size,
+                "created_at": int(time.time()),
+                "filename": "upload.pdf",
+                "purpose": "ocr",
+                "sample_type": "ocr_input",
+                "source": "upload",
+            },
+        )
+
+    def ocr(self):
+        mock = self.mock
+        request = json.loads(b"".join(self.body_chunks()))
+        document_url = request["document"]["document_url"]
+        with mock.lock:
+            mock.ocr_documents.append(document_url)
+            failure = mock.ocr_failures.pop(0) if mock.ocr_failures else None
+        if failure is not None:
+            return self.fail(failure)
+        file_id = document_url.rsplit("/", 1)[-1]
+        if file_id not in mock.files:
+            return self.reply(400, {"message": "unknown document"})
+        page_texts = mock.page_texts(file_id)
+        if mock.failing_texts & set(page_texts):
+            return self.fail(500)
+        time.sleep(mock.ocr_delay(page_texts))
+        self.reply(
+            200,
+            {
+                "pages": [
+                    {"index": index, "markdown": text, "images": [], "dimensions": None}
+                    for index, text in enumerate(page_texts)
+                ],
+                "model": request["model"],
+                "usage_info": {"pages_processed": len(page_texts)},
+            },
+        )
@@ -0,0 +1,167 @@
+import importlib.util
+import tracemalloc
+from pathlib import Path
+
+import pypdf
+import pytest
+
+from conftest import make_pdf
+from mistral_shards import ocr_shards, page_shards
+from mock_mistral import DROP_CONNECTION
+
+SRC_OCR = Path(__file__).resolve().parents[2] / "src" / "ocr"
+
+
+def load_script(name):
+    spec = importlib.util.spec_from_file_location(name.replace("-", "_"), SRC_OCR / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def shard_writer(pdf_path, out_dir):
+    """A shard_pdf callback writing each shard's pages to its own PDF."""
+
+    def shard_pdf(shard):
+        reader = pypdf.PdfReader(pdf_path)
+        writer = pypdf.PdfWriter()
+        for page_number in shard:
+            writer.add_page(reader.pages[page_number - 1])
+        shard_path = Path(out_dir) / f"pages-{shard[0]:04d}-{shard[-1]:04d}.pdf"
+        with open(shard_path, "wb") as f:
+            writer.write(f)
+        return shard_path
+
+    return shard_pdf
+
+
+@pytest.fixture
+def book(tmp_path):
+    return make_pdf(tmp_path / "book.pdf", [f"p{n}" for n in range(1, 11)])
+
+
+def run_shards(mock, book, tmp_path, shards, **options):
+    options = {"concurrency": 4, "requests_per_second": 0, "retries": 3, **options}
+    return ocr_shards(shards, shard_writer(book, tmp_path), "test-key", server_url=mock.url, **options)
+
+
+def test_page_shards():
+    assert page_shards([1, 2, 3, 4, 5], 2) == [[1, 2], [3, 4], [5]]
+    assert page_shards([3, 7, 9], 0) == [[3, 7, 9]]
+    assert page_shards([], 0) == []
+
+
+def test_pages_keyed_by_page_number_whichever_shard_finishes_first(mock_mistral, book, tmp_path):
+    # The first shard answers last
+    mock_mistral.ocr_delay = lambda page_texts: 0.5 if "p1" in page_texts else 0.0
+    shards = page_shards([1, 2, 3, 5, 8, 9, 10], 3)
+
+    ocr_pages, failed = run_shards(mock_mistral, book, tmp_path, shards)
+
+    assert failed == {}
+    assert ocr_pages == {n: f"p{n}" for n in (1, 2, 3, 5, 8, 9, 10)}
+    # Every upload was OCR'd by signed URL, then deleted
+    assert len(mock_mistral.ocr_documents) == len(shards)
+    assert all("/signed/" in url for url in mock_mistral.ocr_documents)
+    assert mock_mistral.files == {}
+    assert len(mock_mistral.deleted) == len(shards)
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_retries_transient_failures(mock_mistral, book, tmp_path, status):
+    mock_mistral.upload_failures = [status]
+    mock_mistral.ocr_failures = [status, status]
+
+    ocr_pages, failed = run_shards(mock_mistral, book, tmp_path, [[1, 2, 3]], concurrency=1)
+
+    assert failed == {}
+    assert ocr_pages == {1: "p1", 2: "p2", 3: "p3"}
+    assert mock_mistral.upload_attempts == 2
+    assert len(mock_mistral.ocr_documents) == 3
+
+
+def test_gives_up_after_retries(mock_mistral, book, tmp_path):
+    mock_mistral.ocr_failures = [429] * 3
+
+    ocr_pages, failed = run_shards(mock_mistral, book, tmp_path, [[1, 2]], retries=2)
+
+    assert ocr_pages == {}
+    assert failed["pages 1-2"].status_code == 429
+    assert len(mock_mistral.ocr_documents) == 3
+    # The upload is cleaned up even though its shard failed
+    assert mock_mistral.files == {}
+
+
+def test_failed_shard_reported_without_losing_the_others(mock_mistral, book, tmp_path):
+    mock_mistral.failing_texts = {"p5"}
+    shards = page_shards(range(1, 11), 4)
+
+    ocr_pages, failed = run_shards(mock_mistral, book, tmp_path, shards, retries=1)
+
+    assert list(failed) == ["pages 5-8"]
+    assert failed["pages 5-8"].status_code == 500
+    assert ocr_pages == {n: f"p{n}" for n in (1, 2, 3, 4, 9, 10)}
+    assert mock_mistral.files == {}
+
+
+def test_bad_request_is_not_retried(mock_mistral, book, tmp_path):
+    mock_mistral.ocr_failures = [400]
+
+    ocr_pages, failed = run_shards(mock_mistral, book, tmp_path, [[1]])
+
+    assert failed["page 1"].status_code == 400
+    assert len(mock_mistral.ocr_documents) == 1
+
+
+def test_script_reassembles_pages_in_order(mock_mistral, book, tmp_path, monkeypatch, capsys):
+    script = load_script("mistral-pdf-ocr")
+    monkeypatch.setenv("MISTRAL_API_KEY", "test-key")
+    mock_mistral.ocr_delay = lambda page_texts: 0.3 if "p1" in page_texts else 0.0
+    mock_mistral.failing_texts = {"p7"}
+    output = tmp_path / "book.txt"
+
+    script.extract_arabic_text_from_pdf(
+        str(book),
+        str(output),
+        detect_text_layer=False,
+        server_url=mock_mistral.url,
+        shard_pages=3,
+        requests_per_second=0,
+        retries=0,
+    )
+
+    pages = output.read_text(encoding="utf-8").split("\n\n---\n\n")
+    # The failed shard leaves its pages empty, in place
+    assert pages == ["p1", "p2", "p3", "p4", "p5", "p6", "", "", "", "p10"]
+    assert "❌ Pages 7-9 failed" in capsys.readouterr().out
+
+
+def test_upload_streams_from_disk(mock_mistral, tmp_path):
+    big = make_pdf(tmp_path / "big.pdf", ["p1", "p2"], padding_bytes=32 * 1024**2)
+    size = big.stat().st_size
+
+    tracemalloc.start()
+    try:
+        ocr_pages, failed = ocr_shards(
+            [[1, 2]], lambda shard: big, "test-key", server_url=mock_mistral.url, requests_per_second=0
+        )
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert failed == {}
+    assert ocr_pages == {1: "p1", 2: "p2"}
+    # Neither side ever held the whole file (the mock runs in this process too)
+    assert peak < size / 4
+
+
+def test_upload_not_retried_once_sent(mock_mistral, book, tmp_path):
+    mock_mistral.upload_failures = [DROP_CONNECTION]
+
+    ocr_pages, failed = run_shards(mock_mistral, book, tmp_path, [[1, 2]])
+
+    assert ocr_pages == {}
+    assert "pages 1-2" in failed
+    # A retry would have stored a second copy
+    assert mock_mistral.upload_attempts == 1
+    assert len(mock_mistral.files) == 1
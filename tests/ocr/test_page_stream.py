@@ -0,0 +1,76 @@
+import gc
+import weakref
+
+import pypdf
+from pypdf.generic import ArrayObject, DictionaryObject, NameObject, NumberObject
+
+from conftest import make_pdf
+from page_stream import PageStreamWriter
+
+
+def page_texts(path):
+    return [page.extract_text() for page in pypdf.PdfReader(path, strict=True).pages]
+
+
+def test_merges_pages_in_order(tmp_path):
+    page_paths = [make_pdf(tmp_path / f"page-{n}.pdf", [f"page {n}"]) for n in range(1, 6)]
+
+    with PageStreamWriter(tmp_path / "book.pdf") as writer:
+        for page_path in page_paths:
+            writer.add_page(pypdf.PdfReader(page_path).pages[0])
+
+    assert page_texts(tmp_path / "book.pdf") == [f"page {n}" for n in range(1, 6)]
+
+
+def test_objects_shared_within_a_reader_are_written_once(tmp_path):
+    source = make_pdf(tmp_path / "source.pdf", ["one", "two", "three"])
+    reader = pypdf.PdfReader(source)
+
+    with PageStreamWriter(tmp_path / "out.pdf") as writer:
+        for page in reader.pages[::-1]:
+            writer.add_page(page)
+
+    out = pypdf.PdfReader(tmp_path / "out.pdf", strict=True)
+    assert [page.extract_text() for page in out.pages] == ["three", "two", "one"]
+    fonts = {page["/Resources"]["/Font"].raw_get("/F1").idnum for page in out.pages}
+    assert len(fonts) == 1
+
+
+def test_links_to_other_pages_do_not_pull_in_the_source_book(tmp_path):
+    source = make_pdf(tmp_path / "source.pdf", ["one", "two", "three"], padding_bytes=10**6)
+    writer = pypdf.PdfWriter(clone_from=source)
+    # Page 3 links to page 1, whose resources hold the padding image
+    link = DictionaryObject(
+        {
+            NameObject("/Type"): NameObject("/Annot"),
+            NameObject("/Subtype"): NameObject("/Link"),
+            NameObject("/Rect"): ArrayObject([NumberObject(0)] * 4),
+            NameObject("/Dest"): ArrayObject([writer.pages[0].indirect_reference, NameObject("/Fit")]),
+        }
+    )
+    writer.pages[2][NameObject("/Annots")] = ArrayObject([writer._add_object(link)])
+    writer.write(tmp_path / "linked.pdf")
+
+    with PageStreamWriter(tmp_path / "out.pdf") as page_writer:
+        page_writer.add_page(pypdf.PdfReader(tmp_path / "linked.pdf").pages[2])
+
+    assert page_texts(tmp_path / "out.pdf") == ["three"]
+    assert (tmp_path / "out.pdf").stat().st_size < 10**5
+
+
+def test_finished_readers_are_not_kept(tmp_path):
+    page_paths = [make_pdf(tmp_path / f"page-{n}.pdf", [f"page {n}"]) for n in range(5)]
+    readers = []
+
+    with PageStreamWriter(tmp_path / "book.pdf") as writer:
+        for page_path in page_paths:
+            reader = pypdf.PdfReader(page_path)
+            writer.add_page(reader.pages[0])
+            readers.append(weakref.ref(reader))
+        del reader
+        # pypdf readers hold reference cycles, so only the collector frees them
+        gc.collect()
+        # Nothing but file offsets is left of the pages already written
+        assert all(reader() is None for reader in readers)
+
+    assert len(page_texts(tmp_path / "book.pdf")) == 5
@@ -0,0 +1,24 @@
+import struct
+import sys
+import wave
+from pathlib import Path
+
+import pytest
+
+# The whisper.cpp scripts import their sibling modules directly
+sys.path.insert(0, str(Path(__file__).resolve().parents[3] / "src" / "transcription" / "whispercpp"))
+
+
+def make_wav(path, seconds=2.0, rate=16000):
+    """Writes a silent 16 kHz mono WAV."""
+    with wave.open(str(path), "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(rate)
+        wav_file.writeframes(struct.pack("<h", 0) * int(seconds * rate))
+    return Path(path)
+
+
+@pytest.fixture
+def wav_path(tmp_path):
+    return make_wav(tmp_path / "lecture.wav")
@@ -0,0 +1,189 @@
+import email.parser
+import email.policy
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from backends import (
+    BackendError,
+    CliBackend,
+    ServerBackend,
+    create_backend,
+    create_backend_pool,
+    server_form_fields,
+)
+
+STUB_WHISPER = Path(__file__).resolve().parents[3] / "src" / "transcription" / "whispercpp" / "stub_whisper.py"
+
+SEGMENTS = [
+    {"start": 0.0, "end": 1.25, "text": " first", "avg_logprob": -0.2},
+    {"start": 1.25, "end": 2.0, "text": " second", "avg_logprob": -1.1},
+]
+
+
+class InferenceHandler(BaseHTTPRequestHandler):
+    """A stand-in for whisper.cpp's server: GET / and POST /inference."""
+
+    protocol_version = "HTTP/1.1"
+    requests = None
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body: bytes, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while size := int(self.rfile.readline().split(b";")[0], 16):
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            self.rfile.readline()
+            return b"".join(chunks)
+        return self.rfile.read(int(self.headers["Content-Length"]))
+
+    def do_GET(self):
+        self.reply(200, b"<html>whisper.cpp server</html>", "text/html")
+
+    def do_POST(self):
+        if self.path != "/inference":
+            return self.reply(404, b"not found", "text/plain")
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode("utf-8") + self.read_body()
+        )
+        fields = {}
+        audio = None
+        for part in message.iter_parts():
+            if part.get_filename():
+                audio = part.get_payload(decode=True)
+            else:
+                fields[part.get_param("name", header="content-disposition")] = part.get_content().strip()
+        self.requests.append({"fields": fields, "audio": audio})
+        if fields.get("language") == "xx":
+            return self.reply(400, b"unsupported language", "text/plain")
+        if fields["response_format"] == "verbose_json":
+            body = json.dumps({"text": " first second", "segments": SEGMENTS}).encode("utf-8")
+            return self.reply(200, body, "application/json")
+        self.reply(200, " first second\n".encode("utf-8"), "text/plain")
+
+
+@pytest.fixture
+def inference_server():
+    class Handler(InferenceHandler):
+        requests = []
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    server.requests = Handler.requests
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_server_form_fields():
+    fields = server_form_fields(["-l", "ar", "-bs", "8", "-nt", "-otxt", "-pp", "--prompt", "درس"])
+    assert fields == {"language": "ar", "beam_size": "8", "no_timestamps": "true", "prompt": "درس"}
+    with pytest.raises(ValueError):
+        server_form_fields(["--max-len", "30"])
+
+
+def test_text_response(inference_server, wav_path, tmp_path):
+    backend = ServerBackend(url=inference_server.url, startup_timeout=5)
+    output_base = tmp_path / "out"
+
+    text = backend.transcribe(wav_path, output_base, ["-l", "ar", "-bs", "8", "-otxt"])
+
+    assert text == " first second\n"
+    assert Path(f"{output_base}.txt").read_text(encoding="utf-8") == text
+    request = inference_server.requests[-1]
+    assert request["fields"] == {"language": "ar", "beam_size": "8", "response_format": "text"}
+    # The WAV arrives byte for byte
+    assert request["audio"] == wav_path.read_bytes()
+
+
+def test_verbose_json_response(inference_server, wav_path, tmp_path):
+    backend = ServerBackend(url=inference_server.url, startup_timeout=5)
+    output_base = tmp_path / "out"
+
+    backend.transcribe(wav_path, output_base, ["-l", "ar", "-ojf"])
+
+    transcript = json.loads(Path(f"{output_base}.json").read_text(encoding="utf-8"))
+    # Converted to whisper.cpp's -oj layout, with millisecond offsets
+    assert transcript == {
+        "transcription": [
+            {"offsets": {"from": 0, "to": 1250}, "text": " first", "avg_logprob": -0.2},
+            {"offsets": {"from": 1250, "to": 2000}, "text": " second", "avg_logprob": -1.1},
+        ]
+    }
+    assert inference_server.requests[-1]["fields"]["response_format"] == "verbose_json"
+
+
+def test_streamed_audio_uses_chunked_upload(inference_server, wav_path, tmp_path):
+    backend = ServerBackend(url=inference_server.url, startup_timeout=5)
+
+    with open(wav_path, "rb") as audio_stream:
+        backend.transcribe_stream(audio_stream, "lecture.wav", tmp_path / "out", ["-l", "ar"])
+
+    assert inference_server.requests[-1]["audio"] == wav_path.read_bytes()
+
+
+def test_rejected_request_raises_backend_error(inference_server, wav_path, tmp_path):
+    backend = ServerBackend(url=inference_server.url, startup_timeout=5)
+
+    with pytest.raises(BackendError, match="HTTP 400"):
+        backend.transcribe(wav_path, tmp_path / "out", ["-l", "xx"])
+
+
+def test_health_check_times_out_when_server_is_down(inference_server):
+    url = inference_server.url
+    inference_server.shutdown()
+    inference_server.server_close()
+
+    with pytest.raises(BackendError, match="did not become ready"):
+        ServerBackend(url=url, startup_timeout=1)
+
+
+def test_server_that_dies_mid_batch_raises_backend_error(inference_server, wav_path, tmp_path):
+    backend = ServerBackend(url=inference_server.url, startup_timeout=5)
+    inference_server.shutdown()
+    inference_server.server_close()
+
+    with pytest.raises(BackendError, match="Could not reach"):
+        backend.transcribe(wav_path, tmp_path / "out", ["-l", "ar"])
+
+
+@pytest.mark.parametrize("server_executable", ["/nonexistent/whisper-server", sys.executable])
+def test_falls_back_to_cli_when_server_cannot_start(server_executable, wav_path, tmp_path, capsys):
+    # sys.executable exits at once: python has no "-m <model>" module by that name
+    backend = create_backend(
+        "server",
+        STUB_WHISPER,
+        server_executable,
+        tmp_path / "no-such-model.bin",
+        threads=1,
+        processors=1,
+    )
+
+    assert isinstance(backend, CliBackend)
+    assert "Falling back to one whisper.cpp process per file." in capsys.readouterr().out
+    backend.transcribe(wav_path, tmp_path / "out", ["-l", "ar", "-otxt"])
+    assert Path(f"{tmp_path / 'out'}.txt").read_text(encoding="utf-8").startswith("segment at 0s")
+
+
+def test_pool_shares_one_backend_for_an_external_server(inference_server):
+    pool = create_backend_pool(
+        "server", 4, STUB_WHISPER, None, None, threads=1, processors=1, server_url=inference_server.url
+    )
+
+    assert pool.size == 1
+    pool.close()
@@ -0,0 +1,82 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import cache as cache_module
+import transcriber
+from cache import TranscriptCache
+from conftest import make_wav
+
+CACHE_SCRIPT = Path(cache_module.__file__)
+
+
+@pytest.fixture
+def hash_calls(monkeypatch):
+    calls = []
+    real_hash = cache_module.fast_file_hash
+
+    def counting_hash(path):
+        calls.append(Path(path).name)
+        return real_hash(path)
+
+    monkeypatch.setattr(cache_module, "fast_file_hash", counting_hash)
+    return calls
+
+
+def test_audio_hash_is_reused_until_the_file_changes(tmp_path, wav_path, hash_calls):
+    cache = TranscriptCache("model.bin", cache_dir=tmp_path / "cache")
+    key = cache.key(wav_path, ["-l", "ar"])
+
+    # Another process (a new cache object) reuses the stored hash too
+    assert TranscriptCache("model.bin", cache_dir=tmp_path / "cache").key(wav_path, ["-l", "ar"]) == key
+    assert hash_calls == ["lecture.wav"]
+
+    make_wav(wav_path, seconds=3)
+    assert cache.key(wav_path, ["-l", "ar"]) != key
+    assert hash_calls == ["lecture.wav", "lecture.wav"]
+
+
+
+def test_modes_that_are_off_do_not_change_the_key(tmp_path, wav_path):
+    cache = TranscriptCache("model.bin", cache_dir=tmp_path / "cache")
+    key = cache.key(wav_path, ["-l", "ar"], chunking=True, vad=False)
+
+    assert cache.key(wav_path, ["-l", "ar"], chunking=True, vad=False, two_pass=False) == key
+    assert cache.key(wav_path, ["-l", "ar"], chunking=True, vad=False, two_pass=True) != key
+
+def test_existing_transcript_without_record_is_skipped_unhashed(tmp_path, wav_path, hash_calls, monkeypatch):
+    monkeypatch.setattr(transcriber, "transcripts_output_dir", tmp_path / "out")
+    (tmp_path / "out").mkdir()
+    (tmp_path / "out" / "lecture.txt").write_text("done\n", encoding="utf-8")
+    cache = TranscriptCache("model.bin", cache_dir=tmp_path / "cache")
+
+    assert transcriber.transcribe_file(wav_path, None, verbose=False, cache=cache) == "skipped"
+    assert hash_calls == []
+
+
+def test_stale_transcript_is_still_detected(tmp_path, wav_path, monkeypatch):
+    monkeypatch.setattr(transcriber, "transcripts_output_dir", tmp_path / "out")
+    (tmp_path / "out").mkdir()
+    (tmp_path / "out" / "lecture.txt").write_text("done\n", encoding="utf-8")
+    cache = TranscriptCache("model.bin", cache_dir=tmp_path / "cache")
+    cache.record_output(tmp_path / "out" / "lecture", "key-from-other-settings")
+
+    assert cache.has_output_record(tmp_path / "out" / "lecture")
+    assert cache.output_is_stale(
+        tmp_path / "out" / "lecture", cache.key(wav_path, transcriber.PROFILES["bilingual"])
+    )
+
+
+def test_stats_reports_the_given_size_limit(tmp_path):
+    result = subprocess.run(
+        [sys.executable, CACHE_SCRIPT, "stats", "--cache-dir", tmp_path, "--cache-max-gb", "20"],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=CACHE_SCRIPT.parent,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    assert "of 20480 MB" in result.stdout
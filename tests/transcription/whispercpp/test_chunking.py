@@ -0,0 +1,72 @@
+import json
+from pathlib import Path
+
+from backends import BackendError, BackendPool
+from chunking import CHUNK_SETTINGS_FILENAME, transcribe_chunked
+from conftest import make_wav
+
+
+class FakeBackend:
+    """Writes one segment per window, tagged with the decode language."""
+
+    name = "fake"
+    threads = "1"
+    processors = "1"
+
+    def __init__(self, fail_windows=()):
+        self.fail_windows = set(fail_windows)
+        self.decoded = []
+
+    def transcribe(self, input_wav_path, output_base, decode_args, run=None):
+        window = Path(output_base).name.split(".")[0]
+        self.decoded.append(window)
+        if window in self.fail_windows:
+            raise BackendError(f"{window} failed")
+        language = decode_args[decode_args.index("-l") + 1]
+        transcript = {"transcription": [{"offsets": {"from": 0, "to": 1000}, "text": f" {language} {window}"}]}
+        Path(f"{output_base}.json").write_text(json.dumps(transcript), encoding="utf-8")
+
+
+def run_chunked(wav_path, output_base, backend, decode_args, window_seconds=4.0):
+    return transcribe_chunked(
+        wav_path, output_base, BackendPool([backend]), decode_args, 10.0, window_seconds, 1.0
+    )
+
+
+def test_resume_only_redoes_missing_windows(tmp_path):
+    wav_path = make_wav(tmp_path / "talk.wav", seconds=10)
+    output_base = tmp_path / "talk"
+
+    assert not run_chunked(wav_path, output_base, FakeBackend(fail_windows={"window-0001"}), ["-l", "ar"])
+    backend = FakeBackend()
+    assert run_chunked(wav_path, output_base, backend, ["-l", "ar"])
+
+    assert backend.decoded == ["window-0001"]
+    assert not Path(f"{output_base}.chunks").exists()
+
+
+def test_windows_from_other_settings_are_discarded(tmp_path):
+    wav_path = make_wav(tmp_path / "talk.wav", seconds=10)
+    output_base = tmp_path / "talk"
+    assert not run_chunked(wav_path, output_base, FakeBackend(fail_windows={"window-0001"}), ["-l", "ar"])
+
+    backend = FakeBackend()
+    assert run_chunked(wav_path, output_base, backend, ["-l", "en"])
+
+    assert backend.decoded == ["window-0000", "window-0001", "window-0002"]
+    text = Path(f"{output_base}.txt").read_text(encoding="utf-8")
+    assert "ar" not in text.split()
+
+
+def test_windows_from_a_changed_input_are_discarded(tmp_path):
+    wav_path = make_wav(tmp_path / "talk.wav", seconds=10)
+    output_base = tmp_path / "talk"
+    assert not run_chunked(wav_path, output_base, FakeBackend(fail_windows={"window-0001"}), ["-l", "ar"])
+    settings_path = Path(f"{output_base}.chunks") / CHUNK_SETTINGS_FILENAME
+    assert settings_path.exists()
+
+    make_wav(wav_path, seconds=11)
+    backend = FakeBackend()
+    assert run_chunked(wav_path, output_base, backend, ["-l", "ar"])
+
+    assert "window-0000" in backend.decoded
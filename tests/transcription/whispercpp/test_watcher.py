@@ -0,0 +1,104 @@
+import os
+import threading
+import time
+
+import watcher
+from media import kept_wav_path
+
+
+class Recorder:
+    def __init__(self):
+        self.items = []
+
+    def submit(self, item):
+        self.items.append(item)
+        return True
+
+
+def make_pipeline():
+    pipeline = watcher.Pipeline(None, 1, 1, 1)
+    pipeline.download = Recorder()
+    pipeline.convert = Recorder()
+    pipeline.transcribe = Recorder()
+    return pipeline
+
+
+def touch(path, age=0.0):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"data")
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_classify_ignores_incomplete_and_control_files(tmp_path):
+    assert watcher.classify(tmp_path / "talk.mp3") == "convert"
+    assert watcher.classify(tmp_path / "talk.mp3.aria2") is None
+    assert watcher.classify(tmp_path / "talk.m4a.part") is None
+    assert watcher.classify(tmp_path / "converted_to_wav" / "talk.wav") == "transcribe"
+
+
+def test_batch_folder_media_routed_only_when_final(tmp_path):
+    pipeline = make_pipeline()
+    batch = tmp_path / "batch"
+    touch(batch / "youtube-urls.txt")
+    intermediate = touch(batch / "talk.m4a")
+    loose = touch(tmp_path / "other" / "talk.m4a")
+
+    # A rename event for yt-dlp's intermediate download is not acted on...
+    pipeline.route(intermediate)
+    pipeline.route(loose)
+    assert pipeline.convert.items == [loose]
+    # ...but the path yt-dlp reports when it is done is
+    pipeline.route(batch / "talk.mp3", final=True)
+    assert pipeline.convert.items == [loose, batch / "talk.mp3"]
+
+
+def test_jobs_for_the_same_wav_run_one_at_a_time(tmp_path, monkeypatch):
+    pipeline = make_pipeline()
+    running = []
+    overlaps = []
+
+    def run_conversion(media_path, wav_path, log):
+        running.append(media_path)
+        overlaps.append(len(running))
+        time.sleep(0.2)
+        wav_path.write_bytes(b"wav")
+        running.remove(media_path)
+        return True
+
+    monkeypatch.setattr(watcher.convert_to_wav, "run_conversion", run_conversion)
+    sources = [touch(tmp_path / "talk.mp3"), touch(tmp_path / "talk.m4a")]
+    threads = [threading.Thread(target=pipeline._convert, args=(source,)) for source in sources]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # The second job waits, then finds the first one's WAV current
+    assert overlaps == [1]
+    assert pipeline.transcribe.items == [kept_wav_path(sources[0])] * 2
+
+
+def test_recent_files_become_settled(tmp_path):
+    old = touch(tmp_path / "old.mp3", age=watcher.SETTLE_SECONDS + 1)
+    new = touch(tmp_path / "new.mp3")
+
+    assert list(watcher.settled_files(tmp_path)) == [old]
+    assert list(watcher.recent_files(tmp_path)) == [new]
+    assert not watcher.is_settled(new)
+    assert watcher.is_settled(new, now=time.time() + watcher.SETTLE_SECONDS)
+
+
+def test_stage_forgets_the_oldest_done_items(monkeypatch):
+    monkeypatch.setattr(watcher, "DONE_MEMORY", 2)
+    handled = []
+    stage = watcher.Stage("test", handled.append, workers=1)
+    for item in ("a", "b", "c"):
+        stage.submit(item)
+    stage.drain()
+
+    assert len(stage._done) == 2
+    # "a" was forgotten and runs again; "c" is still remembered
+    assert stage.submit("c") is False
+    assert stage.submit("a") is True